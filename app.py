@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -22,12 +23,17 @@ from blueprints.admin_bp import admin_bp
 # ===============================
 # DATABASE CORE
 # ===============================
-from db import get_user_by_id, db_session, engine
+from db import get_cached_user, db_session, engine
 
 # ===============================
 # UTILS
 # ===============================
 from utils.helpers import dated_url_for, inject_user_context, add_no_cache
+from services.maintenance import init_maintenance, start_scheduler
+from services.patient_import import init_patient_import
+from services.health import keepalive
+from services.referrals import referral_cache
+from services.catalog import catalog, init_catalog
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -60,14 +66,56 @@ app.register_blueprint(records_bp)
 app.register_blueprint(chat_bp)
 app.register_blueprint(admin_bp)
 
+# ===============================
+# CLI COMMANDS (maintenance, import, catalog)
+# ===============================
+init_maintenance(app)
+init_patient_import(app)
+init_catalog(app)
+
+# registration resolves referrers from memory; a cold cache only costs round trips
+try:
+    referral_cache.warm()
+except Exception as e:
+    logger.warning(f"Referral cache not warmed: {str(e)[:200]}")
+
+# service catalog (static/services/*.csv) parsed + indexed once per worker
+try:
+    catalog.ensure_loaded()
+except Exception as e:
+    logger.warning(f"Service catalog not loaded: {str(e)[:200]}")
+
 
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        return get_user_by_id(int(user_id))
+        return get_cached_user(int(user_id))
     except Exception:
         return None
 
+# ===============================
+# BACKGROUND THREADS (serving processes only)
+# ===============================
+# Started on a worker's first request instead of at import, so `flask`
+# CLI commands (db upgrade, import-patients, build-catalog, ...) never
+# spawn them.
+_background_started = False
+_background_lock = threading.Lock()
+
+@app.before_request
+def start_background_threads():
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        # server-side database keepalive, one per host (replaces per-tab pings)
+        keepalive.start()
+        # daily activity cleanup (MAINTENANCE_SCHEDULER), one per host
+        start_scheduler()
+        _background_started = True
+
 @app.teardown_appcontext
 def shutdown_session(exception=None):
     try:
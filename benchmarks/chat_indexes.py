@@ -0,0 +1,140 @@
+# ==========================================================
+# EPICONSULT e-CLINIC — Chat index benchmark
+# Query plans + latency for every chat endpoint's query pattern
+# on a synthetic department_messages table, with and without
+# the composite indexes from models.DepartmentMessage.
+#
+# Usage:
+#   python benchmarks/chat_indexes.py                 # 1M rows, temp SQLite
+#   BENCH_DATABASE_URL=postgresql://... python benchmarks/chat_indexes.py --rows 2000000
+#
+# Never point BENCH_DATABASE_URL at production: the table is dropped/recreated.
+# ==========================================================
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text, insert, or_, and_, select, desc
+
+from models import DepartmentMessage
+
+DEPARTMENTS = [
+    "customer_care", "doctor", "nursing", "laboratory", "diagnostics",
+    "inventory", "accounts", "it", "operations",
+]
+
+table = DepartmentMessage.__table__
+
+
+def seed(engine, rows: int, batch: int = 20000):
+    table.drop(engine, checkfirst=True)
+    # create without indexes first so the "before" numbers are honest
+    indexes = set(table.indexes)
+    table.indexes.clear()
+    table.create(engine)
+    table.indexes.update(indexes)
+
+    rnd = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / rows
+
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            chunk = []
+            for i in range(offset, min(offset + batch, rows)):
+                sender, receiver = rnd.sample(DEPARTMENTS, 2)
+                chunk.append({
+                    "sender_department": sender,
+                    "receiver_department": receiver,
+                    "message": "benchmark message",
+                    "created_at": start + step * i,
+                })
+            conn.execute(insert(table), chunk)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def queries(me="customer_care", other="laboratory"):
+    t = table.c
+    pair = or_(
+        and_(t.sender_department == me, t.receiver_department == other),
+        and_(t.sender_department == other, t.receiver_department == me),
+    )
+    recent = datetime.utcnow() - timedelta(minutes=5)
+    return {
+        "conversation": select(table).where(pair).order_by(t.created_at.asc()).limit(50),
+        "history": select(table).where(or_(t.sender_department == me, t.receiver_department == me))
+                                .order_by(desc(t.created_at)).limit(100),
+        "poll": select(table).where(t.sender_department == other, t.receiver_department == me,
+                                    t.created_at > recent).order_by(t.created_at.asc()),
+        "inbox": select(table).where(t.receiver_department == me).order_by(t.created_at.asc()).limit(50),
+        "clear (count)": select(t.id).where(pair),
+    }
+
+
+def explain(conn, stmt) -> str:
+    compiled = stmt.compile(conn, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")).fetchall()
+        return "\n".join(r[0] for r in rows)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return "\n".join(str(r[-1]) for r in rows)
+
+
+def time_query(conn, stmt, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(stmt).fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[max(int(len(samples) * 0.95) - 1, 0)],
+    }
+
+
+def run(engine, label: str, repeat: int):
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, stmt in queries().items():
+            stats = time_query(conn, stmt, repeat)
+            print(f"\n-- {name}: p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms")
+            print(explain(conn, stmt))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="department_messages index benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "chat_bench.db")
+    engine = create_engine(url)
+
+    print(f"Seeding {args.rows:,} messages into {engine.url.render_as_string(hide_password=True)} ...")
+    t0 = time.perf_counter()
+    seed(engine, args.rows)
+    print(f"Seeded in {time.perf_counter() - t0:.1f}s")
+
+    run(engine, "WITHOUT composite indexes", args.repeat)
+
+    for index in table.indexes:
+        index.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    run(engine, "WITH composite indexes", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
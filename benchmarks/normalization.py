@@ -0,0 +1,98 @@
+# ==========================================================
+# EPICONSULT e-CLINIC — Normalization benchmark
+# Row-at-a-time (the clean.ipynb DataFrame.apply style) vs the
+# vectorized pandas path in services/normalization.py, over the
+# real workbooks in data/.
+#
+# Usage:
+#   python benchmarks/normalization.py                 # every data/*.xlsx
+#   python benchmarks/normalization.py --repeat 5 path/to/file.xlsx
+# ==========================================================
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from services import normalization as norm
+
+COLUMN_MAP = {
+    "Name": "raw_name",
+    "Sex": "sex",
+    "Date of Birth": "date_of_birth",
+    "MobileNo": "phone",
+    "Reg. Date": "registration_date",
+    "email": "email",
+}
+
+
+def load_rows(paths) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    rows = []
+    for path in paths:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        for sheet in workbook.worksheets:
+            values = sheet.iter_rows(values_only=True)
+            header = [COLUMN_MAP.get(str(h).strip()) if h is not None else None for h in next(values)]
+            for row in values:
+                rows.append({col: v for col, v in zip(header, row) if col})
+        workbook.close()
+    return pd.DataFrame(rows, columns=list(COLUMN_MAP.values()))
+
+
+def per_row(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    names = out["raw_name"].apply(norm.split_name)
+    out["first_name"] = names.str[0]
+    out["last_name"] = names.str[1]
+    out["phone"] = out["phone"].apply(norm.normalize_phone)
+    out["email"] = out["email"].apply(norm.normalize_email)
+    out["sex"] = out["sex"].apply(norm.normalize_sex)
+    out["date_of_birth"] = out["date_of_birth"].apply(norm.parse_date)
+    out["registration_date"] = out["registration_date"].apply(norm.parse_date)
+    return out
+
+
+def timed(fn, df, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(df)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="patient field normalization benchmark")
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(ROOT, "data", "*.xlsx")))
+    t0 = time.perf_counter()
+    df = load_rows(paths)
+    print(f"Loaded {len(df):,} rows from {len(paths)} workbook(s) in {time.perf_counter() - t0:.1f}s")
+
+    for label, fn in (("row-at-a-time (apply)", per_row), ("vectorized (normalize_frame)", norm.normalize_frame)):
+        samples = timed(fn, df, args.repeat)
+        best = min(samples)
+        print(f"-- {label}: median={statistics.median(samples) * 1000:.0f}ms "
+              f"best={best * 1000:.0f}ms ({len(df) / best:,.0f} rows/s)")
+
+    a, b = per_row(df), norm.normalize_frame(df)
+    cols = ["first_name", "last_name", "phone", "email", "sex", "date_of_birth", "registration_date"]
+    # None == None is False element-wise, so compare with a sentinel
+    same = (a[cols].astype(object).where(a[cols].notna(), "")
+            == b[cols].astype(object).where(b[cols].notna(), "")).all(axis=1).mean()
+    print(f"Rows identical between the two paths: {same:.2%}")
+
+
+if __name__ == "__main__":
+    main()
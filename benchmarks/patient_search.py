@@ -0,0 +1,139 @@
+# ==========================================================
+# EPICONSULT e-CLINIC — Patient search benchmark
+# p50/p95 of services.patient_search for name fragments, phone
+# fragments, file numbers and typos on a synthetic patients table.
+#
+# Usage:
+#   python benchmarks/patient_search.py                      # 500k rows, temp SQLite (in-process index)
+#   BENCH_DATABASE_URL=postgresql://... python benchmarks/patient_search.py --rows 500000
+#
+# On Postgres the search column + GIN indexes from migration
+# d7a3c9e1f4b6 are created on the seeded table.
+# Never point BENCH_DATABASE_URL at production: the table is dropped/recreated.
+# ==========================================================
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST = ["Adaeze", "Babatunde", "Chinedu", "Damilola", "Emeka", "Folake", "Gbenga", "Halima",
+         "Ifeoma", "Jide", "Kemi", "Lanre", "Musa", "Ngozi", "Olumide", "Temitope", "Uche", "Yetunde"]
+LAST = ["Okafor", "Adeyemi", "Balogun", "Eze", "Ibrahim", "Nwosu", "Ogunleye", "Okonkwo",
+        "Olawale", "Suleiman", "Uzor", "Bello", "Chukwu", "Danjuma", "Afolabi", "Obi"]
+
+
+def _migration():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "migrations", "versions", "d7a3c9e1f4b6_add_patient_search_indexes.py")
+    spec = importlib.util.spec_from_file_location("patient_search_migration", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(engine, rows: int, batch: int = 20000):
+    from sqlalchemy import insert, text
+    from models import Patient
+
+    table = Patient.__table__
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            chunk = []
+            for i in range(offset, min(offset + batch, rows)):
+                chunk.append({
+                    "file_no": f"F{i:07d}",
+                    "patient_id": f"EPN-2025-{i:07d}",
+                    "first_name": rnd.choice(FIRST) + (rnd.choice(["", "la", "ke"]) if i % 5 == 0 else ""),
+                    "last_name": rnd.choice(LAST) + (str(i % 97) if i % 3 == 0 else ""),
+                    "date_of_birth": date(1950, 1, 1) + timedelta(days=rnd.randrange(25000)),
+                    "sex": rnd.choice(["Male", "Female"]),
+                    "phone": f"080{rnd.randrange(10**8):08d}",
+                    "registered_by": "bench",
+                    "is_test": True,
+                    "created_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow(),
+                })
+            conn.execute(insert(table), chunk)
+
+    if engine.dialect.name == "postgresql":
+        migration = _migration()
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                f"ALTER TABLE patients ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS ({migration.SEARCH_VECTOR_SQL}) STORED"
+            ))
+            for name, definition in migration.INDEXES.items():
+                conn.execute(text(f"CREATE INDEX {name} ON patients {definition}"))
+            conn.execute(text("ANALYZE patients"))
+
+
+def queries(rows: int) -> dict:
+    rnd = random.Random(7)
+    return {
+        "name fragment": [rnd.choice(FIRST)[:4] for _ in range(20)],
+        "full name": [f"{rnd.choice(FIRST)} {rnd.choice(LAST)}" for _ in range(20)],
+        "typo": ["Okonkow", "Adeyem", "Chinedo", "Ngozy", "Balogum"] * 4,
+        "phone fragment": [f"{rnd.randrange(10**5):05d}" for _ in range(20)],
+        "file no": [f"F{rnd.randrange(rows):07d}" for _ in range(20)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="patient search benchmark")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "patient_search_bench.db")
+    # the app modules build their engine from DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("DB_POOL_MODE", "queue")
+
+    from db import engine, db_session
+    from services import patient_search
+
+    print(f"Seeding {args.rows:,} patients into {engine.url.render_as_string(hide_password=True)} ...")
+    t0 = time.perf_counter()
+    seed(engine, args.rows)
+    print(f"Seeded in {time.perf_counter() - t0:.1f}s")
+
+    if patient_search.pg_search_available():
+        label = "Postgres pg_trgm + tsvector"
+        search = lambda q: patient_search.pg_search(db_session, q, 20)  # noqa: E731
+    else:
+        label = "in-process trigram index"
+        t0 = time.perf_counter()
+        patient_search.fallback_index.build()
+        print(f"Index built in {time.perf_counter() - t0:.1f}s")
+        search = lambda q: patient_search.fallback_index.search(q, 20)  # noqa: E731
+
+    print(f"\n=== {label} ===")
+    for name, terms in queries(args.rows).items():
+        samples = []
+        for _ in range(args.repeat):
+            for term in terms:
+                t0 = time.perf_counter()
+                search(term)
+                samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+        print(f"-- {name}: p50={statistics.median(samples):.2f}ms p95={p95:.2f}ms")
+    db_session.remove()
+
+
+if __name__ == "__main__":
+    main()
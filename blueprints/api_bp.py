@@ -1,109 +1,131 @@
 # ==========================================================
 # EPICONSULT e-CLINIC — API BLUEPRINT (api_bp.py)
-# Activities, health, cleanup, patients
+# Activities, health/readiness, cleanup, patients
+# (scheduled cleanup lives in services/maintenance.py)
 # ==========================================================
 import logging
 from datetime import datetime, date
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, abort, jsonify, request, url_for
 from flask_login import login_required, current_user
 
 from db import db_session
 from utils.decorators import require_admin
-from services.patient_services import register_new_patient
+from utils.helpers import IMMUTABLE_CACHE
+from services.patient_services import register_new_patient, register_patients_bulk, search_patients_ranked
+from services.patient_dedupe import DuplicatePatientError
+from services.maintenance import run_activity_cleanup
+from services.activity_services import feed_query
+from services.health import readiness
+from services.catalog import SCOPES, SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, catalog
+from services.pricing import quote
 
 api_bp = Blueprint("api_bp", __name__)
 logger = logging.getLogger(__name__)
 
-_last_cleanup_date = None
+# ----------------------------------------------------------
+# LIVENESS / READINESS (unauthenticated, for probes)
+#   /livez  → process is serving requests; no database access
+#   /readyz → cached SELECT 1 + pool stats, generic error (503 if down;
+#             the error detail is only logged)
+# ----------------------------------------------------------
+@api_bp.route("/livez")
+def livez():
+    return jsonify({"status": "alive", "timestamp": datetime.utcnow().isoformat()})
+
+
+@api_bp.route("/readyz")
+def readyz():
+    state = readiness.public_state()
+    state["status"] = "ready" if state["ok"] else "unavailable"
+    return jsonify(state), (200 if state["ok"] else 503)
 
 
 # ----------------------------------------------------------
-# HEALTH CHECK
+# HEALTH CHECK (signed-in users; same cached probe as /readyz)
 # ----------------------------------------------------------
 @api_bp.route("/api/health")
 @login_required
 def health_check():
-    try:
-        from models import User
-        count = db_session.query(User).count()
-        return jsonify({
-            "success": True,
-            "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
-            "users_count": count
-        })
-    except Exception as e:
-        logger.error(f"Health error: {str(e)}", exc_info=True)
-        return jsonify({"success": False, "error": str(e)}), 500
+    state = readiness.check()
+    if not state["ok"]:
+        return jsonify({"success": False, "error": state["last_error"], "pool": state["pool"]}), 503
+    return jsonify({
+        "success": True,
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "db_latency_ms": state["latency_ms"],
+        "pool": state["pool"]
+    })
 
 
 # ----------------------------------------------------------
 # GET ACTIVITIES FOR TODAY
+#   ?since_id=<id> | ?since_ts=<iso>  → only newer rows (delta)
+#   ?department=<slug>                → filtered in SQL
+#   ?include_metadata=1               → also load the JSON metadata column
+#                                       (otherwise "metadata" is null)
+# ETag = today + department + newest matching id; a client sending it
+# back in If-None-Match gets 304 without any rows being read.
 # ----------------------------------------------------------
 @api_bp.route("/api/activities")
 @login_required
 def get_activities():
     try:
         from models import Activity
-        from sqlalchemy import desc
+        from sqlalchemy import desc, func
 
         today = date.today()
         start = datetime.combine(today, datetime.min.time())
 
-        activities = (
-            db_session.query(Activity)
-            .filter(Activity.created_at >= start)
-            .order_by(desc(Activity.created_at))
-            .all()
-        )
+        since_id = request.args.get("since_id", type=int)
+        since_ts = request.args.get("since_ts")
+        department = (request.args.get("department") or "").strip() or None
 
-        # If Activity has to_dict()
-        return jsonify({"success": True, "activities": [a.to_dict() for a in activities]})
-    except Exception as e:
-        logger.error(f"Error fetching activities: {str(e)}", exc_info=True)
-        return jsonify({"success": False, "error": str(e)}), 500
+        filters = [Activity.created_at >= start]
+        if department:
+            filters.append(Activity.department == department)
 
+        latest_id = (
+            db_session.query(func.max(Activity.id))
+            .filter(*filters)
+            .scalar()
+        ) or 0
 
-# ----------------------------------------------------------
-# CLEANUP OLD ACTIVITIES
-# ----------------------------------------------------------
-def cleanup_old_activities():
-    """
-    Delete activities older than today.
-    """
-    try:
-        from models import Activity
+        etag = f"act-{today.isoformat()}-{department or 'all'}-{latest_id}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
 
-        today = date.today()
-        start = datetime.combine(today, datetime.min.time())
+        if since_id is not None:
+            filters.append(Activity.id > since_id)
+        if since_ts:
+            try:
+                filters.append(Activity.created_at > datetime.fromisoformat(since_ts))
+            except ValueError:
+                return jsonify({"success": False, "error": "Invalid since_ts"}), 400
 
-        deleted = (
-            db_session.query(Activity)
-            .filter(Activity.created_at < start)
-            .delete(synchronize_session=False)
+        include_metadata = request.args.get("include_metadata", "").lower() in ("1", "true")
+        activities = (
+            feed_query(include_metadata)
+            .filter(*filters)
+            .order_by(desc(Activity.created_at))
+            .all()
         )
 
-        db_session.commit()
-        return deleted
-
+        response = jsonify({
+            "success": True,
+            "activities": [a.to_dict(include_metadata=include_metadata) for a in activities],
+            "latest_id": latest_id,
+            "delta": since_id is not None or bool(since_ts),
+            "date": today.isoformat(),
+        })
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
-        db_session.rollback()
-        logger.error(f"Cleanup error: {str(e)}", exc_info=True)
-        return 0
-
-
-# Automatic cleanup once/day between 6–7 AM
-@api_bp.before_app_request
-def run_daily_cleanup():
-    global _last_cleanup_date
-    now = datetime.now()
-    today = date.today()
-
-    if 6 <= now.hour < 7 and _last_cleanup_date != today:
-        deleted = cleanup_old_activities()
-        logger.info(f"Daily cleanup removed {deleted} activities")
-        _last_cleanup_date = today
+        logger.error(f"Error fetching activities: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "error": str(e)}), 500
 
 
 # ----------------------------------------------------------
@@ -113,8 +135,28 @@ def run_daily_cleanup():
 @login_required
 @require_admin()
 def manual_cleanup():
-    deleted = cleanup_old_activities()
-    return jsonify({"success": True, "message": f"Deleted {deleted} old activities"})
+    result = run_activity_cleanup()
+    if result is None:
+        return jsonify({"success": False, "message": "Cleanup is already running"}), 409
+    return jsonify({"success": True, "message": "Activity retention applied", "result": result})
+
+
+# ----------------------------------------------------------
+# PATIENT SEARCH (ranked partial match for reception)
+#   ?q=<name | phone | file no | patient ID>  &limit=<n, max 50>
+# ----------------------------------------------------------
+@api_bp.route("/api/patients/search", methods=["GET"])
+@login_required
+def search_patients():
+    try:
+        results = search_patients_ranked(
+            request.args.get("q", ""),
+            limit=request.args.get("limit", 20, type=int),
+        )
+        return jsonify({"success": True, "patients": results})
+    except Exception as e:
+        logger.error(f"Patient search error: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "error": "Search failed"}), 500
 
 
 # ----------------------------------------------------------
@@ -129,6 +171,13 @@ def create_patient():
         result = register_new_patient(data, current_user)
         return jsonify(result), 201
 
+    except DuplicatePatientError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e),
+            "duplicates": e.candidates
+        }), 409
+
     except ValueError as e:
         return jsonify({"success": False, "message": str(e)}), 400
 
@@ -141,6 +190,35 @@ def create_patient():
         }), 500
 
 
+# ----------------------------------------------------------
+# BULK REGISTRATION (family groups, HMO batches)
+# POST /api/patients/bulk
+# { "patients": [ {...}, ... ], "allow_duplicates": false }
+# ----------------------------------------------------------
+@api_bp.route("/api/patients/bulk", methods=["POST"])
+@login_required
+def create_patients_bulk():
+    try:
+        data = request.get_json(silent=True) or {}
+        result = register_patients_bulk(
+            data.get("patients"),
+            current_user,
+            allow_duplicates=bool(data.get("allow_duplicates")),
+        )
+        return jsonify(result), 201 if result["created"] else 400
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Bulk patient registration error: {str(e)}", exc_info=True)
+        db_session.rollback()
+        return jsonify({
+            "success": False,
+            "message": "An error occurred while registering the patients. Please try again."
+        }), 500
+
+
 # ----------------------------------------------------------
 # REGISTER NEW PATIENT (LEGACY)
 # POST /api/patients/register
@@ -150,3 +228,83 @@ def create_patient():
 def register_patient():
     # Keep for old JS compatibility, same logic
     return create_patient()
+
+
+# ----------------------------------------------------------
+# SERVICE CATALOG SEARCH (lab / drugs / general)
+#   ?q=<text>  &scope=<all|lab|drugs|general>  &limit=<n per scope, max 50>
+# ----------------------------------------------------------
+@api_bp.route("/api/catalog/search", methods=["GET"])
+@login_required
+def search_catalog():
+    scope = (request.args.get("scope") or "all").strip().lower()
+    if scope != "all" and scope not in SCOPES:
+        return jsonify({"success": False, "error": f"Unknown scope: {scope}"}), 400
+    limit = max(1, min(request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int), SEARCH_MAX_LIMIT))
+
+    try:
+        results = catalog.search(request.args.get("q", ""), scope=scope, limit=limit)
+        return jsonify({"success": True, "items": results, "counts": catalog.counts()})
+    except Exception as e:
+        logger.error(f"Catalog search error: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "error": "Search failed"}), 500
+
+
+# ----------------------------------------------------------
+# BASKET QUOTE (integer kobo)
+# POST /api/catalog/quote
+# { "tier": "walkin", "items": [ {"key", "quantity", "tier"}, ... ] }
+# ----------------------------------------------------------
+@api_bp.route("/api/catalog/quote", methods=["POST"])
+@login_required
+def quote_basket():
+    try:
+        data = request.get_json(silent=True) or {}
+        result = quote(data.get("items") or [], tier=data.get("tier"))
+        return jsonify({"success": True, **result})
+
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    except Exception as e:
+        logger.error(f"Quote error: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "message": "Could not price these items."}), 500
+
+
+# ----------------------------------------------------------
+# CATALOG SNAPSHOT (whole catalog, pre-parsed, cache forever)
+#   /api/catalog/version              → current hash + URL (never cached)
+#   /api/catalog/snapshot/<hash>.json → immutable; 404 once superseded
+# ----------------------------------------------------------
+@api_bp.route("/api/catalog/version", methods=["GET"])
+@login_required
+def catalog_version():
+    catalog.ensure_loaded()
+    return jsonify({
+        "success": True,
+        "hash": catalog.snapshot_hash,
+        "url": url_for("api_bp.catalog_snapshot", snapshot_hash=catalog.snapshot_hash),
+        "bytes": len(catalog.snapshot),
+        "counts": catalog.counts(),
+    })
+
+
+@api_bp.route("/api/catalog/snapshot/<snapshot_hash>.json", methods=["GET"])
+@login_required
+def catalog_snapshot(snapshot_hash):
+    catalog.ensure_loaded()
+    if snapshot_hash != catalog.snapshot_hash:
+        abort(404)
+
+    etag = f'"{snapshot_hash}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = Response(status=304)
+    elif "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = Response(catalog.snapshot_gzip, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(catalog.snapshot, mimetype="application/json")
+    response.headers["ETag"] = etag
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    return response
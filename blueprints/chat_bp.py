@@ -3,17 +3,35 @@
 # Inter-department messaging API
 # ==========================================================
 
-from flask import Blueprint, request, jsonify, session
+import json
+import os
+import queue
+
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from flask_login import login_required
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, func, literal, select, tuple_, union_all
 from datetime import datetime
 
+from constants import DEPARTMENTS
 from db import db_session
-from models import DepartmentMessage
+from models import ChatReadState, DepartmentMessage
+from services.chat_broker import broker
+from services.chat_unread import record_incoming, mark_read, clear_pair, unread_summary
+from services.ephemeral_store import store as ephemeral_store
 from time import time
 
-# simple in-memory typing registry (per worker)
-TYPING_REGISTRY = {}
+# SSE connections are closed after this long; EventSource reconnects with Last-Event-ID
+STREAM_MAX_SECONDS = int(os.getenv("CHAT_STREAM_MAX_SECONDS", "300"))
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_BACKLOG_LIMIT = 200
+
+# typing indicators live in the ephemeral store (shared across workers
+# when EPHEMERAL_BACKEND=redis) and expire on their own
+TYPING_TTL_SECONDS = 2.5
+
+
+def _typing_key(sender: str, receiver: str) -> str:
+    return f"typing:{sender}:{receiver}"
 
 chat_bp = Blueprint("chat_bp", __name__, url_prefix="/api/chat")
 
@@ -42,6 +60,92 @@ def ensure_department():
     return department, None, None
 
 
+# ----------------------------------------------------------
+# KEYSET PAGINATION — (created_at, id) cursor from a message id
+# ----------------------------------------------------------
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+
+
+def _page_args():
+    """Parse before_id / after_id / limit query args (ValueError on junk)."""
+    before_id = request.args.get("before_id", type=int)
+    after_id = request.args.get("after_id", type=int)
+    raw_limit = request.args.get("limit")
+    limit = int(raw_limit) if raw_limit else PAGE_DEFAULT_LIMIT
+    if limit < 1 or (before_id is not None and after_id is not None):
+        raise ValueError("bad page args")
+    return before_id, after_id, min(limit, PAGE_MAX_LIMIT)
+
+
+def _empty_page():
+    return {"messages": [], "has_more": False, "oldest_id": None, "newest_id": None}
+
+
+def _keyset_page(branches, before_id=None, after_id=None, limit=PAGE_DEFAULT_LIMIT):
+    """
+    One page of messages matching any of `branches` (filter clauses).
+
+    - default / before_id: newest `limit` rows older than the cursor
+    - after_id: oldest `limit` rows newer than the cursor
+    Each branch is ordered + limited separately and merged with UNION ALL,
+    so the DB reads at most len(branches) * (limit + 1) index entries.
+    Messages are always returned oldest-first for rendering.
+    """
+    M = DepartmentMessage
+    newer = after_id is not None
+    cursor_id = after_id if newer else before_id
+
+    cursor = []
+    if cursor_id is not None:
+        cursor_ts = select(M.created_at).where(M.id == cursor_id).scalar_subquery()
+        if newer:
+            cursor = [M.created_at >= cursor_ts, tuple_(M.created_at, M.id) > tuple_(cursor_ts, cursor_id)]
+        else:
+            cursor = [M.created_at <= cursor_ts, tuple_(M.created_at, M.id) < tuple_(cursor_ts, cursor_id)]
+
+    def ordered(created_at, id_):
+        return (created_at.asc(), id_.asc()) if newer else (created_at.desc(), id_.desc())
+
+    parts = [
+        select(M.id, M.created_at)
+        .where(branch, *cursor)
+        .order_by(*ordered(M.created_at, M.id))
+        .limit(limit + 1)
+        .subquery()
+        for branch in branches
+    ]
+    if len(parts) == 1:
+        page = parts[0]
+    else:
+        page = union_all(*[select(p.c.id, p.c.created_at) for p in parts]).subquery()
+
+    ids = (
+        select(page.c.id)
+        .order_by(*ordered(page.c.created_at, page.c.id))
+        .limit(limit + 1)
+        .subquery()
+    )
+    rows = (
+        db_session.query(M)
+        .filter(M.id.in_(select(ids.c.id)))
+        .order_by(*ordered(M.created_at, M.id))
+        .all()
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not newer:
+        rows.reverse()
+
+    return {
+        "messages": [m.to_dict() for m in rows],
+        "has_more": has_more,
+        "oldest_id": rows[0].id if rows else None,
+        "newest_id": rows[-1].id if rows else None,
+    }
+
+
 # ==========================================================
 # GET AVAILABLE DEPARTMENTS (EXCLUDING SELF)
 # ==========================================================
@@ -108,6 +212,8 @@ def send_message():
 
     try:
         db_session.add(msg)
+        db_session.flush()
+        record_incoming(receiver, sender, msg.id)
         db_session.commit()
 
     except Exception as e:
@@ -125,12 +231,15 @@ def send_message():
             "detail": str(e)
         }), 500
 
+    payload = msg.to_dict()
+    broker.publish_message(payload)
+
     # -------------------------------
     # SUCCESS RESPONSE
     # -------------------------------
     return jsonify({
         "success": True,
-        "message": msg.to_dict()
+        "message": payload
     }), 201
 
 
@@ -146,27 +255,27 @@ def get_conversation():
 
     other = request.args.get("department")
     if not other or other == me:
-        return jsonify([])
+        return jsonify(_empty_page())
 
-    messages = (
-        db_session.query(DepartmentMessage)
-        .filter(
-            or_(
-                and_(
-                    DepartmentMessage.sender_department == me,
-                    DepartmentMessage.receiver_department == other
-                ),
-                and_(
-                    DepartmentMessage.sender_department == other,
-                    DepartmentMessage.receiver_department == me
-                )
-            )
-        )
-        .order_by(DepartmentMessage.created_at.asc())
-        .all()
-    )
+    try:
+        before_id, after_id, limit = _page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
 
-    return jsonify([m.to_dict() for m in messages])
+    # one branch per direction so each side is an index range scan
+    return jsonify(_keyset_page(
+        [
+            and_(
+                DepartmentMessage.sender_department == me,
+                DepartmentMessage.receiver_department == other
+            ),
+            and_(
+                DepartmentMessage.sender_department == other,
+                DepartmentMessage.receiver_department == me
+            ),
+        ],
+        before_id, after_id, limit
+    ))
 
 
 # ==========================================================
@@ -179,40 +288,72 @@ def conversation_history():
     if error:
         return error, status
 
-    messages = (
-        db_session.query(DepartmentMessage)
-        .filter(
-            or_(
-                DepartmentMessage.sender_department == me,
-                DepartmentMessage.receiver_department == me
-            )
-        )
-        .order_by(DepartmentMessage.created_at.desc())
-        .limit(100)
-        .all()
-    )
-
-    seen = set()
-    history = []
+    rows = db_session.execute(_history_statement(me)).all()
 
-    for msg in messages:
-        other = (
-            msg.receiver_department
-            if msg.sender_department == me
-            else msg.sender_department
+    return jsonify([
+        {
+            "department": row.department,
+            "last_message": row.message,
+            "last_sender": row.sender_department,
+            "timestamp": row.created_at.isoformat(),
+            "unread": row.unread,
+        }
+        for row in rows
+    ])
+
+
+def _history_statement(me: str):
+    """
+    Latest message + unread count for every counterpart, as one statement.
+
+    Counterparts are a small fixed set (chat departments + canonical slugs),
+    so instead of scanning all of `me`'s messages we probe each pair with
+    ORDER BY created_at DESC LIMIT 1 on the pair index and UNION ALL the
+    results: O(departments) index lookups regardless of history size.
+    Unread counts come from the incrementally maintained chat_read_states.
+    """
+    M = DepartmentMessage
+    cols = (M.id, M.sender_department, M.receiver_department, M.message, M.created_at)
+
+    def newest(sender, receiver):
+        return (
+            select(*cols)
+            .where(M.sender_department == sender, M.receiver_department == receiver)
+            .order_by(M.created_at.desc(), M.id.desc())
+            .limit(1)
+            .subquery()
         )
 
-        if other in seen:
+    per_department = []
+    for other in sorted(set(VALID_DEPARTMENTS) | set(DEPARTMENTS)):
+        if other == me:
             continue
 
-        seen.add(other)
-        history.append({
-            "department": other,
-            "last_message": msg.message,
-            "timestamp": msg.created_at.isoformat()
-        })
+        outbound, inbound = newest(me, other), newest(other, me)
+        both = union_all(select(*outbound.c), select(*inbound.c)).subquery()
+
+        unread = (
+            select(ChatReadState.unread_count)
+            .where(ChatReadState.department == me, ChatReadState.counterpart == other)
+            .scalar_subquery()
+        )
+
+        latest = (
+            select(
+                literal(other).label("department"),
+                both.c.sender_department,
+                both.c.message,
+                both.c.created_at,
+                func.coalesce(unread, 0).label("unread"),
+            )
+            .order_by(both.c.created_at.desc(), both.c.id.desc())
+            .limit(1)
+            .subquery()
+        )
+        per_department.append(select(*latest.c))
 
-    return jsonify(history)
+    summary = union_all(*per_department).subquery()
+    return select(*summary.c).order_by(summary.c.created_at.desc())
 
 
 # ==========================================================
@@ -262,17 +403,65 @@ def inbox_messages():
     if error:
         return error, status
 
-    messages = (
-        db_session.query(DepartmentMessage)
-        .filter(
-            DepartmentMessage.receiver_department == me
-        )
-        .order_by(DepartmentMessage.created_at.asc())
-        .limit(50)
-        .all()
-    )
+    try:
+        before_id, after_id, limit = _page_args()
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
 
-    return jsonify([m.to_dict() for m in messages])
+    return jsonify(_keyset_page(
+        [DepartmentMessage.receiver_department == me],
+        before_id, after_id, limit
+    ))
+
+
+
+# ==========================================================
+# UNREAD COUNTERS — badge lookup + mark-read
+# ==========================================================
+@chat_bp.route("/unread", methods=["GET"])
+@login_required
+def unread_counts():
+    me, error, status = ensure_department()
+    if error:
+        return error, status
+
+    counts = unread_summary(me)
+    return jsonify({
+        "total": sum(counts.values()),
+        "by_department": counts
+    })
+
+
+@chat_bp.route("/read", methods=["POST"])
+@login_required
+def mark_conversation_read():
+    me, error, status = ensure_department()
+    if error:
+        return error, status
+
+    data = request.get_json(silent=True) or {}
+    other = data.get("department")
+    message_id = data.get("message_id")
+
+    if not other or other == me:
+        return jsonify({"error": "Invalid department"}), 400
+
+    try:
+        message_id = int(message_id) if message_id is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid message_id"}), 400
+
+    try:
+        remaining = mark_read(me, other, message_id)
+        db_session.commit()
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({
+            "error": "Failed to mark conversation read",
+            "detail": str(e)
+        }), 500
+
+    return jsonify({"success": True, "unread": remaining})
 
 
 
@@ -295,6 +484,8 @@ def clear_conversation():
         }), 400
 
     try:
+        # both departments' badges drop these messages in the same transaction
+        clear_pair(me, other)
         deleted = (
             db_session.query(DepartmentMessage)
             .filter(
@@ -346,7 +537,8 @@ def typing_signal():
         return jsonify({"ok": True})
 
     # store typing timestamp (expires fast)
-    TYPING_REGISTRY[(me, other)] = time()
+    ephemeral_store.set(_typing_key(me, other), time(), ttl=TYPING_TTL_SECONDS)
+    broker.publish_typing(me, other)
     return jsonify({"ok": True})
 
 
@@ -361,10 +553,96 @@ def typing_status():
     if not other:
         return jsonify({"typing": False})
 
-    now = time()
-    key = (other, me)
-
-    # typing valid for last 2 seconds
-    typing = key in TYPING_REGISTRY and (now - TYPING_REGISTRY[key]) < 2.5
+    typing = ephemeral_store.get(_typing_key(other, me)) is not None
 
     return jsonify({"typing": typing})
+
+
+# ==========================================================
+# STREAM — Server-Sent Events (messages + typing, pushed)
+# ==========================================================
+def _sse(event: str, data: dict, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@chat_bp.route("/stream", methods=["GET"])
+@login_required
+def stream():
+    me, error, status = ensure_department()
+    if error:
+        return error, status
+
+    # Subscribe before reading the backlog: anything committed after this
+    # point is delivered live, anything before it is in the backlog, and
+    # the overlap is dropped by id below.
+    subscription = broker.subscribe(me)
+
+    mine = or_(
+        DepartmentMessage.sender_department == me,
+        DepartmentMessage.receiver_department == me
+    )
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    try:
+        if last_id and str(last_id).isdigit():
+            # replay anything missed since the browser's last event (reconnects)
+            cursor = int(last_id)
+            backlog = [
+                m.to_dict()
+                for m in (
+                    db_session.query(DepartmentMessage)
+                    .filter(DepartmentMessage.id > cursor, mine)
+                    .order_by(DepartmentMessage.id.asc())
+                    .limit(STREAM_BACKLOG_LIMIT + 1)
+                    .all()
+                )
+            ]
+        else:
+            # first connection: start from now (history comes from /conversation)
+            backlog = []
+            cursor = db_session.query(func.max(DepartmentMessage.id)).filter(mine).scalar() or 0
+    except Exception:
+        broker.unsubscribe(me, subscription)
+        raise
+    finally:
+        # the generator outlives the request; don't pin a pooled connection
+        db_session.remove()
+
+    # more than one page missed: send a page, then end the stream so the
+    # browser reconnects from the last id instead of skipping the rest
+    truncated = len(backlog) > STREAM_BACKLOG_LIMIT
+    backlog = backlog[:STREAM_BACKLOG_LIMIT]
+    replayed = {payload["id"] for payload in backlog}
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            # the id gives every reconnect a Last-Event-ID, even before any message
+            yield _sse("ready", {"department": me, "last_id": cursor}, cursor)
+            for payload in backlog:
+                yield _sse("message", payload, payload["id"])
+            if truncated:
+                return
+
+            deadline = time() + STREAM_MAX_SECONDS
+            while time() < deadline:
+                try:
+                    event, data, event_id = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event == "message" and event_id in replayed:
+                    continue
+                yield _sse(event, data, event_id)
+        finally:
+            broker.unsubscribe(me, subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},
+    )
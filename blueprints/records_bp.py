@@ -1,10 +1,22 @@
 # ==========================================================
-# records_bp.py — Records Page Blueprint (CSV-driven UI)
+# records_bp.py — Records Page Blueprint
+# Page shell + JSON API over the patients table
 # ==========================================================
 
-from flask import Blueprint, render_template
+import logging
+
+from flask import Blueprint, jsonify, render_template, request
 from flask_login import login_required
 
+from services.records import (
+    FILTER_COLUMNS,
+    PAGE_DEFAULT_LIMIT,
+    fetch_single_patient,
+    search_patients,
+)
+
+logger = logging.getLogger(__name__)
+
 # ----------------------------------------------------------
 # BLUEPRINT INITIALIZATION (THIS WAS MISSING)
 # ----------------------------------------------------------
@@ -15,13 +27,65 @@ records_bp = Blueprint(
 )
 
 # ----------------------------------------------------------
-# RECORDS PAGE ONLY
+# RECORDS PAGE
 # ----------------------------------------------------------
 @records_bp.route("/", methods=["GET"])
 @login_required
 def records_page():
     """
     Renders the Patient Records Workspace.
-    Data loading is handled entirely on the frontend via CSV + JS.
+    Rows are fetched page by page from /records/api/search.
     """
     return render_template("records.html")
+
+
+# ----------------------------------------------------------
+# SEARCH / LIST
+#   ?q=<text>                     name / file no / patient ID / email / phone
+#   ?sex= &category= &account_status= &is_test=true|false
+#   ?sort=created_at|last_name|first_name|file_no|patient_id
+#   ?direction=asc|desc  ?limit=<n>  ?cursor=<next_cursor>
+#   ?include_total=1              also count all matches
+# ----------------------------------------------------------
+@records_bp.route("/api/search", methods=["GET"])
+@login_required
+def api_search():
+    args = request.args
+    filters = {key: args.get(key) for key in FILTER_COLUMNS if args.get(key)}
+    if args.get("is_test") in ("true", "false"):
+        filters["is_test"] = args.get("is_test") == "true"
+
+    try:
+        page = search_patients(
+            query=args.get("q", ""),
+            filters=filters,
+            sort=args.get("sort", "created_at"),
+            direction=args.get("direction", "desc"),
+            limit=args.get("limit", PAGE_DEFAULT_LIMIT, type=int),
+            cursor=args.get("cursor") or None,
+            include_total=args.get("include_total") in ("1", "true"),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Records search error: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "error": "Failed to search records"}), 500
+
+    return jsonify({"success": True, **page})
+
+
+# ----------------------------------------------------------
+# SINGLE RECORD (numeric id, file no or patient ID)
+# ----------------------------------------------------------
+@records_bp.route("/api/<identifier>", methods=["GET"])
+@login_required
+def api_patient(identifier):
+    try:
+        patient = fetch_single_patient(identifier)
+    except Exception as e:
+        logger.error(f"Records fetch error: {str(e)}", exc_info=True)
+        return jsonify({"success": False, "error": "Failed to load record"}), 500
+
+    if patient is None:
+        return jsonify({"success": False, "error": "Patient not found"}), 404
+    return jsonify({"success": True, "patient": patient})
@@ -6,16 +6,21 @@ import os
 import re
 import logging
 import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.exc import OperationalError, DisconnectionError, IntegrityError
+from sqlalchemy.exc import TimeoutError as SATimeoutError
 from werkzeug.security import check_password_hash, generate_password_hash
+from flask_login import UserMixin
 
 from models import Base, User  # keep other models import later if needed
+from services.activity_sink import ActivitySink, register_shutdown
 from constants import (
     DEPARTMENTS,
     is_valid_department,
@@ -33,27 +38,174 @@ if not DATABASE_URL:
 engine = None
 db_session = None
 
+# ==========================================================
+# CONNECTION POOLING
+# ==========================================================
+# DB_POOL_MODE selects how connections are reused:
+#   - "queue"       : in-process QueuePool (size/overflow/recycle from env)
+#   - "transaction" : external pooler in transaction mode (Supabase pooler /
+#                     PgBouncer on :6543). No local pool, and server-side
+#                     prepared statements are disabled because consecutive
+#                     transactions may land on different backends.
+#   - "null"        : legacy behaviour, fresh connection per checkout
+DB_POOL_MODE = (os.getenv("DB_POOL_MODE") or "queue").strip().lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+POOL_MODES = ("queue", "transaction", "null")
+if DB_POOL_MODE not in POOL_MODES:
+    logger.warning(f"Unknown DB_POOL_MODE={DB_POOL_MODE!r}; falling back to 'queue'")
+    DB_POOL_MODE = "queue"
+
+
+class _PoolTimings:
+    """Thread-safe running totals for pool checkout waits and connect handshakes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_total_ms = 0.0
+        self.checkout_max_ms = 0.0
+        self.connects = 0
+        self.connect_total_ms = 0.0
+        self.connect_max_ms = 0.0
+        self.checkout_timeouts = 0
+
+    def record_checkout(self, ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_total_ms += ms
+            self.checkout_max_ms = max(self.checkout_max_ms, ms)
+
+    def record_connect(self, ms: float):
+        with self._lock:
+            self.connects += 1
+            self.connect_total_ms += ms
+            self.connect_max_ms = max(self.connect_max_ms, ms)
+
+    def record_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_avg_ms": round(self.checkout_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_max_ms": round(self.checkout_max_ms, 3),
+                "checkout_timeouts": self.checkout_timeouts,
+                "connects": self.connects,
+                "connect_avg_ms": round(self.connect_total_ms / self.connects, 3) if self.connects else 0.0,
+                "connect_max_ms": round(self.connect_max_ms, 3),
+            }
+
+
+pool_timings = _PoolTimings()
+
+
+class _TimedPoolMixin:
+    """Measures how long callers wait for a connection (includes any new handshake)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except SATimeoutError:
+            pool_timings.record_timeout()
+            raise
+        finally:
+            pool_timings.record_checkout((time.perf_counter() - start) * 1000)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+def _engine_options(url: str) -> dict:
+    """Build create_engine() kwargs for the configured DB_POOL_MODE."""
+    mode = DB_POOL_MODE
+    is_postgres = "postgresql" in url.lower()
+    connect_args = {
+        "connect_timeout": 15,
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5
+    } if is_postgres else {}
+
+    options = {
+        "echo": False,
+        "pool_pre_ping": True,
+        "connect_args": connect_args,
+    }
+
+    if mode == "queue":
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_use_lifo=True,  # let idle surplus connections age out
+        )
+    else:
+        options["poolclass"] = TimedNullPool
+
+    if mode == "transaction" and is_postgres:
+        # psycopg2 never prepares server-side; psycopg (v3) and asyncpg do.
+        lowered = url.lower()
+        if "+psycopg" in lowered and "+psycopg2" not in lowered:
+            connect_args["prepare_threshold"] = None
+        elif "+asyncpg" in lowered:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+
+    return options
+
+
+def _attach_timing_events(eng):
+    @event.listens_for(eng, "do_connect")
+    def _mark_connect_start(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(eng, "connect")
+    def _record_connect(dbapi_connection, conn_rec):
+        started = conn_rec.info.pop("connect_started", None)
+        if started is not None:
+            pool_timings.record_connect((time.perf_counter() - started) * 1000)
+
+
+def pool_stats() -> dict:
+    """Current pool mode, occupancy and checkout/handshake timings."""
+    stats = {"mode": DB_POOL_MODE, **pool_timings.snapshot()}
+    pool = getattr(engine, "pool", None)
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    return stats
+
+
 # ==========================================================
 # ENGINE / SESSION
 # ==========================================================
 try:
-    engine = create_engine(
-        DATABASE_URL,
-        poolclass=NullPool,          # good for Supabase
-        echo=False,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        connect_args={
-            "connect_timeout": 15,
-            "keepalives": 1,
-            "keepalives_idle": 30,
-            "keepalives_interval": 10,
-            "keepalives_count": 5
-        } if "postgresql" in DATABASE_URL.lower() else {}
-    )
-    db_session = scoped_session(sessionmaker(bind=engine, autoflush=False, autocommit=False))
+    engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+    _attach_timing_events(engine)
+    SessionFactory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    db_session = scoped_session(SessionFactory)
     Base.metadata.bind = engine
-    logger.info("✅ Database connection established")
+    logger.info(f"✅ Database connection established (pool mode: {DB_POOL_MODE})")
 except Exception as e:
     logger.error(f"❌ Failed to establish database connection: {str(e)}", exc_info=True)
     raise
@@ -204,6 +356,115 @@ def get_user_by_id(user_id: int, retries: int = 3):
     return None
 
 
+# ==========================================================
+# USER IDENTITY CACHE (Flask-Login user_loader)
+# ==========================================================
+# Flask-Login reloads the user on every request. Instead of a SELECT per hit
+# we keep small detached snapshots in a per-process TTL+LRU cache. Admin
+# mutations below invalidate the entry immediately in this worker; other
+# workers converge within USER_CACHE_TTL seconds.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+
+class UserSnapshot(UserMixin):
+    """Lightweight, session-free copy of the fields current_user needs."""
+    __slots__ = ("id", "username", "full_name", "role", "department", "is_active")
+
+    def __init__(self, id, username, full_name, role, department, is_active):
+        self.id = id
+        self.username = username
+        self.full_name = full_name
+        self.role = role
+        self.department = department
+        self.is_active = bool(is_active)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            full_name=user.full_name,
+            role=user.role,
+            department=user.department,
+            is_active=user.is_active if user.is_active is not None else True,
+        )
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.username} ({self.role}) dept={self.department}>"
+
+
+class _UserCache:
+    """Thread-safe TTL + LRU map of user_id -> UserSnapshot."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at <= now:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return snapshot
+
+    def put(self, snapshot: UserSnapshot):
+        with self._lock:
+            self._data[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+            self._data.move_to_end(snapshot.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._data.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = _UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+
+
+def invalidate_user(user_id: int):
+    """Drop a cached user snapshot (call after any change to the user row)."""
+    try:
+        user_cache.invalidate(int(user_id))
+    except (TypeError, ValueError):
+        pass
+
+
+def get_cached_user(user_id: int):
+    """
+    Flask-Login loader: cached detached snapshot, DB only on miss/expiry.
+    Returns None for missing or deactivated users.
+    """
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = get_user_by_id(user_id)
+        if not user:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.put(snapshot)
+
+    if not snapshot.is_active:
+        return None
+    return snapshot
+
+
 def get_user_by_username(username: str):
     """Get user by username (case-insensitive)."""
     if not db_session:
@@ -323,6 +584,7 @@ def admin_delete_user(user_id: int):
             return False
         db_session.delete(user)
         db_session.commit()
+        invalidate_user(user_id)
         return True
     except Exception as e:
         logger.error(f"Error deleting user: {str(e)}", exc_info=True)
@@ -340,6 +602,7 @@ def admin_set_active(user_id: int, is_active: bool):
         user.is_active = bool(is_active)
         user.updated_at = datetime.utcnow()
         db_session.commit()
+        invalidate_user(user_id)
         db_session.refresh(user)
         return user
     except Exception as e:
@@ -368,6 +631,7 @@ def admin_set_password(user_id: int, new_password: str):
         user.password_hash = generate_password_hash(new_password)
         user.updated_at = datetime.utcnow()
         db_session.commit()
+        invalidate_user(user_id)
         db_session.refresh(user)
         return user
 
@@ -380,6 +644,62 @@ def admin_set_password(user_id: int, new_password: str):
 # ==========================================================
 # ACTIVITY LOGGING
 # ==========================================================
+# ACTIVITY_LOG_MODE:
+#   - "async" (default): rows are held on the caller's session and handed to
+#     the background ActivitySink only after that session commits, so a
+#     failed log never rolls back the caller and a rolled-back request never
+#     logs. The sink writes them in bulk.
+#   - "sync": legacy add + flush inside the caller's transaction (tests).
+ACTIVITY_LOG_MODE = (os.getenv("ACTIVITY_LOG_MODE") or "async").strip().lower()
+
+activity_sink = ActivitySink(engine)
+register_shutdown(activity_sink)
+
+_PENDING_ACTIVITIES = "pending_activities"
+
+
+@event.listens_for(SessionFactory, "after_commit")
+def _publish_pending_activities(session):
+    for row in session.info.pop(_PENDING_ACTIVITIES, ()):
+        activity_sink.submit(row)
+
+
+@event.listens_for(SessionFactory, "after_soft_rollback")
+def _discard_pending_activities(session, previous_transaction):
+    # fires on every rollback() call, even if no SQL was emitted yet
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_ACTIVITIES, None)
+
+
+def _activity_row(
+    department: str,
+    activity_type: str,
+    description: str,
+    patient_name: str | None = None,
+    patient_id: str | None = None,
+    performed_by: str | None = None,
+    metadata: dict | None = None,
+) -> dict:
+    return {
+        "department": (department or "").strip() or "unknown",
+        "activity_type": (activity_type or "").strip() or "unknown",
+        "description": (description or "").strip() or "",
+        "patient_name": (patient_name or None),
+        "patient_id": (patient_id or None),
+        "performed_by": (performed_by or "system"),
+        "activity_metadata": metadata or None,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _queue_activities(rows: list[dict]):
+    session = db_session()
+    # make sure the caller's commit/rollback fires our session events
+    if not session.in_transaction():
+        session.begin()
+    session.info.setdefault(_PENDING_ACTIVITIES, []).extend(rows)
+
+
 def log_activity(
     department: str,
     activity_type: str,
@@ -400,21 +720,23 @@ def log_activity(
       - performed_by
       - activity_metadata
       - created_at
+
+    Async mode: queued until the caller commits; returns the row dict.
+    Sync mode: returns the flushed Activity.
     """
     try:
         from models import Activity
 
-        activity = Activity(
-            department=(department or "").strip() or "unknown",
-            activity_type=(activity_type or "").strip() or "unknown",
-            description=(description or "").strip() or "",
-            patient_name=(patient_name or None),
-            patient_id=(patient_id or None),
-            performed_by=(performed_by or "system"),
-            activity_metadata=metadata or None,
-            created_at=datetime.utcnow(),
+        row = _activity_row(
+            department, activity_type, description,
+            patient_name, patient_id, performed_by, metadata,
         )
 
+        if ACTIVITY_LOG_MODE != "sync":
+            _queue_activities([row])
+            return row
+
+        activity = Activity(**row)
         db_session.add(activity)
         # Do NOT commit here if caller will commit; flush is safer.
         db_session.flush()
@@ -422,8 +744,34 @@ def log_activity(
 
     except Exception as e:
         logger.warning(f"log_activity failed (ignored): {str(e)}", exc_info=True)
-        try:
-            db_session.rollback()
-        except Exception:
-            pass
-        return None
\ No newline at end of file
+        if ACTIVITY_LOG_MODE == "sync":
+            try:
+                db_session.rollback()
+            except Exception:
+                pass
+        return None
+
+
+def log_activities(entries: list[dict]) -> int:
+    """
+    Log several activities at once (e.g. bulk registration). Each entry
+    takes log_activity()'s keyword arguments. Async mode queues them for
+    the sink like log_activity(); sync mode writes one multi-row INSERT
+    in the caller's transaction. Returns the number of rows logged.
+    """
+    if not entries:
+        return 0
+    try:
+        from sqlalchemy import insert
+        from models import Activity
+
+        rows = [_activity_row(**entry) for entry in entries]
+        if ACTIVITY_LOG_MODE != "sync":
+            _queue_activities(rows)
+        else:
+            db_session.execute(insert(Activity), rows)
+        return len(rows)
+
+    except Exception as e:
+        logger.warning(f"log_activities failed (ignored): {str(e)}", exc_info=True)
+        return 0
@@ -0,0 +1,64 @@
+"""Add department_messages indexes for chat access patterns
+
+Revision ID: 3c9a1f2e7b40
+Revises: 04232db42ae6
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1f2e7b40'
+down_revision: Union[str, None] = '04232db42ae6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    # inbox / poll: receiver_department = ? ORDER BY created_at
+    'ix_department_messages_receiver_created': ['receiver_department', 'created_at'],
+    # conversation / history / clear: (sender, receiver) pair ORDER BY created_at
+    'ix_department_messages_pair_created': ['sender_department', 'receiver_department', 'created_at'],
+}
+
+
+def _ddl_block():
+    # CONCURRENTLY cannot run inside a transaction; avoids locking out chat writes
+    if op.get_bind().dialect.name == 'postgresql':
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    # department_messages may have been created by init_db() rather than a migration
+    from sqlalchemy import inspect
+
+    bind = op.get_bind()
+    if 'department_messages' not in inspect(bind).get_table_names():
+        return
+
+    with _ddl_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name,
+                'department_messages',
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with _ddl_block():
+        for name in INDEXES:
+            op.drop_index(
+                name,
+                table_name='department_messages',
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
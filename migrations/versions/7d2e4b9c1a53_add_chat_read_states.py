@@ -0,0 +1,39 @@
+"""Add chat_read_states unread counter table
+
+Revision ID: 7d2e4b9c1a53
+Revises: 3c9a1f2e7b40
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4b9c1a53'
+down_revision: Union[str, None] = '3c9a1f2e7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_read_states',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('counterpart', sa.String(length=100), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        # also serves the "WHERE department = ?" badge lookup
+        sa.UniqueConstraint('department', 'counterpart', name='uq_chat_read_states_department_counterpart')
+    )
+    # Counters start at zero; existing messages are treated as read.
+
+
+def downgrade() -> None:
+    op.drop_table('chat_read_states')
@@ -0,0 +1,129 @@
+"""Partition activities by day (Postgres native range partitioning)
+
+Revision ID: 9b5f0c3d8e21
+Revises: 7d2e4b9c1a53
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from datetime import date, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b5f0c3d8e21'
+down_revision: Union[str, None] = '7d2e4b9c1a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS_SQL = """
+    department VARCHAR(100) NOT NULL,
+    activity_type VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    patient_name VARCHAR(255),
+    patient_id VARCHAR(100),
+    performed_by VARCHAR(255) NOT NULL,
+    activity_metadata JSON,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+"""
+COLUMN_NAMES = (
+    "id, department, activity_type, description, patient_name, "
+    "patient_id, performed_by, activity_metadata, created_at"
+)
+DAYS_AHEAD = 7
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'activities'"
+    )).scalar())
+
+
+def upgrade() -> None:
+    # Runs as one transaction: `activities` is locked (writers wait) while
+    # every row is copied, so run it in a maintenance window on large
+    # tables.
+    bind = op.get_bind()
+    # SQLite/dev keeps a plain table; retention falls back to batched deletes
+    if bind.dialect.name != 'postgresql' or _is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE activities RENAME TO activities_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS activities_pkey RENAME TO activities_unpartitioned_pkey")
+
+    seq = bind.execute(sa.text(
+        "SELECT pg_get_serial_sequence('activities_unpartitioned', 'id')"
+    )).scalar()
+    if not seq:
+        op.execute("CREATE SEQUENCE activities_id_seq")
+        op.execute(
+            "SELECT setval('activities_id_seq', "
+            "COALESCE((SELECT MAX(id) FROM activities_unpartitioned), 0) + 1, false)"
+        )
+        seq = 'activities_id_seq'
+
+    # the partition key must be part of the primary key
+    op.execute(f"""
+        CREATE TABLE activities (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'::regclass),
+            {COLUMNS_SQL},
+            CONSTRAINT activities_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    today = date.today()
+    # everything already stored lands in one "before today" partition,
+    # which retention detaches like any other day once it ages out
+    op.execute(
+        f"CREATE TABLE activities_p_before_{today:%Y%m%d} PARTITION OF activities "
+        f"FOR VALUES FROM (MINVALUE) TO ('{today.isoformat()}')"
+    )
+    # today + DAYS_AHEAD, plus any later day already in the data (future-dated
+    # rows), so nothing is copied into the default partition
+    days = {today + timedelta(days=offset) for offset in range(DAYS_AHEAD + 1)}
+    days.update(bind.execute(sa.text(
+        "SELECT DISTINCT created_at::date FROM activities_unpartitioned WHERE created_at >= :today"
+    ), {"today": today}).scalars())
+    for day in sorted(days):
+        op.execute(
+            f"CREATE TABLE activities_p{day:%Y%m%d} PARTITION OF activities "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        )
+    # safety net if the daily maintenance job ever misses creating a partition
+    op.execute("CREATE TABLE activities_default PARTITION OF activities DEFAULT")
+
+    op.execute(
+        f"INSERT INTO activities ({COLUMN_NAMES}) "
+        f"SELECT {COLUMN_NAMES} FROM activities_unpartitioned"
+    )
+    op.execute(f"ALTER SEQUENCE {seq} OWNED BY activities.id")
+    op.execute("DROP TABLE activities_unpartitioned")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _is_partitioned(bind):
+        return
+
+    seq = bind.execute(sa.text("SELECT pg_get_serial_sequence('activities', 'id')")).scalar()
+
+    op.execute("ALTER TABLE activities RENAME TO activities_partitioned")
+    op.execute("ALTER INDEX IF EXISTS activities_pkey RENAME TO activities_partitioned_pkey")
+    op.execute(f"""
+        CREATE TABLE activities (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'::regclass),
+            {COLUMNS_SQL},
+            CONSTRAINT activities_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(
+        f"INSERT INTO activities ({COLUMN_NAMES}) "
+        f"SELECT {COLUMN_NAMES} FROM activities_partitioned"
+    )
+    op.execute(f"ALTER SEQUENCE {seq} OWNED BY activities.id")
+    # dropping the parent drops every partition with it
+    op.execute("DROP TABLE activities_partitioned")
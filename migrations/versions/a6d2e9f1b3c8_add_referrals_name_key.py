@@ -0,0 +1,62 @@
+"""Add a normalized, unique referrals.name_key and merge duplicate referrers
+
+Revision ID: a6d2e9f1b3c8
+Revises: f3c1a8d5b7e2
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2e9f1b3c8'
+down_revision: Union[str, None] = 'f3c1a8d5b7e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+referrals = sa.table(
+    'referrals',
+    sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('name_key', sa.String),
+)
+patients = sa.table('patients', sa.column('referred_by_id', sa.Integer))
+
+
+def _backfill_and_merge(bind):
+    # same key the app uses (services/normalization.referral_key)
+    from services.normalization import referral_key
+
+    keep = {}      # name_key -> oldest referral id
+    merged = {}    # duplicate id -> kept id
+    for row in bind.execute(sa.select(referrals.c.id, referrals.c.name).order_by(referrals.c.id)):
+        key = referral_key(row.name)[:255]
+        if key in keep:
+            merged[row.id] = keep[key]
+        else:
+            keep[key] = row.id
+            bind.execute(referrals.update().where(referrals.c.id == row.id).values(name_key=key))
+
+    for duplicate_id, kept_id in merged.items():
+        bind.execute(
+            patients.update().where(patients.c.referred_by_id == duplicate_id).values(referred_by_id=kept_id)
+        )
+    if merged:
+        bind.execute(referrals.delete().where(referrals.c.id.in_(list(merged))))
+
+
+def upgrade() -> None:
+    op.add_column('referrals', sa.Column('name_key', sa.String(length=255), nullable=True))
+    _backfill_and_merge(op.get_bind())
+    with op.batch_alter_table('referrals') as batch_op:
+        batch_op.alter_column('name_key', existing_type=sa.String(length=255), nullable=False)
+        batch_op.create_unique_constraint('uq_referrals_name_key', ['name_key'])
+
+
+def downgrade() -> None:
+    # merged duplicate referrers are not restored
+    with op.batch_alter_table('referrals') as batch_op:
+        batch_op.drop_constraint('uq_referrals_name_key', type_='unique')
+        batch_op.drop_column('name_key')
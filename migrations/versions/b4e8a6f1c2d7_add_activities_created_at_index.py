@@ -0,0 +1,33 @@
+"""Add activities (created_at, department) index for today-feeds
+
+Revision ID: b4e8a6f1c2d7
+Revises: 9b5f0c3d8e21
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8a6f1c2d7'
+down_revision: Union[str, None] = '9b5f0c3d8e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # On the partitioned Postgres table this cascades to every partition,
+    # and partitions created later inherit it automatically.
+    op.create_index(
+        'ix_activities_created_at_department',
+        'activities',
+        ['created_at', 'department'],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activities_created_at_department', table_name='activities', if_exists=True)
@@ -0,0 +1,57 @@
+"""Add patients (sort column, id) indexes for the records API
+
+Revision ID: c5f1d7a2e9b3
+Revises: b4e8a6f1c2d7
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f1d7a2e9b3'
+down_revision: Union[str, None] = 'b4e8a6f1c2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# file_no / patient_id already have unique indexes
+INDEXES = {
+    'ix_patients_created_at_id': ['created_at', 'id'],
+    'ix_patients_last_name_id': ['last_name', 'id'],
+    'ix_patients_first_name_id': ['first_name', 'id'],
+}
+
+
+def _ddl_block():
+    # CONCURRENTLY cannot run inside a transaction; keeps registration writable
+    if op.get_bind().dialect.name == 'postgresql':
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    with _ddl_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name,
+                'patients',
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with _ddl_block():
+        for name in INDEXES:
+            op.drop_index(
+                name,
+                table_name='patients',
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
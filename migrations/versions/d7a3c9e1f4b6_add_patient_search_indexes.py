@@ -0,0 +1,61 @@
+"""Add pg_trgm / tsvector patient search indexes
+
+Revision ID: d7a3c9e1f4b6
+Revises: c5f1d7a2e9b3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3c9e1f4b6'
+down_revision: Union[str, None] = 'c5f1d7a2e9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# expressions must match services/patient_search.PG_SEARCH_SQL exactly
+SEARCH_VECTOR_SQL = (
+    "to_tsvector('simple', "
+    "coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+    "coalesce(file_no, '') || ' ' || coalesce(patient_id, '') || ' ' || coalesce(email, ''))"
+)
+
+INDEXES = {
+    'ix_patients_search_vector': "USING gin (search_vector)",
+    'ix_patients_name_trgm': "USING gin ((lower(first_name || ' ' || last_name)) gin_trgm_ops)",
+    'ix_patients_file_no_trgm': "USING gin ((lower(file_no)) gin_trgm_ops)",
+    'ix_patients_phone_trgm': "USING gin (phone gin_trgm_ops)",
+}
+
+
+def upgrade() -> None:
+    # SQLite/dev uses the in-process index in services/patient_search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        f"ALTER TABLE patients ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    )
+
+    # CONCURRENTLY cannot run inside a transaction; keeps registration writable
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON patients {definition}")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute("ALTER TABLE patients DROP COLUMN IF EXISTS search_vector")
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,95 @@
+"""Add patient duplicate-detection blocking keys
+
+Revision ID: e2b8f4a6c1d9
+Revises: d7a3c9e1f4b6
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8f4a6c1d9'
+down_revision: Union[str, None] = 'd7a3c9e1f4b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    'ix_patients_match_phone': ['match_phone'],
+    'ix_patients_match_dob_name': ['match_dob_name'],
+}
+BACKFILL_BATCH = 5000
+
+
+def _ddl_block():
+    # CONCURRENTLY cannot run inside a transaction; keeps registration writable
+    if op.get_bind().dialect.name == 'postgresql':
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def _backfill(bind):
+    # same key derivation the app uses on insert (soundex is not built into SQLite)
+    from services.patient_dedupe import match_keys
+
+    patients = sa.table(
+        'patients',
+        sa.column('id', sa.Integer), sa.column('last_name', sa.String),
+        sa.column('date_of_birth', sa.Date), sa.column('phone', sa.String),
+        sa.column('match_phone', sa.String), sa.column('match_dob_name', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(patients.c.id, patients.c.last_name, patients.c.date_of_birth, patients.c.phone)
+            .where(patients.c.id > last_id)
+            .order_by(patients.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            patients.update()
+            .where(patients.c.id == sa.bindparam('row_id'))
+            .values(match_phone=sa.bindparam('phone_key'), match_dob_name=sa.bindparam('dob_key')),
+            [
+                {'row_id': r.id, 'phone_key': keys['match_phone'], 'dob_key': keys['match_dob_name']}
+                for r in rows
+                for keys in [match_keys(r.last_name, r.date_of_birth, r.phone)]
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('patients', sa.Column('match_phone', sa.String(length=20), nullable=True))
+    op.add_column('patients', sa.Column('match_dob_name', sa.String(length=20), nullable=True))
+    _backfill(op.get_bind())
+
+    with _ddl_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name,
+                'patients',
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with _ddl_block():
+        for name in INDEXES:
+            op.drop_index(
+                name,
+                table_name='patients',
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
+    op.drop_column('patients', 'match_dob_name')
+    op.drop_column('patients', 'match_phone')
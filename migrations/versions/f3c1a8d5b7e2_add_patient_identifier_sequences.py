@@ -0,0 +1,52 @@
+"""Add sequences for patient file numbers and patient IDs
+
+Revision ID: f3c1a8d5b7e2
+Revises: e2b8f4a6c1d9
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c1a8d5b7e2'
+down_revision: Union[str, None] = 'e2b8f4a6c1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FILE_NO_SEQUENCE = 'patient_file_no_seq'
+
+
+def upgrade() -> None:
+    # counters for databases without sequences (SQLite dev/test)
+    op.create_table(
+        'identifier_counters',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Earlier ids (F-<8 hex>, EPN-<year>-<8 hex>) are wider than the
+    # zero-padded sequence numbers, so the two can never collide.
+    op.execute(f'CREATE SEQUENCE IF NOT EXISTS {FILE_NO_SEQUENCE}')
+    # later years are created on first use (services/identifiers.py)
+    op.execute(f'CREATE SEQUENCE IF NOT EXISTS patient_id_{datetime.now().year}_seq')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        years = bind.execute(sa.text(
+            "SELECT relname FROM pg_class WHERE relkind = 'S' AND relname ~ '^patient_id_[0-9]{4}_seq$'"
+        )).scalars().all()
+        for name in years:
+            op.execute(f'DROP SEQUENCE IF EXISTS {name}')
+        op.execute(f'DROP SEQUENCE IF EXISTS {FILE_NO_SEQUENCE}')
+    op.drop_table('identifier_counters')
@@ -3,7 +3,7 @@
 # SQLAlchemy Models for Supabase Postgres
 # ==========================================================
 from flask_login import UserMixin
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Numeric, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Numeric, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime as dt
 
@@ -45,8 +45,17 @@ class User(Base, UserMixin):
 
 
 class Activity(Base):
-    """Activity log for real-time updates across all departments."""
+    """
+    Activity log for real-time updates across all departments.
+    On Postgres the table is range-partitioned by day on created_at with
+    PRIMARY KEY (id, created_at) — see migration 9b5f0c3d8e21. The ORM only
+    needs `id` for identity; create_all() (SQLite/dev) builds a plain table.
+    """
     __tablename__ = 'activities'
+    __table_args__ = (
+        # today-feeds: created_at >= midnight [AND department = ?] ORDER BY created_at DESC
+        Index('ix_activities_created_at_department', 'created_at', 'department'),
+    )
 
     id = Column(Integer, primary_key=True)
     department = Column(String(100), nullable=False)
@@ -58,7 +67,9 @@ class Activity(Base):
     activity_metadata = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=dt.utcnow, nullable=False)
 
-    def to_dict(self):
+    def to_dict(self, include_metadata=True):
+        # the JSON blob is only loaded when asked for (activity_services.feed_query);
+        # otherwise 'metadata' is null, so the response keeps the same keys
         return {
             'id': self.id,
             'department': self.department,
@@ -67,7 +78,7 @@ class Activity(Base):
             'patient_name': self.patient_name,
             'patient_id': self.patient_id,
             'performed_by': self.performed_by,
-            'metadata': self.activity_metadata,
+            'metadata': self.activity_metadata if include_metadata else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -76,8 +87,23 @@ class Activity(Base):
 
 
 class Patient(Base):
-    """Patient registration model for customer care."""
+    """
+    Patient registration model for customer care.
+
+    On Postgres the table also has an unmapped generated `search_vector`
+    tsvector column plus pg_trgm GIN indexes (migration d7a3c9e1f4b6),
+    used by services/patient_search.py.
+    """
     __tablename__ = 'patients'
+    __table_args__ = (
+        # records workspace keyset pagination: ORDER BY <col>, id
+        Index('ix_patients_created_at_id', 'created_at', 'id'),
+        Index('ix_patients_last_name_id', 'last_name', 'id'),
+        Index('ix_patients_first_name_id', 'first_name', 'id'),
+        # duplicate detection blocking keys (services/patient_dedupe.py)
+        Index('ix_patients_match_phone', 'match_phone'),
+        Index('ix_patients_match_dob_name', 'match_dob_name'),
+    )
 
     id = Column(Integer, primary_key=True)
     file_no = Column(String(50), unique=True, nullable=False)
@@ -98,6 +124,8 @@ class Patient(Base):
     registration_date = Column(Date, nullable=True)
     category = Column(String(100), nullable=True)
     is_test = Column(Boolean, default=False, nullable=False)
+    match_phone = Column(String(20), nullable=True)
+    match_dob_name = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=dt.utcnow, nullable=False)
     updated_at = Column(DateTime, default=dt.utcnow, onupdate=dt.utcnow, nullable=False)
 
@@ -134,9 +162,14 @@ class Patient(Base):
 class Referral(Base):
     """Referral sources (doctors, hospitals, clinics)."""
     __tablename__ = 'referrals'
+    __table_args__ = (
+        # one row per name regardless of case/spacing (services/referrals.py)
+        UniqueConstraint('name_key', name='uq_referrals_name_key'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
+    name_key = Column(String(255), nullable=False)   # normalization.referral_key(name)
     type = Column(String(50), nullable=False)
     contact = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=dt.utcnow, nullable=False)
@@ -219,6 +252,12 @@ class Drug(Base):
 class DepartmentMessage(Base):
     """Inter-department direct messaging system."""
     __tablename__ = 'department_messages'
+    __table_args__ = (
+        # inbox / poll: messages TO a department, time ordered
+        Index('ix_department_messages_receiver_created', 'receiver_department', 'created_at'),
+        # conversation / history / clear: one direction of a department pair
+        Index('ix_department_messages_pair_created', 'sender_department', 'receiver_department', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     sender_department = Column(String(100), nullable=False)
@@ -236,4 +275,46 @@ class DepartmentMessage(Base):
         }
 
     def __repr__(self):
-        return f'<DepartmentMessage {self.sender_department} → {self.receiver_department}>'
\ No newline at end of file
+        return f'<DepartmentMessage {self.sender_department} → {self.receiver_department}>'
+
+
+class ChatReadState(Base):
+    """Per-(department, counterpart) unread counter, maintained on send / mark-read."""
+    __tablename__ = 'chat_read_states'
+    __table_args__ = (
+        UniqueConstraint('department', 'counterpart', name='uq_chat_read_states_department_counterpart'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    department = Column(String(100), nullable=False)       # the reader
+    counterpart = Column(String(100), nullable=False)      # who they are reading from
+    unread_count = Column(Integer, default=0, nullable=False)
+    last_message_id = Column(Integer, nullable=True)       # newest inbound message
+    last_read_message_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=dt.utcnow, onupdate=dt.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'department': self.department,
+            'counterpart': self.counterpart,
+            'unread': self.unread_count,
+            'last_message_id': self.last_message_id,
+            'last_read_message_id': self.last_read_message_id,
+        }
+
+    def __repr__(self):
+        return f'<ChatReadState {self.department} ← {self.counterpart}: {self.unread_count}>'
+
+
+class IdentifierCounter(Base):
+    """
+    Named counter behind services/identifiers.py on databases without
+    sequences (SQLite dev/test). Postgres uses real sequences instead.
+    """
+    __tablename__ = 'identifier_counters'
+
+    name = Column(String(100), primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<IdentifierCounter {self.name}={self.value}>'
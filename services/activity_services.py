@@ -6,31 +6,41 @@ from datetime import datetime, date
 from db import db_session
 from models import Activity
 from sqlalchemy import desc
+from sqlalchemy.orm import load_only
+
+# Columns the feeds need; activity_metadata (JSON) is skipped by default
+FEED_COLUMNS = (
+    Activity.id,
+    Activity.department,
+    Activity.activity_type,
+    Activity.description,
+    Activity.patient_name,
+    Activity.patient_id,
+    Activity.performed_by,
+    Activity.created_at,
+)
+
+
+def feed_query(include_metadata: bool = False):
+    """Activity query with a lean column projection unless metadata is wanted."""
+    query = db_session.query(Activity)
+    if not include_metadata:
+        query = query.options(load_only(*FEED_COLUMNS))
+    return query
+
 
 # Fetch all activities from today
-def get_today_activities():
+def get_today_activities(include_metadata: bool = False):
     today = date.today()
     today_start = datetime.combine(today, datetime.min.time())
 
     activities = (
-        db_session.query(Activity)
+        feed_query(include_metadata)
         .filter(Activity.created_at >= today_start)
         .order_by(desc(Activity.created_at))
         .all()
     )
 
-    return [a.to_dict() for a in activities]
-
-# Remove older activity logs
-def cleanup_old_activities():
-    today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-
-    deleted = (
-        db_session.query(Activity)
-        .filter(Activity.created_at < today_start)
-        .delete()
-    )
+    return [a.to_dict(include_metadata=include_metadata) for a in activities]
 
-    db_session.commit()
-    return deleted
+# Retention (partition drop / archive) lives in services/maintenance.py
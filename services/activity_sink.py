@@ -0,0 +1,218 @@
+# ==========================================================
+# Activity Sink — activity_sink.py
+# Buffered, bulk writer for the activities table
+# ==========================================================
+#
+# db.log_activity() hands finished rows here once the caller's
+# transaction commits. A single background thread drains the bounded
+# queue and writes batches with one executemany INSERT per batch, on
+# whichever comes first: ACTIVITY_BATCH_SIZE rows or
+# ACTIVITY_FLUSH_INTERVAL seconds.
+#
+# Backpressure (ACTIVITY_BACKPRESSURE) when the queue is full:
+#   - "drop"   : discard the new row and count it (never slows a request)
+#   - "block"  : wait up to ACTIVITY_BLOCK_TIMEOUT seconds, then drop
+#   - "inline" : write the row immediately on the caller's thread
+# ==========================================================
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models import Activity
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "200"))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "1.0"))
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+ACTIVITY_BACKPRESSURE = (os.getenv("ACTIVITY_BACKPRESSURE") or "drop").strip().lower()
+ACTIVITY_BLOCK_TIMEOUT = float(os.getenv("ACTIVITY_BLOCK_TIMEOUT", "0.5"))
+
+_STOP = object()
+
+
+class ActivitySink:
+    """Bounded in-memory buffer + background bulk INSERT into activities."""
+
+    def __init__(
+        self,
+        engine,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL,
+        max_queue: int = ACTIVITY_QUEUE_SIZE,
+        backpressure: str = ACTIVITY_BACKPRESSURE,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._flush_requests = queue.Queue()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    # ------------------------------------------------------
+    # PRODUCER SIDE
+    # ------------------------------------------------------
+    def submit(self, row: dict):
+        """Queue one activities row (dict of column values)."""
+        if self._closed:
+            self._write([row])
+            return
+
+        self._ensure_worker()
+        try:
+            if self.backpressure == "block":
+                self._queue.put(row, timeout=ACTIVITY_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            if self.backpressure == "inline":
+                self._write([row])
+                return
+            with self._lock:
+                self.dropped += 1
+            logger.warning("Activity queue full; dropping activity row")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ask the worker to write everything queued so far; wait for it."""
+        if not self._thread or not self._thread.is_alive():
+            self._drain_inline()
+            return True
+        done = threading.Event()
+        self._flush_requests.put(done)
+        try:
+            self._queue.put_nowait(None)  # wake the worker
+        except queue.Full:
+            pass
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush and stop the worker (registered with atexit)."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._drain_inline()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "backpressure": self.backpressure,
+            }
+
+    # ------------------------------------------------------
+    # WORKER SIDE
+    # ------------------------------------------------------
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="activity-sink", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+
+        while not stopping:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                elif item is not None:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            # snapshot the waiters first: every row they submitted is
+            # already queued, so the drain below covers all of them
+            waiters = self._take_flush_requests()
+            flush_wanted = bool(waiters)
+            if flush_wanted or stopping:
+                batch.extend(self._take_queued())
+
+            if batch and (
+                stopping
+                or flush_wanted
+                or len(batch) >= self.batch_size
+                or time.monotonic() >= deadline
+            ):
+                self._write(batch)
+                batch = []
+
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+            # only the waiters whose rows were in this batch; later
+            # requests are answered after the next drain
+            for done in waiters:
+                done.set()
+
+    def _take_flush_requests(self) -> list:
+        waiters = []
+        while True:
+            try:
+                waiters.append(self._flush_requests.get_nowait())
+            except queue.Empty:
+                return waiters
+
+    def _take_queued(self) -> list:
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if item is _STOP:
+                self._queue.put(_STOP)
+                return rows
+            if item is not None:
+                rows.append(item)
+
+    def _drain_inline(self):
+        rows = self._take_queued()
+        for start in range(0, len(rows), self.batch_size):
+            self._write(rows[start:start + self.batch_size])
+
+    def _write(self, rows: list):
+        for attempt in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(Activity.__table__), rows)
+                with self._lock:
+                    self.written += len(rows)
+                return
+            except Exception as e:
+                if attempt == 0:
+                    time.sleep(0.2)
+                    continue
+                with self._lock:
+                    self.failed += len(rows)
+                logger.error(f"Activity batch write failed ({len(rows)} rows dropped): {str(e)[:200]}")
+
+
+def register_shutdown(sink: ActivitySink):
+    atexit.register(sink.close)
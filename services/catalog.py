@@ -0,0 +1,522 @@
+# ==========================================================
+# Service Catalog — catalog.py
+# Lab tests, drugs and general services, loaded once per worker
+#
+#   source   : static/services/{lab,drugs,general}.csv (CATALOG_DIR)
+#   search   : GET /api/catalog/search?q=&scope=&limit=
+#   snapshot : GET /api/catalog/version → hash + URL of the compiled
+#              catalog, GET /api/catalog/snapshot/<hash>.json (immutable)
+#   build    : flask --app app build-catalog  (writes the snapshot to
+#              CATALOG_SNAPSHOT_DIR so workers skip CSV parsing)
+#
+# Every item keeps its name, category, key and three prices (integer
+# kobo; None for "N/A"). Keys are unique: repeats in the CSVs get a
+# "~2", "~3", ... suffix (unique_keys), and search results, the
+# snapshot and the price table all use the same key.
+# Search uses two in-memory indexes built at load time, so a query
+# touches only matching items:
+#   token index  : normalized word / alias → item ids
+#   prefix index : first PREFIX_MIN..PREFIX_MAX chars of a token → item ids
+# Aliases (acronyms, joined words, bracket parts) and query synonyms
+# follow the matching rules services_register.js used in the browser.
+# ==========================================================
+
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import click
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = os.getenv("CATALOG_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "services"
+)
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "catalog"
+)
+SCOPES = ("lab", "drugs", "general")
+PRICE_TYPES = ("outsourced", "walkin", "hospital")
+
+SEARCH_MIN_CHARS = 2
+SEARCH_DEFAULT_LIMIT = 10     # per scope for "all", like the old client-side list
+SEARCH_MAX_LIMIT = 50
+PREFIX_MIN = 3                # shorter terms must match a whole word/alias
+PREFIX_MAX = 12
+
+# query word → extra terms (same map services_register.js shipped)
+SYNONYMS = {
+    "malaria": ["mp", "malaria parasite", "malarial parasite", "parasite", "thick film", "thin film"],
+    "typhoid": ["widals", "widal", "widal test"],
+    "pregnancy": ["hcg", "beta hcg", "pt", "preg test"],
+    "diabetes": ["fbs", "rbs", "hb a1c", "hba1c", "blood sugar"],
+    "hiv": ["retroviral", "screening", "elisa"],
+    "hepatitis": ["hbsag", "hbv", "hcv"],
+    "urine": ["urinalysis", "mcu", "mcs", "m/c/s"],
+}
+
+# CSV header → field, per file layout
+_COLUMNS = {
+    "lab": {
+        "name": "test_name", "category": "test_category", "key": "test_key",
+        "outsourced": "price_outsourced", "walkin": "price_walkin", "hospital": "price_hospital",
+    },
+    "default": {
+        "name": "Name", "category": "Category", "key": None,
+        "outsourced": "Outsourced (B)", "walkin": "Walk in Patient (C)", "hospital": "Hospital Patient (D)",
+    },
+}
+
+_BRACKETED = re.compile(r"\(([^)]+)\)")
+_SEPARATORS = re.compile(r"[_(){}\[\]/\\\-]+")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+_PRICE_JUNK = re.compile(r"[₦,\s]+")
+_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+# ----------------------------------------------------------
+# TEXT + PRICE HELPERS
+# ----------------------------------------------------------
+def norm_text(value) -> str:
+    """Lowercase, accents and punctuation removed, single spaces."""
+    text = unicodedata.normalize("NFKD", str(value or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(" ", _SEPARATORS.sub(" ", text))
+    return _SPACES.sub(" ", text).strip()
+
+
+def acronym(text: str) -> str:
+    words = text.split()
+    return "".join(w[0] for w in words) if len(words) >= 2 else ""
+
+
+def parse_price_kobo(raw) -> int | None:
+    """"₦ 4,000" / "₦5,000.00" → 400000 / 500000; None for N/A or blanks."""
+    value = _PRICE_JUNK.sub("", str(raw or ""))
+    if not value or value.lower() in ("n/a", "na", "-"):
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():      # "NaN", "Infinity"
+        return None
+    return int((amount * 100).to_integral_value())
+
+
+def format_naira(kobo: int | None) -> str:
+    if kobo is None:
+        return "N/A"
+    if kobo % 100:
+        return f"₦{kobo / 100:,.2f}"
+    return f"₦{kobo // 100:,}"
+
+
+def expand_query(query: str) -> list[tuple[str, bool]]:
+    """(term, is_synonym): the query, its joined form and acronym, then synonyms."""
+    q = norm_text(query)
+    if not q:
+        return []
+    terms = {q: False, q.replace(" ", ""): False}
+    if acronym(q):
+        terms.setdefault(acronym(q), False)
+
+    for word in {q, *q.split()}:
+        for synonym in SYNONYMS.get(word, ()):
+            s = norm_text(synonym)
+            for term in (s, s.replace(" ", "")):
+                terms.setdefault(term, True)
+    return list(terms.items())
+
+
+# ----------------------------------------------------------
+# ITEMS
+# ----------------------------------------------------------
+class CatalogItem:
+    """One billable service; prices are integer kobo (None = not offered)."""
+
+    __slots__ = ("scope", "key", "name", "category", "prices", "search_name", "tokens")
+
+    def __init__(self, scope: str, key: str, name: str, category: str, prices: dict):
+        self.scope = scope
+        self.key = key
+        self.name = name
+        self.category = category
+        self.prices = prices
+        self.search_name = norm_text(name)
+        self.tokens = frozenset(self._search_tokens())
+
+    def _search_tokens(self) -> set[str]:
+        """Words plus aliases: acronyms, joined words and bracket parts."""
+        name_parts = [self.name, *_BRACKETED.findall(self.name), _BRACKETED.sub(" ", self.name)]
+        tokens = set()
+        for text in (*name_parts, self.category, self.key):
+            n = norm_text(text)
+            tokens.update(n.split())
+            if n:
+                tokens.add(n.replace(" ", ""))
+        # acronyms from the name only ("Full Blood Count" → "fbc")
+        for text in name_parts:
+            if acronym(norm_text(text)):
+                tokens.add(acronym(norm_text(text)))
+        return tokens
+
+    def to_dict(self) -> dict:
+        return {
+            "scope": self.scope,
+            "key": self.key,
+            "name": self.name,
+            "category": self.category,
+            "prices": {
+                price_type: {
+                    "kobo": kobo,
+                    "n": kobo / 100 if kobo is not None else None,
+                    "label": format_naira(kobo),
+                }
+                for price_type, kobo in self.prices.items()
+            },
+        }
+
+
+def default_key(scope: str, name: str, category: str) -> str:
+    """The key an item gets when its row has none (lab.csv's test_key follows the same rule)."""
+    if scope == "lab":
+        return f"{_SLUG.sub('_', category.lower()).strip('_')}__{_SLUG.sub('_', name.lower()).strip('_')}"
+    return f"{scope}__{name.lower()}__{category.lower()}"
+
+
+def unique_keys(items: list) -> list:
+    """
+    Give every item a distinct key, in place. The CSVs repeat some keys
+    (the same test listed twice at different prices); the second and
+    later items get a "~2", "~3", ... suffix in file order, so the
+    suffix is stable for a given set of CSVs.
+    """
+    seen = set()
+    for item in items:
+        key, n = item.key, 1
+        while key in seen:
+            n += 1
+            key = f"{item.key}~{n}"
+        if key != item.key:
+            logger.warning(f"Duplicate catalog key {item.key!r} ({item.scope}: {item.name}); using {key!r}")
+            item.key = key
+        seen.add(key)
+    return items
+
+
+def read_catalog_items(directory: str = CATALOG_DIR) -> list[CatalogItem]:
+    """Every scope's CSV rows in SCOPES order, with unique keys."""
+    items = []
+    for scope in SCOPES:
+        path = os.path.join(directory, f"{scope}.csv")
+        if os.path.exists(path):
+            items.extend(read_catalog_csv(path, scope))
+        else:
+            logger.warning(f"Catalog file missing: {path}")
+    return unique_keys(items)
+
+
+def read_catalog_csv(path: str, scope: str) -> list[CatalogItem]:
+    columns = _COLUMNS.get(scope, _COLUMNS["default"])
+    items = []
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        for row in csv.DictReader(fh):
+            row = {(k or "").strip(): (v or "").strip() for k, v in row.items()}
+            name = row.get(columns["name"], "")
+            if not name:
+                continue
+            category = row.get(columns["category"], "")
+            key = (row.get(columns["key"]) if columns["key"] else "") or default_key(scope, name, category)
+            prices = {t: parse_price_kobo(row.get(columns[t])) for t in PRICE_TYPES}
+            items.append(CatalogItem(scope, key, name, category, prices))
+    return items
+
+
+# ----------------------------------------------------------
+# COMPILED SNAPSHOT
+# ----------------------------------------------------------
+# One compact JSON document, prices already in kobo:
+#   {"version": 1, "columns": [...], "categories": [...],
+#    "scopes": {"lab": [[name, category index, key, outsourced, walkin,
+#    hospital], ...], ...}}
+# `key` is null when it equals default_key() (so suffixed keys are
+# always stored). The file is named by the
+# hash of its own bytes, so a URL never changes content and clients may
+# cache it forever. catalog.manifest.json records which snapshot was
+# built from which CSV bytes (`source_hash`).
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLUMNS = ("name", "category", "key", *PRICE_TYPES)
+MANIFEST_NAME = "catalog.manifest.json"
+
+
+def source_hash(directory: str = CATALOG_DIR) -> str:
+    digest = hashlib.sha256()
+    for scope in SCOPES:
+        path = os.path.join(directory, f"{scope}.csv")
+        digest.update(scope.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def compile_snapshot(items: list) -> tuple[bytes, str]:
+    """(snapshot bytes, content hash) for a list of CatalogItems."""
+    categories = {}
+    scopes = {}
+    for item in items:
+        category_index = categories.setdefault(item.category, len(categories))
+        key = None if item.key == default_key(item.scope, item.name, item.category) else item.key
+        scopes.setdefault(item.scope, []).append(
+            [item.name, category_index, key, *(item.prices[t] for t in PRICE_TYPES)]
+        )
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "columns": SNAPSHOT_COLUMNS,
+        "categories": list(categories),
+        "scopes": scopes,
+    }
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:16]
+
+
+def items_from_snapshot(body: bytes) -> list:
+    payload = json.loads(body)
+    if payload.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported catalog snapshot version {payload.get('version')}")
+    categories = payload["categories"]
+    items = []
+    for scope, rows in payload["scopes"].items():
+        for name, category_index, key, *prices in rows:
+            category = categories[category_index]
+            items.append(CatalogItem(
+                scope, key or default_key(scope, name, category), name, category,
+                dict(zip(PRICE_TYPES, prices)),
+            ))
+    return items
+
+
+def write_snapshot(source_dir: str = CATALOG_DIR, out_dir: str = CATALOG_SNAPSHOT_DIR) -> dict:
+    """Compile the CSVs into out_dir/catalog.<hash>.json (+ manifest); prune older snapshots."""
+    items = read_catalog_items(source_dir)
+    body, content_hash = compile_snapshot(items)
+
+    os.makedirs(out_dir, exist_ok=True)
+    filename = f"catalog.{content_hash}.json"
+    with open(os.path.join(out_dir, filename), "wb") as fh:
+        fh.write(body)
+    manifest = {
+        "hash": content_hash,
+        "file": filename,
+        "source_hash": source_hash(source_dir),
+        "items": len(items),
+        "bytes": len(body),
+        "built_at": datetime.utcnow().isoformat(),
+    }
+    # manifest last: a worker starting mid-build still sees a complete pair
+    tmp = os.path.join(out_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST_NAME))
+
+    for old in glob.glob(os.path.join(out_dir, "catalog.*.json")):
+        if os.path.basename(old) not in (filename, MANIFEST_NAME):
+            os.remove(old)
+    return manifest
+
+
+def read_snapshot(source_dir: str = CATALOG_DIR, out_dir: str = CATALOG_SNAPSHOT_DIR) -> bytes | None:
+    """The built snapshot's bytes, or None if missing or built from other CSVs."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as fh:
+            manifest = json.load(fh)
+        if manifest.get("source_hash") != source_hash(source_dir):
+            logger.warning("Catalog snapshot is stale (CSVs changed); run `flask build-catalog`")
+            return None
+        with open(os.path.join(out_dir, manifest["file"]), "rb") as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Catalog snapshot unreadable, using CSVs: {str(e)[:200]}")
+        return None
+
+
+# ----------------------------------------------------------
+# INDEXED STORE
+# ----------------------------------------------------------
+class ServiceCatalog:
+    """Items + token/prefix indexes; loaded lazily, then read-only."""
+
+    def __init__(self, directory: str = CATALOG_DIR, snapshot_dir: str = CATALOG_SNAPSHOT_DIR):
+        self.directory = directory
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self.source = None           # "snapshot" | "csv"
+        self.snapshot = None         # compiled snapshot bytes
+        self.snapshot_gzip = None
+        self.snapshot_hash = None
+        self.items = []           # id → CatalogItem
+        self.by_key = {}          # key → CatalogItem (keys are unique)
+        self.by_scope = {}        # scope → [ids] in file order
+        self._tokens = {}         # token → frozenset(ids)
+        self._prefixes = {}       # prefix → frozenset(ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def counts(self) -> dict:
+        self.ensure_loaded()
+        return {scope: len(self.by_scope.get(scope, ())) for scope in SCOPES}
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self._load()
+
+    def reload(self):
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        body = read_snapshot(self.directory, self.snapshot_dir)
+        if body is not None:
+            # snapshots built before keys were de-duplicated may repeat them
+            items, source = unique_keys(items_from_snapshot(body)), "snapshot"
+        else:
+            items, source = read_catalog_items(self.directory), "csv"
+        # same bytes (and hash) whether built ahead of time or compiled here
+        body, content_hash = compile_snapshot(items)
+
+        tokens, prefixes, by_scope, by_key = {}, {}, {}, {}
+        for item_id, item in enumerate(items):
+            by_scope.setdefault(item.scope, []).append(item_id)
+            by_key[item.key] = item
+            for token in item.tokens:
+                tokens.setdefault(token, set()).add(item_id)
+                for n in range(PREFIX_MIN, min(len(token), PREFIX_MAX) + 1):
+                    prefixes.setdefault(token[:n], set()).add(item_id)
+
+        # swap in complete structures; readers never see a half-built index
+        self._tokens = {t: frozenset(ids) for t, ids in tokens.items()}
+        self._prefixes = {p: frozenset(ids) for p, ids in prefixes.items()}
+        self.items, self.by_scope, self.by_key = items, by_scope, by_key
+        self.snapshot, self.snapshot_gzip = body, gzip.compress(body, mtime=0)
+        self.snapshot_hash, self.source = content_hash, source
+        self.loaded_at = time.time()
+        logger.info(
+            f"Service catalog loaded from {source}: {len(items)} items, {len(tokens)} tokens, "
+            f"snapshot {content_hash} in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    # ------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------
+    def get(self, key: str) -> CatalogItem | None:
+        self.ensure_loaded()
+        return self.by_key.get(key)
+
+    def _word_ids(self, word: str) -> frozenset:
+        if len(word) < PREFIX_MIN:
+            return self._tokens.get(word, frozenset())
+        if len(word) <= PREFIX_MAX:
+            return self._prefixes.get(word, frozenset())
+        # longer than the indexed prefixes: narrow by prefix, confirm on tokens
+        ids = self._prefixes.get(word[:PREFIX_MAX], frozenset())
+        return frozenset(i for i in ids if any(
+            t.startswith(word) for t in self.items[i].tokens
+        ))
+
+    def _term_ids(self, term: str) -> frozenset:
+        """Items matching every word of `term`."""
+        ids = None
+        for word in sorted(term.split(), key=len, reverse=True):
+            found = self._word_ids(word)
+            ids = found if ids is None else ids & found
+            if not ids:
+                return frozenset()
+        return ids or frozenset()
+
+    def _score(self, item: CatalogItem, term: str, is_synonym: bool) -> float:
+        name = item.search_name
+        if name == term:
+            score = 4.0
+        elif name.startswith(term):
+            score = 3.0
+        elif all(any(w.startswith(word) for w in name.split()) for word in term.split()):
+            score = 2.0
+        else:
+            score = 1.0      # category / key / alias match only
+        return score * (0.5 if is_synonym else 1.0)
+
+    def search(self, query: str, scope: str = "all", limit: int = SEARCH_DEFAULT_LIMIT) -> list[dict]:
+        """
+        Top `limit` matches (per scope when scope is "all"), best first.
+        A blank (or too short) query on a single scope returns its first
+        `limit` items, for the browse list.
+        """
+        self.ensure_loaded()
+        scopes = SCOPES if scope == "all" else (scope,)
+        terms = expand_query(query) if len(norm_text(query)) >= SEARCH_MIN_CHARS else []
+
+        if not terms:
+            if scope == "all":
+                return []
+            return [self.items[i].to_dict() for i in self.by_scope.get(scope, [])[:limit]]
+
+        best = {}   # item id → score
+        for term, is_synonym in terms:
+            for item_id in self._term_ids(term):
+                score = self._score(self.items[item_id], term, is_synonym)
+                if score > best.get(item_id, 0):
+                    best[item_id] = score
+
+        results = []
+        for sc in scopes:
+            ranked = sorted(
+                (i for i in best if self.items[i].scope == sc),
+                key=lambda i: (-best[i], len(self.items[i].name), self.items[i].name),
+            )
+            for item_id in ranked[:limit]:
+                results.append(dict(self.items[item_id].to_dict(), score=best[item_id]))
+        return results
+
+
+catalog = ServiceCatalog()
+
+
+# ----------------------------------------------------------
+# CLI
+# ----------------------------------------------------------
+def init_catalog(app):
+    """Register the `build-catalog` CLI command."""
+
+    @app.cli.command("build-catalog")
+    @click.option("--source", "source_dir", default=CATALOG_DIR, show_default=True,
+                  type=click.Path(exists=True, file_okay=False))
+    @click.option("--out", "out_dir", default=CATALOG_SNAPSHOT_DIR, show_default=True,
+                  type=click.Path(file_okay=False))
+    def build_catalog_command(source_dir, out_dir):
+        """Compile the service CSVs into a content-hashed catalog snapshot."""
+        manifest = write_snapshot(source_dir, out_dir)
+        click.echo(
+            f"{manifest['file']}: {manifest['items']} items, {manifest['bytes']:,} bytes "
+            f"→ {out_dir}"
+        )
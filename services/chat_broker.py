@@ -0,0 +1,213 @@
+# ==========================================================
+# Chat Broker — chat_broker.py
+# One shared listener per worker fanning chat events out to
+# every open /api/chat/stream connection.
+#
+# Messages reach other workers through the database (the listener
+# polls department_messages). Typing signals are never stored there:
+# they go through the ephemeral store's publish/listen channel, which
+# crosses workers with EPHEMERAL_BACKEND=redis. With the memory
+# backend only the sending worker's streams see them, so run a single
+# worker there; /api/chat/typing-status polling works either way.
+# ==========================================================
+
+import logging
+import os
+import queue
+import threading
+from collections import deque
+
+from db import db_session
+from models import DepartmentMessage
+from services.ephemeral_store import store as ephemeral_store
+
+logger = logging.getLogger(__name__)
+
+# How often the shared listener looks for rows committed by other workers
+CHAT_LISTEN_INTERVAL = float(os.getenv("CHAT_LISTEN_INTERVAL", "1.0"))
+
+# Ids can commit out of order across workers; re-scan this many ids behind the cursor
+_LOOKBACK_IDS = 20
+_SUBSCRIBER_QUEUE_SIZE = 200
+_RECENT_IDS = 2000
+_TYPING_CHANNEL = "chat:typing"
+
+
+class ChatBroker:
+    """
+    Per-process pub/sub for DepartmentMessage rows and typing signals.
+
+    - send_message publishes straight away (same-worker delivery, no DB read)
+    - a single background thread polls department_messages by id for rows
+      written by other workers, once per interval for ALL subscribers
+    - each subscriber owns a bounded queue; slow consumers drop oldest events
+    """
+
+    def __init__(self, interval: float = CHAT_LISTEN_INTERVAL):
+        self.interval = interval
+        self._subs = {}              # department -> set[queue.Queue]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._prime_lock = threading.Lock()
+        self._typing_listening = False
+        self._cursor = None          # highest message id seen by the listener
+        self._recent = deque(maxlen=_RECENT_IDS)
+        self._recent_set = set()
+
+    # ------------------------------------------------------
+    # SUBSCRIPTIONS
+    # ------------------------------------------------------
+    def subscribe(self, department: str) -> queue.Queue:
+        """
+        Register a stream. When this returns, every message committed
+        from now on reaches the queue, so a backlog query made after it
+        leaves no gap (callers drop the overlap by id).
+        """
+        q = queue.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subs.setdefault(department, set()).add(q)
+        self._prime()
+        self._ensure_listener()
+        return q
+
+    def unsubscribe(self, department: str, q: queue.Queue):
+        with self._lock:
+            subs = self._subs.get(department)
+            if subs:
+                subs.discard(q)
+                if not subs:
+                    del self._subs[department]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+    # ------------------------------------------------------
+    # PUBLISHING
+    # ------------------------------------------------------
+    def _deliver(self, department: str, event: str, data: dict, event_id=None):
+        with self._lock:
+            targets = list(self._subs.get(department, ()))
+
+        for q in targets:
+            item = (event, data, event_id)
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _mark_seen(self, message_id: int) -> bool:
+        """Record an id; False if it was already delivered."""
+        with self._lock:
+            if message_id in self._recent_set:
+                return False
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_set.discard(self._recent[0])
+            self._recent.append(message_id)
+            self._recent_set.add(message_id)
+            return True
+
+    def publish_message(self, payload: dict):
+        """Fan a serialized DepartmentMessage (to_dict) out to both parties."""
+        message_id = payload.get("id")
+        if message_id is not None and not self._mark_seen(message_id):
+            return
+        self._deliver(payload["receiver"], "message", payload, message_id)
+        self._deliver(payload["sender"], "message", payload, message_id)
+
+    def publish_typing(self, sender: str, receiver: str):
+        """Typing signal to `receiver`'s streams in every worker (via the ephemeral store)."""
+        try:
+            ephemeral_store.publish(_TYPING_CHANNEL, {"from": sender, "to": receiver})
+        except Exception as e:
+            logger.warning(f"Typing publish failed, delivering locally: {str(e)[:200]}")
+            self._deliver(receiver, "typing", {"from": sender})
+
+    def _on_typing(self, message: dict):
+        if message.get("to") and message.get("from"):
+            self._deliver(message["to"], "typing", {"from": message["from"]})
+
+    # ------------------------------------------------------
+    # SHARED LISTENER (cross-worker rows)
+    # ------------------------------------------------------
+    def _ensure_listener(self):
+        with self._lock:
+            if not self._typing_listening:
+                ephemeral_store.listen(_TYPING_CHANNEL, self._on_typing)
+                self._typing_listening = True
+            if self._thread and self._thread.is_alive():
+                self._wake.set()
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="chat-broker-listener", daemon=True
+            )
+            self._thread.start()
+
+    def _prime(self):
+        """
+        Start a cold listener's cursor at the current newest id. Runs in
+        subscribe() (not on the listener's first scan), so only rows
+        committed before the subscription existed count as already seen;
+        those are the ones the caller's backlog query can return.
+        """
+        from sqlalchemy import func
+
+        with self._prime_lock:
+            if self._cursor is not None:
+                return
+            try:
+                cursor = db_session.query(func.max(DepartmentMessage.id)).scalar() or 0
+                for (message_id,) in (
+                    db_session.query(DepartmentMessage.id)
+                    .filter(DepartmentMessage.id > max(cursor - _LOOKBACK_IDS, 0))
+                ):
+                    self._mark_seen(message_id)
+                self._cursor = cursor
+            finally:
+                db_session.remove()
+
+    def _scan(self):
+        if self._cursor is None:
+            self._prime()
+        try:
+            rows = (
+                db_session.query(DepartmentMessage)
+                .filter(DepartmentMessage.id > max(self._cursor - _LOOKBACK_IDS, 0))
+                .order_by(DepartmentMessage.id.asc())
+                .limit(500)
+                .all()
+            )
+            for row in rows:
+                self._cursor = max(self._cursor, row.id)
+                self.publish_message(row.to_dict())
+        finally:
+            db_session.remove()
+
+    def _run(self):
+        while True:
+            # same lock order as _prime (prime lock, then subscriber lock)
+            with self._prime_lock:
+                with self._lock:
+                    idle = not any(self._subs.values())
+                if idle:
+                    # forget the cursor while nobody listens; the next
+                    # subscribe() primes a fresh one before it returns
+                    self._cursor = None
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._scan()
+            except Exception as e:
+                logger.warning(f"Chat listener scan failed: {str(e)[:200]}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+broker = ChatBroker()
@@ -0,0 +1,145 @@
+# ==========================================================
+# Chat Unread Counters — chat_unread.py
+# Incrementally maintained chat_read_states rows
+# ==========================================================
+
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, update
+
+from db import db_session
+from models import ChatReadState, DepartmentMessage
+
+
+def _dialect_insert():
+    name = db_session.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def record_incoming(receiver: str, sender: str, message_id: int):
+    """
+    Bump receiver's unread counter for sender (one upsert, caller commits).
+    Must run in the same transaction as the message insert.
+    """
+    now = datetime.utcnow()
+    insert = _dialect_insert()
+
+    if insert is not None:
+        stmt = insert(ChatReadState).values(
+            department=receiver,
+            counterpart=sender,
+            unread_count=1,
+            last_message_id=message_id,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["department", "counterpart"],
+            set_={
+                "unread_count": ChatReadState.unread_count + 1,
+                "last_message_id": stmt.excluded.last_message_id,
+                "updated_at": now,
+            },
+        )
+        db_session.execute(stmt)
+        return
+
+    # generic fallback: update, insert if nothing was there
+    result = db_session.execute(
+        update(ChatReadState)
+        .where(ChatReadState.department == receiver, ChatReadState.counterpart == sender)
+        .values(
+            unread_count=ChatReadState.unread_count + 1,
+            last_message_id=message_id,
+            updated_at=now,
+        )
+    )
+    if not result.rowcount:
+        db_session.add(ChatReadState(
+            department=receiver,
+            counterpart=sender,
+            unread_count=1,
+            last_message_id=message_id,
+            updated_at=now,
+        ))
+
+
+def mark_read(department: str, counterpart: str, message_id: int | None = None) -> int:
+    """
+    Reset department's unread counter for counterpart (caller commits).
+
+    If message_id is given and newer inbound messages exist, only those
+    newer messages stay counted.
+    Returns the remaining unread count.
+    """
+    state = (
+        db_session.query(ChatReadState)
+        .filter(
+            ChatReadState.department == department,
+            ChatReadState.counterpart == counterpart
+        )
+        .with_for_update()
+        .first()
+    )
+    if not state:
+        return 0
+
+    if message_id is not None and state.last_message_id and message_id < state.last_message_id:
+        # newer messages arrived after what the reader saw; keep those counted
+        remaining = (
+            db_session.query(func.count(DepartmentMessage.id))
+            .filter(
+                DepartmentMessage.sender_department == counterpart,
+                DepartmentMessage.receiver_department == department,
+                DepartmentMessage.id > message_id
+            )
+            .scalar()
+        )
+        state.unread_count = remaining
+        state.last_read_message_id = max(state.last_read_message_id or 0, message_id)
+        state.updated_at = datetime.utcnow()
+        return remaining
+
+    state.unread_count = 0
+    state.last_read_message_id = state.last_message_id
+    state.updated_at = datetime.utcnow()
+    return 0
+
+
+def clear_pair(department: str, counterpart: str):
+    """
+    Zero both sides' counters for a conversation being deleted (caller
+    commits). Run it before the DELETE: the UPDATE locks both rows, so a
+    message sent concurrently bumps its counter only after this commits,
+    and that message (not seen by the DELETE) stays counted.
+    """
+    db_session.execute(
+        update(ChatReadState)
+        .where(or_(
+            and_(ChatReadState.department == department, ChatReadState.counterpart == counterpart),
+            and_(ChatReadState.department == counterpart, ChatReadState.counterpart == department),
+        ))
+        .values(
+            unread_count=0,
+            last_read_message_id=ChatReadState.last_message_id,
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def unread_summary(department: str) -> dict:
+    """{counterpart: unread} for one department (single indexed lookup)."""
+    rows = (
+        db_session.query(ChatReadState.counterpart, ChatReadState.unread_count)
+        .filter(
+            ChatReadState.department == department,
+            ChatReadState.unread_count > 0
+        )
+        .all()
+    )
+    return {counterpart: count for counterpart, count in rows}
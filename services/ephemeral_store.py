@@ -0,0 +1,155 @@
+# ==========================================================
+# Ephemeral Store — ephemeral_store.py
+# Short-lived key/value state (typing indicators, etc.) plus a small
+# publish/listen channel for signals that must reach every worker
+#
+# EPHEMERAL_BACKEND:
+#   - "memory" : per-process dict with TTL eviction (default, single worker)
+#   - "redis"  : shared across gunicorn workers via EPHEMERAL_REDIS_URL
+#                (any Redis-protocol server: Redis, Valkey, KeyDB, ...)
+# ==========================================================
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+EPHEMERAL_BACKEND = (os.getenv("EPHEMERAL_BACKEND") or "memory").strip().lower()
+EPHEMERAL_REDIS_URL = os.getenv("EPHEMERAL_REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryStore:
+    """
+    In-process TTL store.
+
+    Entries live in an OrderedDict ordered by expiry. Every key shares the
+    same TTL per namespace in practice, so re-setting a key moves it to the
+    end and the oldest expiries are always at the front: each sweep pops
+    only expired entries (amortised O(1) per write), and nothing grows
+    without bound.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._listeners = {}         # channel -> [callback]
+
+    def _sweep(self, now: float):
+        while self._data:
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now and len(self._data) <= self.max_entries:
+                break
+            self._data.popitem(last=False)
+
+    def set(self, key: str, value, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (now + ttl, value)
+            self._sweep(now)
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(time.monotonic())
+            return len(self._data)
+
+    # only this process can hear a memory publish (single worker)
+    def publish(self, channel: str, message: dict):
+        with self._lock:
+            callbacks = list(self._listeners.get(channel, ()))
+        for callback in callbacks:
+            callback(message)
+
+    def listen(self, channel: str, callback):
+        with self._lock:
+            self._listeners.setdefault(channel, []).append(callback)
+
+
+class RedisStore:
+    """
+    Shared TTL store on a Redis-protocol server (expiry handled server-side).
+    Pass `client` to use any redis-py compatible object (e.g. fakeredis locally).
+    """
+
+    def __init__(self, url: str = EPHEMERAL_REDIS_URL, prefix: str = "eclinic:", client=None):
+        self.prefix = prefix
+        if client is not None:
+            self._client = client
+            return
+
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "EPHEMERAL_BACKEND=redis requires the 'redis' package (pip install redis)"
+            ) from e
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def set(self, key: str, value, ttl: float):
+        self._client.set(self.prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    def get(self, key: str):
+        return self._client.get(self.prefix + key)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+    def publish(self, channel: str, message: dict):
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+    def listen(self, channel: str, callback):
+        """Call `callback(message)` for every publish on `channel`, from any worker."""
+        threading.Thread(
+            target=self._listen, args=(channel, callback),
+            name=f"ephemeral-listen-{channel}", daemon=True,
+        ).start()
+
+    def _listen(self, channel: str, callback):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.prefix + channel)
+                for item in pubsub.listen():
+                    if item.get("type") == "message":
+                        callback(json.loads(item["data"]))
+            except Exception as e:
+                logger.warning(f"Ephemeral listener on {channel} failed, retrying: {str(e)[:200]}")
+                time.sleep(1)
+
+
+def create_store(backend: str = EPHEMERAL_BACKEND):
+    if backend == "redis":
+        try:
+            store = RedisStore()
+            store._client.ping()
+            return store
+        except Exception as e:
+            logger.warning(f"Redis ephemeral store unavailable, using memory: {str(e)[:200]}")
+    elif backend != "memory":
+        logger.warning(f"Unknown EPHEMERAL_BACKEND={backend!r}; using memory")
+    return MemoryStore()
+
+
+store = create_store()
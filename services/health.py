@@ -0,0 +1,135 @@
+# ==========================================================
+# Health — health.py
+# Cheap readiness probe + one server-side database keepalive
+#
+#   /livez  : process is up (never touches the database)
+#   /readyz : `SELECT 1`, cached for READYZ_CACHE_SECONDS so probes from
+#             load balancers/uptime checkers cost at most one query per
+#             window per worker
+#
+# The keepalive replaces the per-tab browser pings: one daemon thread per
+# host runs the same probe every DB_KEEPALIVE_INTERVAL seconds, skipping
+# the query when something else refreshed it recently. Every worker
+# starts the thread (app.py, on its first request, never for CLI
+# commands), but it blocks on an exclusive lock on DB_KEEPALIVE_LOCK_FILE
+# first: only the holder pings, and when that worker exits the OS
+# releases the lock and a waiting worker takes over.
+#
+# /readyz is unauthenticated, so it reports only a generic status; the
+# error detail (which may name hosts or DSNs) goes to the log.
+# ==========================================================
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db import engine, pool_stats
+from services.maintenance import wait_for_host_lock
+
+logger = logging.getLogger(__name__)
+
+READYZ_CACHE_SECONDS = float(os.getenv("READYZ_CACHE_SECONDS", "5"))
+DB_KEEPALIVE_INTERVAL = float(os.getenv("DB_KEEPALIVE_INTERVAL", "240"))   # 0 disables
+DB_KEEPALIVE_LOCK_FILE = os.getenv("DB_KEEPALIVE_LOCK_FILE") or os.path.join(
+    tempfile.gettempdir(), "eclinic-db-keepalive.lock"
+)
+
+
+class ReadinessProbe:
+    """`SELECT 1` with a short-lived cached result and the last error seen."""
+
+    def __init__(self, cache_seconds: float = READYZ_CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self._lock = threading.Lock()
+        self._checked_at = 0.0           # monotonic
+        self._ok = False
+        self._latency_ms = None
+        self._last_ok_at = None          # wall clock, for reporting
+        self._last_error = None
+        self._last_error_at = None
+
+    def _run_check(self):
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self._ok = True
+            self._last_ok_at = datetime.utcnow()
+        except Exception as e:
+            self._ok = False
+            self._last_error = str(e)[:300]
+            self._last_error_at = datetime.utcnow()
+            logger.warning(f"Readiness check failed: {self._last_error}")
+        self._latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._checked_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self._checked_at
+
+    def check(self, max_age: float | None = None) -> dict:
+        """Return the probe state, re-running the query if older than max_age."""
+        max_age = self.cache_seconds if max_age is None else max_age
+        with self._lock:
+            cached = self._checked_at and self.age() < max_age
+            if not cached:
+                self._run_check()
+            return {
+                "ok": self._ok,
+                "cached": bool(cached),
+                "checked_seconds_ago": round(self.age(), 2),
+                "latency_ms": self._latency_ms,
+                "last_ok_at": self._last_ok_at.isoformat() if self._last_ok_at else None,
+                "last_error": self._last_error,
+                "last_error_at": self._last_error_at.isoformat() if self._last_error_at else None,
+                "pool": pool_stats(),
+            }
+
+    def public_state(self) -> dict:
+        """check() without the error text, for unauthenticated probes."""
+        state = self.check()
+        state.pop("last_error")
+        state["error"] = None if state["ok"] else "database unavailable"
+        return state
+
+
+readiness = ReadinessProbe()
+
+
+class DatabaseKeepalive:
+    """Daemon thread keeping the database (and pool) warm at a fixed rate, one per host."""
+
+    def __init__(self, probe: ReadinessProbe, interval: float = DB_KEEPALIVE_INTERVAL,
+                 lock_path: str = DB_KEEPALIVE_LOCK_FILE):
+        self.probe = probe
+        self.interval = interval
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="db-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self._lock_file = wait_for_host_lock(self.lock_path)
+        logger.info(f"Database keepalive started in pid {os.getpid()} (every {self.interval:.0f}s)")
+        while not self._stop.wait(self.interval):
+            try:
+                # a readiness probe inside the window already did the work
+                self.probe.check(max_age=self.interval)
+            except Exception as e:
+                logger.error(f"Database keepalive failed: {str(e)}", exc_info=True)
+
+
+keepalive = DatabaseKeepalive(readiness)
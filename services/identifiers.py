@@ -0,0 +1,138 @@
+# ==========================================================
+# Identifiers — identifiers.py
+# Sequence-allocated patient file numbers and patient IDs
+#
+#   file_no    : F-0000001         (one global sequence)
+#   patient_id : EPN-2026-000001   (one sequence per registration year)
+#
+# Postgres: nextval() on patient_file_no_seq / patient_id_<year>_seq
+# (migration f3c1a8d5b7e2). Sequences never hand out the same value
+# twice, so there is no collision/retry path, and new keys always land
+# at the right-hand edge of the unique B-tree indexes. Other databases
+# (SQLite dev/test) use a row in identifier_counters instead.
+#
+# Entry points: next_patient_identifiers(session) for one registration,
+#               allocate_patient_identifiers(session, n) for bulk inserts.
+# ==========================================================
+
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+FILE_NO_SEQUENCE = "patient_file_no_seq"
+FILE_NO_FORMAT = "F-{:07d}"
+PATIENT_ID_FORMAT = "EPN-{year}-{:06d}"
+ALLOCATE_MAX = 5000
+
+_ensured_years = set()
+_ensure_lock = threading.Lock()
+
+
+def patient_id_sequence(year: int) -> str:
+    return f"patient_id_{int(year)}_seq"
+
+
+def format_file_no(number: int) -> str:
+    return FILE_NO_FORMAT.format(number)
+
+
+def format_patient_id(year: int, number: int) -> str:
+    return PATIENT_ID_FORMAT.format(number, year=year)
+
+
+# ----------------------------------------------------------
+# POSTGRES SEQUENCES
+# ----------------------------------------------------------
+def ensure_patient_id_sequence(year: int):
+    """
+    Create the sequence for `year` if it is missing. Runs on its own
+    connection: a failed nextval() on a missing sequence would abort the
+    caller's transaction, and sequence DDL should not wait on it anyway.
+    """
+    if year in _ensured_years:
+        return
+    with _ensure_lock:
+        if year in _ensured_years:
+            return
+        name = patient_id_sequence(year)
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {name}"))
+        except Exception as e:
+            # another worker created it at the same moment
+            with engine.connect() as conn:
+                if not conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+                    raise
+            logger.info(f"Sequence {name} created concurrently: {str(e)[:200]}")
+        _ensured_years.add(year)
+
+
+def _pg_allocate(session, count: int, year: int) -> list[tuple[int, int]]:
+    ensure_patient_id_sequence(year)
+    rows = session.execute(
+        text(
+            f"SELECT nextval('{FILE_NO_SEQUENCE}'), nextval('{patient_id_sequence(year)}') "
+            "FROM generate_series(1, :n)"
+        ),
+        {"n": count},
+    ).all()
+    return sorted(rows)
+
+
+# ----------------------------------------------------------
+# COUNTER TABLE (databases without sequences)
+# ----------------------------------------------------------
+def _counter_take(session, name: str, count: int) -> range:
+    """Reserve `count` values; the row stays locked until the caller commits."""
+    updated = session.execute(
+        text("UPDATE identifier_counters SET value = value + :n WHERE name = :name"),
+        {"n": count, "name": name},
+    ).rowcount
+    if not updated:
+        session.execute(
+            text("INSERT INTO identifier_counters (name, value) VALUES (:name, :n)"),
+            {"n": count, "name": name},
+        )
+    last = session.execute(
+        text("SELECT value FROM identifier_counters WHERE name = :name"), {"name": name}
+    ).scalar()
+    return range(last - count + 1, last + 1)
+
+
+def _counter_allocate(session, count: int, year: int) -> list[tuple[int, int]]:
+    file_numbers = _counter_take(session, FILE_NO_SEQUENCE, count)
+    id_numbers = _counter_take(session, patient_id_sequence(year), count)
+    return list(zip(file_numbers, id_numbers))
+
+
+# ----------------------------------------------------------
+# PUBLIC API
+# ----------------------------------------------------------
+def allocate_patient_identifiers(session, count: int, year: int | None = None) -> list[tuple[str, str]]:
+    """
+    `count` unused (file_no, patient_id) pairs in ascending order, in one
+    round trip. On Postgres a rolled-back allocation leaves a gap rather
+    than being handed out again.
+    """
+    if count < 1:
+        return []
+    if count > ALLOCATE_MAX:
+        raise ValueError(f"Cannot allocate more than {ALLOCATE_MAX} identifiers at once.")
+    year = year or datetime.now().year
+
+    if session.get_bind().dialect.name == "postgresql":
+        numbers = _pg_allocate(session, count, year)
+    else:
+        numbers = _counter_allocate(session, count, year)
+    return [(format_file_no(f), format_patient_id(year, p)) for f, p in numbers]
+
+
+def next_patient_identifiers(session, year: int | None = None) -> tuple[str, str]:
+    """(file_no, patient_id) for one new patient."""
+    return allocate_patient_identifiers(session, 1, year)[0]
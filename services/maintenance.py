@@ -0,0 +1,390 @@
+# ==========================================================
+# Maintenance — maintenance.py
+# Scheduled housekeeping kept off the request path
+#
+#   flask --app app cleanup-activities [--keep-days N] [--archive-dir DIR]
+#
+# or the in-process scheduler (MAINTENANCE_SCHEDULER=true), which runs
+# daily at MAINTENANCE_HOUR. app.py starts it on a worker's first
+# request, never for CLI commands; the scheduler thread then waits on a
+# host-wide file lock so only one worker per host keeps a schedule, and
+# a Postgres advisory lock makes sure only one process (across hosts)
+# does the work at a time.
+# ==========================================================
+
+import csv
+import gzip
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+
+import click
+from sqlalchemy import delete, func, select, text
+
+from db import engine
+from models import Activity
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_SCHEDULER = (os.getenv("MAINTENANCE_SCHEDULER") or "true").strip().lower() in ("1", "true", "yes")
+MAINTENANCE_HOUR = int(os.getenv("MAINTENANCE_HOUR", "6"))
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "5000"))
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
+ACTIVITY_ARCHIVE_DIR = os.getenv("ACTIVITY_ARCHIVE_DIR") or None
+PARTITION_DAYS_AHEAD = int(os.getenv("ACTIVITY_PARTITION_DAYS_AHEAD", "7"))
+MAINTENANCE_LOCK_FILE = os.getenv("MAINTENANCE_LOCK_FILE") or os.path.join(
+    tempfile.gettempdir(), "eclinic-maintenance.lock"
+)
+
+# arbitrary constant shared by every worker: "eCLN" + 1
+ACTIVITY_CLEANUP_LOCK = 0x65434C4E01
+
+
+# ----------------------------------------------------------
+# SINGLE-EXECUTION LOCK
+# ----------------------------------------------------------
+@contextmanager
+def advisory_lock(key: int):
+    """
+    Yield True if this process holds `key`, False if someone else does.
+
+    Uses a transaction-scoped lock held on a dedicated connection, which
+    is also safe behind a transaction-mode pooler. Non-Postgres databases
+    (SQLite dev/test) have a single writer anyway, so the lock is a no-op.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    conn = engine.connect()
+    trans = conn.begin()
+    try:
+        acquired = conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": key}
+        ).scalar()
+        yield bool(acquired)
+    finally:
+        trans.rollback()   # releases the lock
+        conn.close()
+
+
+def wait_for_host_lock(path: str):
+    """
+    Block until this process holds an exclusive flock on `path`; returns
+    the open file, which keeps the lock until the process exits. None
+    (and no waiting) where flock is unavailable or the file can't be
+    opened, so the caller just runs unlocked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None   # no flock (Windows dev server): a single process anyway
+    try:
+        lock_file = open(path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+    except OSError as e:
+        logger.warning(f"Host lock {path} unavailable, running unlocked: {str(e)[:200]}")
+        return None
+
+
+# ----------------------------------------------------------
+# ACTIVITY RETENTION
+# ----------------------------------------------------------
+# On Postgres `activities` is range-partitioned by day (see migration
+# 9b5f0c3d8e21): retention detaches and drops whole partitions, which is
+# O(1) and leaves no dead tuples to vacuum. Elsewhere (SQLite dev/test)
+# it falls back to batched deletes. Either way rows can first be exported
+# to ACTIVITY_ARCHIVE_DIR as gzipped CSV, one file per day/partition.
+_PARTITION_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def activities_partitioned() -> bool:
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'activities'"
+        )).scalar())
+
+
+def _create_day_partition(day: date) -> bool:
+    """
+    Create activities_pYYYYMMDD for `day` if missing; True if created.
+
+    Rows for that day that already landed in activities_default (the
+    partition was missing when they were written) are moved into the new
+    partition in the same transaction, with writers briefly blocked;
+    Postgres would otherwise refuse to create it. Errors propagate.
+    """
+    name = f"activities_p{day:%Y%m%d}"
+    bounds = {"lo": _day_start(day), "hi": _day_start(day + timedelta(days=1))}
+    create = (
+        f"CREATE TABLE {name} PARTITION OF activities "
+        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+            return False
+        has_default = conn.execute(text("SELECT to_regclass('activities_default')")).scalar()
+        stray = has_default and conn.execute(text(
+            "SELECT count(*) FROM activities_default WHERE created_at >= :lo AND created_at < :hi"
+        ), bounds).scalar()
+        if not stray:
+            conn.execute(text(create))
+            return True
+
+        # blocks inserts (recursively, every partition) until commit, so no
+        # new row for `day` can reach the default partition mid-move
+        conn.execute(text("LOCK TABLE activities IN SHARE ROW EXCLUSIVE MODE"))
+        conn.execute(text(
+            "CREATE TEMP TABLE activities_moving ON COMMIT DROP AS "
+            "SELECT * FROM activities_default WHERE created_at >= :lo AND created_at < :hi"
+        ), bounds)
+        conn.execute(text(
+            "DELETE FROM activities_default WHERE created_at >= :lo AND created_at < :hi"
+        ), bounds)
+        conn.execute(text(create))
+        moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM activities_moving")).rowcount
+    logger.warning(f"Created partition {name}; moved {moved} rows out of activities_default")
+    return True
+
+
+def ensure_activity_partitions(days_ahead: int = PARTITION_DAYS_AHEAD) -> list[str]:
+    """
+    Create the next `days_ahead` daily partitions if missing, plus one for
+    every day that has rows stranded in activities_default (moving them
+    out), so the default partition drains and retention sees every day.
+    Raises if a partition can't be created.
+    """
+    today = date.today()
+    days = {today + timedelta(days=offset) for offset in range(days_ahead + 1)}
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass('activities_default')")).scalar():
+            days.update(conn.execute(text(
+                "SELECT DISTINCT created_at::date FROM activities_default"
+            )).scalars())
+
+    created = []
+    for day in sorted(days):
+        try:
+            if _create_day_partition(day):
+                created.append(f"activities_p{day:%Y%m%d}")
+        except Exception as e:
+            logger.error(f"Could not create activity partition for {day}: {str(e)[:200]}")
+            raise
+    return created
+
+
+def _list_activity_partitions(conn) -> list[tuple[str, datetime]]:
+    """(partition name, exclusive upper bound) for every bounded partition."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'activities'::regclass"
+    )).all()
+    partitions = []
+    for name, bound in rows:
+        match = _PARTITION_BOUND.search(bound or "")
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1))))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def _archive_query(conn, query: str, path: str, params: dict | None = None):
+    """Stream a SELECT to a gzipped CSV (COPY when the driver supports it)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    dbapi_conn = conn.connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    try:
+        with gzip.open(path, "wt", newline="") as fh:
+            if hasattr(cursor, "copy_expert") and not params:   # psycopg2
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", fh)
+                return
+            result = conn.execute(text(query), params or {})
+            writer = csv.writer(fh)
+            writer.writerow(result.keys())
+            for row in result:
+                writer.writerow(row)
+    finally:
+        cursor.close()
+
+
+def _retire_partitions(cutoff: datetime, archive_dir: str | None) -> int:
+    """Detach + drop every partition entirely older than cutoff. Returns count."""
+    retired = 0
+    with engine.connect() as conn:
+        partitions = _list_activity_partitions(conn)
+
+    for name, upper in partitions:
+        if upper > cutoff:
+            break
+        with engine.begin() as conn:
+            if archive_dir:
+                _archive_query(conn, f"SELECT * FROM {name}", os.path.join(archive_dir, f"{name}.csv.gz"))
+            conn.execute(text(f"ALTER TABLE activities DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Retired activity partition {name}")
+        retired += 1
+    return retired
+
+
+def cleanup_old_activities(batch_size: int = CLEANUP_BATCH_SIZE, before: datetime | None = None) -> int:
+    """
+    Delete activities older than `before` (default: retention cutoff) in
+    batches of `batch_size`, one short transaction per batch, so no
+    single statement holds locks for long. Returns rows deleted.
+    Used for unpartitioned tables only.
+    """
+    if before is None:
+        before = _day_start(date.today() - timedelta(days=ACTIVITY_RETENTION_DAYS))
+
+    total = 0
+    while True:
+        batch = (
+            select(Activity.id)
+            .where(Activity.created_at < before)
+            .limit(batch_size)
+        )
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                delete(Activity).where(Activity.id.in_(batch))
+            ).rowcount or 0
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def apply_activity_retention(
+    keep_days: int = ACTIVITY_RETENTION_DAYS,
+    archive_dir: str | None = ACTIVITY_ARCHIVE_DIR,
+    batch_size: int = CLEANUP_BATCH_SIZE,
+) -> dict:
+    """
+    Drop activity history older than `keep_days` full days (0 = keep only
+    today), archiving it first when `archive_dir` is set.
+    """
+    cutoff = _day_start(date.today() - timedelta(days=keep_days))
+
+    if activities_partitioned():
+        created = ensure_activity_partitions()
+        retired = _retire_partitions(cutoff, archive_dir)
+        return {"mode": "partitions", "created": len(created), "retired": retired}
+
+    if archive_dir:
+        _archive_unpartitioned(cutoff, archive_dir)
+    deleted = cleanup_old_activities(batch_size=batch_size, before=cutoff)
+    return {"mode": "delete", "deleted": deleted}
+
+
+def _archive_unpartitioned(cutoff: datetime, archive_dir: str):
+    with engine.connect() as conn:
+        oldest = conn.execute(
+            select(func.min(Activity.created_at)).where(Activity.created_at < cutoff)
+        ).scalar()
+        if not oldest:
+            return
+        day = oldest.date() if isinstance(oldest, datetime) else datetime.fromisoformat(str(oldest)).date()
+        while _day_start(day) < cutoff:
+            start, end = _day_start(day), _day_start(day + timedelta(days=1))
+            has_rows = conn.execute(
+                select(Activity.id).where(Activity.created_at >= start, Activity.created_at < end).limit(1)
+            ).first()
+            if has_rows:
+                _archive_query(
+                    conn,
+                    "SELECT * FROM activities WHERE created_at >= :start AND created_at < :end",
+                    os.path.join(archive_dir, f"activities_p{day:%Y%m%d}.csv.gz"),
+                    {"start": start, "end": end},
+                )
+            day += timedelta(days=1)
+
+
+def run_activity_cleanup(batch_size: int = CLEANUP_BATCH_SIZE, keep_days: int = ACTIVITY_RETENTION_DAYS,
+                         archive_dir: str | None = ACTIVITY_ARCHIVE_DIR) -> dict | None:
+    """Retention guarded by the advisory lock. None if another process holds it."""
+    with advisory_lock(ACTIVITY_CLEANUP_LOCK) as acquired:
+        if not acquired:
+            logger.info("Activity cleanup already running elsewhere; skipped")
+            return None
+        result = apply_activity_retention(keep_days=keep_days, archive_dir=archive_dir, batch_size=batch_size)
+        logger.info(f"Activity retention: {result}")
+        return result
+
+
+# ----------------------------------------------------------
+# IN-PROCESS DAILY SCHEDULER
+# ----------------------------------------------------------
+class DailyScheduler:
+    """Runs `job` once a day at `hour` (local time) on a daemon thread, one per host."""
+
+    def __init__(self, job, hour: int = MAINTENANCE_HOUR, name: str = "maintenance",
+                 lock_path: str = MAINTENANCE_LOCK_FILE):
+        self.job = job
+        self.hour = hour
+        self.name = name
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def seconds_until_next_run(self, now: datetime | None = None) -> float:
+        now = now or datetime.now()
+        run_at = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        return (run_at - now).total_seconds()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self._lock_file = wait_for_host_lock(self.lock_path)
+        logger.info(f"{self.name} scheduler running in pid {os.getpid()} (daily at {self.hour:02d}:00)")
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                self.job()
+            except Exception as e:
+                logger.error(f"Scheduled {self.name} job failed: {str(e)}", exc_info=True)
+
+
+scheduler = DailyScheduler(run_activity_cleanup, name="activity-cleanup")
+
+
+def start_scheduler():
+    """Start the daily scheduler if MAINTENANCE_SCHEDULER is on (serving processes only)."""
+    if MAINTENANCE_SCHEDULER:
+        scheduler.start()
+
+
+def init_maintenance(app):
+    """Register the maintenance CLI commands."""
+
+    @app.cli.command("cleanup-activities")
+    @click.option("--keep-days", default=ACTIVITY_RETENTION_DAYS, show_default=True, type=int,
+                  help="Full days of history to keep besides today.")
+    @click.option("--archive-dir", default=ACTIVITY_ARCHIVE_DIR, type=click.Path(file_okay=False),
+                  help="Export retired rows here as gzipped CSV first.")
+    @click.option("--batch-size", default=CLEANUP_BATCH_SIZE, show_default=True, type=int)
+    def cleanup_activities_command(keep_days, archive_dir, batch_size):
+        """Apply activity retention (drop old partitions / batched delete)."""
+        result = run_activity_cleanup(batch_size=batch_size, keep_days=keep_days, archive_dir=archive_dir)
+        if result is None:
+            click.echo("Another process is already running the cleanup.")
+        else:
+            click.echo(f"Activity retention done: {result}")
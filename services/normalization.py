@@ -0,0 +1,270 @@
+# ==========================================================
+# Normalization — normalization.py
+# Patient field cleaning shared by registration and imports
+#
+#   single record : split_name, normalize_person_name, normalize_phone,
+#                   normalize_email, parse_date, soundex, referral_key,
+#                   normalize_patient_fields
+#   batch (pandas): split_names, normalize_phones, normalize_emails,
+#                   parse_dates, normalize_frame
+#
+# Both paths use the same precompiled patterns, so a record cleaned at
+# the registration desk and one cleaned by a workbook import come out
+# identical. Benchmark: benchmarks/normalization.py
+# ==========================================================
+
+import re
+from datetime import date, datetime
+
+# ----------------------------------------------------------
+# PATTERNS (compiled once)
+# ----------------------------------------------------------
+_QUOTES_TABS = re.compile(r'[\t"]+')
+_SPACES = re.compile(r"\s+")
+# leading institution tag: "(AC), ", "[MERCY HEALTH] "; a stray unclosed
+# bracket ("[PISHCHYK, Mikalai") only loses the bracket itself
+_LEADING_TAG = re.compile(r"^[\(\[][^\)\]]*[\)\]]\s*,?\s*|^[\(\[]\s*")
+# leading numeric prefixes: "002 ", "164079/"
+_NUMERIC_PREFIX = re.compile(r"^\d+[/\s]*")
+_NON_DIGIT = re.compile(r"\D+")
+_EMAIL = re.compile(r"[^@\s]+@[^@\s]+\.[a-z]{2,}")
+
+# Nigerian numbers: 0XXXXXXXXXX (11), 234XXXXXXXXXX (13), or the 10-digit
+# national number (leading 0 lost, e.g. numeric Excel cells)
+_NG_LOCAL = re.compile(r"0([1-9]\d{9})")
+_NG_INTL = re.compile(r"234([1-9]\d{9})")
+_NG_NATIONAL = re.compile(r"([7-9]\d{9})")
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%b-%Y", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S")
+
+SEX_MAP = {"male": "Male", "m": "Male", "female": "Female", "f": "Female"}
+
+
+# ----------------------------------------------------------
+# SINGLE RECORD
+# ----------------------------------------------------------
+def _clean_text(value) -> str:
+    if value is None:
+        return ""
+    return _SPACES.sub(" ", _QUOTES_TABS.sub(" ", str(value))).strip()
+
+
+def normalize_person_name(value) -> str:
+    """Collapse whitespace/quotes and title-case ("  aDA  obi" → "Ada Obi")."""
+    return _clean_text(value).title()
+
+
+def split_name(value) -> tuple[str, str]:
+    """
+    (first_name, last_name) from one free-text name cell.
+
+    "SURNAME, Given Names" and "Given Surname" forms are both handled;
+    a single leading initial ("A Musa") is treated as the surname initial.
+    When only one part is present it fills both; ("", "") if none.
+    """
+    cleaned = _LEADING_TAG.sub("", _clean_text(value))
+    cleaned = _NUMERIC_PREFIX.sub("", cleaned).strip(" ,")
+    if not cleaned:
+        return "", ""
+
+    if "," in cleaned:
+        last, first = (part.strip() for part in cleaned.split(",", 1))
+    else:
+        parts = cleaned.split(" ", 1)
+        first, last = parts[0], (parts[1] if len(parts) > 1 else "")
+
+    if len(first) == 1 and last:
+        first, last = last, first
+
+    first = first or last
+    last = last or first
+    return first.title(), last.title()
+
+
+def normalize_phone(value) -> str | None:
+    """Nigerian number in E.164 form (+234XXXXXXXXXX), or None if it isn't one."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    digits = _NON_DIGIT.sub("", str(value))
+    for pattern in (_NG_LOCAL, _NG_INTL, _NG_NATIONAL):
+        match = pattern.fullmatch(digits)
+        if match:
+            return f"+234{match.group(1)}"
+    return None
+
+
+def normalize_email(value) -> str | None:
+    email = _clean_text(value).lower()
+    return email if _EMAIL.fullmatch(email) else None
+
+
+def normalize_sex(value) -> str | None:
+    return SEX_MAP.get(_clean_text(value).lower())
+
+
+def parse_date(value) -> date | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+_SOUNDEX_CODES = str.maketrans(
+    "bfpvcgjkqsxzdtlmnr",
+    "111122222222334556",
+)
+_LETTERS = re.compile(r"[^a-z]+")
+
+
+def soundex(value) -> str:
+    """American Soundex ("Okonkwo" → "O252"); "" when there are no letters."""
+    letters = _LETTERS.sub("", _clean_text(value).lower())
+    if not letters:
+        return ""
+    first = letters[0]
+    coded = letters.translate(_SOUNDEX_CODES)
+    digits = []
+    previous = coded[0]
+    for letter, code in zip(letters[1:], coded[1:]):
+        if code.isdigit() and code != previous:
+            digits.append(code)
+        # h/w do not separate equal codes; vowels do
+        if letter not in "hw":
+            previous = code
+    return (first.upper() + "".join(digits) + "000")[:4]
+
+
+def referral_key(value) -> str:
+    """Case/spacing-insensitive referral name ("  dr  ADA obi " → "dr ada obi")."""
+    return _clean_text(value).casefold()
+
+
+def normalize_patient_fields(data: dict) -> dict:
+    """
+    Registration payload with names, phone, email, sex and date of birth
+    normalized. Values that can't be normalized are left as entered
+    (phone) or dropped (email), so validation stays with the caller.
+    """
+    out = dict(data)
+    for key in ("first_name", "last_name", "occupation"):
+        if out.get(key):
+            out[key] = normalize_person_name(out[key])
+    if out.get("phone"):
+        out["phone"] = normalize_phone(out["phone"]) or _clean_text(out["phone"])
+    if "email" in out:
+        out["email"] = normalize_email(out.get("email"))
+    if out.get("sex"):
+        out["sex"] = normalize_sex(out["sex"]) or _clean_text(out["sex"]).title()
+    if out.get("date_of_birth") and not isinstance(out["date_of_birth"], date):
+        out["date_of_birth"] = parse_date(out["date_of_birth"])
+    if out.get("referred_by"):
+        out["referred_by"] = _clean_text(out["referred_by"]) or None
+    return out
+
+
+# ----------------------------------------------------------
+# BATCH (pandas string vectorization)
+# ----------------------------------------------------------
+def _text_series(series):
+    return (
+        series.astype("string")
+        .fillna("")
+        .str.replace(_QUOTES_TABS, " ", regex=True)
+        .str.replace(_SPACES, " ", regex=True)
+        .str.strip()
+    )
+
+
+def split_names(series):
+    """DataFrame[first_name, last_name] for a Series of name cells (see split_name)."""
+    import pandas as pd
+
+    cleaned = (
+        _text_series(series)
+        .str.replace(_LEADING_TAG, "", regex=True)
+        .str.replace(_NUMERIC_PREFIX, "", regex=True)
+        .str.strip(" ,")
+    )
+
+    by_comma = cleaned.str.split(",", n=1, expand=True).reindex(columns=[0, 1])
+    by_space = cleaned.str.split(" ", n=1, expand=True).reindex(columns=[0, 1])
+    has_comma = cleaned.str.contains(",", regex=False)
+
+    first = by_space[0].where(~has_comma, by_comma[1]).fillna("").str.strip()
+    last = by_space[1].where(~has_comma, by_comma[0]).fillna("").str.strip()
+
+    initial = (first.str.len() == 1) & (last != "")
+    first, last = first.where(~initial, last), last.where(~initial, first)
+
+    first = first.where(first != "", last)
+    last = last.where(last != "", first)
+    return pd.DataFrame({"first_name": first.str.title(), "last_name": last.str.title()})
+
+
+def normalize_phones(series):
+    """E.164 Nigerian numbers; <NA> where a value isn't one."""
+    import pandas as pd
+
+    # numeric cells come back as int/float; drop a trailing ".0"
+    raw = series.map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v, na_action="ignore")
+    digits = raw.astype("string").str.replace(_NON_DIGIT, "", regex=True)
+
+    national = pd.Series(pd.NA, index=series.index, dtype="string")
+    for pattern in (_NG_NATIONAL, _NG_INTL, _NG_LOCAL):
+        national = digits.str.extract(f"^{pattern.pattern}$", expand=False).fillna(national)
+    return ("+234" + national).astype("string")
+
+
+def normalize_emails(series):
+    emails = _text_series(series).str.lower()
+    return emails.where(emails.str.fullmatch(_EMAIL.pattern), None)
+
+
+def parse_dates(series):
+    """Series of datetime.date (None where unparseable)."""
+    import pandas as pd
+
+    values = series.where(series.astype("string").fillna("").str.strip() != "", None)
+    parsed = pd.to_datetime(values, format="%d-%b-%Y", errors="coerce")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(values[missing], format=fmt, errors="coerce"))
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def normalize_frame(df):
+    """
+    Normalize whichever of raw_name / first_name / last_name / phone /
+    email / sex / date_of_birth / registration_date columns are present.
+    Returns a new DataFrame.
+    """
+    out = df.copy()
+    if "raw_name" in out:
+        out[["first_name", "last_name"]] = split_names(out["raw_name"]).values
+    else:
+        for col in ("first_name", "last_name"):
+            if col in out:
+                out[col] = _text_series(out[col]).str.title()
+    if "phone" in out:
+        out["phone"] = normalize_phones(out["phone"])
+    if "email" in out:
+        out["email"] = normalize_emails(out["email"])
+    if "sex" in out:
+        out["sex"] = _text_series(out["sex"]).str.lower().map(SEX_MAP)
+    for col in ("date_of_birth", "registration_date"):
+        if col in out:
+            out[col] = parse_dates(out[col])
+    return out
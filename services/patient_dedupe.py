@@ -0,0 +1,143 @@
+# ==========================================================
+# Patient Dedupe — patient_dedupe.py
+# Blocking keys for duplicate-patient detection
+#
+# Every patient row carries two indexed keys (models.Patient):
+#   match_phone    : normalized Nigerian phone (+234XXXXXXXXXX)
+#   match_dob_name : "<date of birth>|<soundex(surname)>"
+# A new registration or imported row is only compared with rows that
+# share one of its keys: two index lookups, never a table scan.
+# ==========================================================
+
+from sqlalchemy import case, desc, event, or_, select
+
+from models import Patient
+from services.normalization import normalize_phone, parse_date, soundex
+
+DUPLICATE_LIMIT = 10
+DUPLICATE_MESSAGE = "This patient may already be registered."
+
+
+class DuplicatePatientError(ValueError):
+    """Registration matched existing patients; `candidates` lists them."""
+
+    def __init__(self, candidates: list[dict]):
+        super().__init__(DUPLICATE_MESSAGE)
+        self.candidates = candidates
+
+
+def match_keys(last_name, date_of_birth, phone) -> dict:
+    """{"match_phone", "match_dob_name"}; either is None when not derivable."""
+    dob = parse_date(date_of_birth)
+    surname = soundex(last_name)
+    return {
+        "match_phone": normalize_phone(phone),
+        "match_dob_name": f"{dob.isoformat()}|{surname}" if dob and surname else None,
+    }
+
+
+# Keys follow the row on every ORM insert/update (registration, edits).
+# Core bulk inserts (services/patient_import.py) set them explicitly.
+@event.listens_for(Patient, "before_insert")
+@event.listens_for(Patient, "before_update")
+def _set_match_keys(mapper, connection, target):
+    keys = match_keys(target.last_name, target.date_of_birth, target.phone)
+    target.match_phone = keys["match_phone"]
+    target.match_dob_name = keys["match_dob_name"]
+
+
+def _candidate(patient, keys: dict) -> dict:
+    reasons = []
+    if keys["match_phone"] and patient.match_phone == keys["match_phone"]:
+        reasons.append("phone")
+    if keys["match_dob_name"] and patient.match_dob_name == keys["match_dob_name"]:
+        reasons.append("date_of_birth+surname")
+    return {
+        "id": patient.id,
+        "file_no": patient.file_no,
+        "patient_id": patient.patient_id,
+        "full_name": f"{patient.first_name} {patient.last_name}",
+        "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
+        "phone": patient.phone,
+        "reasons": reasons,
+    }
+
+
+def find_duplicates(session, last_name, date_of_birth, phone, exclude_id=None, limit=DUPLICATE_LIMIT) -> list[dict]:
+    """Existing patients sharing a blocking key, strongest (both keys) first."""
+    keys = match_keys(last_name, date_of_birth, phone)
+    clauses = [
+        getattr(Patient, key) == value for key, value in keys.items() if value
+    ]
+    if not clauses:
+        return []
+
+    # rank in SQL so the LIMIT keeps the strongest matches: a shared phone
+    # (family, hospital line) can have dozens of patients behind it
+    strength = sum(case((clause, 1), else_=0) for clause in clauses)
+    query = session.query(Patient).filter(or_(*clauses))
+    if exclude_id is not None:
+        query = query.filter(Patient.id != exclude_id)
+    query = query.order_by(desc(strength), Patient.id).limit(limit)
+    return [_candidate(p, keys) for p in query.all()]
+
+
+def find_duplicates_bulk(session, records: list[dict], limit=DUPLICATE_LIMIT) -> list[list[dict]]:
+    """
+    find_duplicates() for many (last_name, date_of_birth, phone) dicts in
+    one query; returns candidate lists in the same order as `records`.
+    """
+    keyed = [match_keys(r["last_name"], r["date_of_birth"], r["phone"]) for r in records]
+    phones = {k["match_phone"] for k in keyed if k["match_phone"]}
+    dob_names = {k["match_dob_name"] for k in keyed if k["match_dob_name"]}
+    if not phones and not dob_names:
+        return [[] for _ in records]
+
+    clauses = []
+    if phones:
+        clauses.append(Patient.match_phone.in_(phones))
+    if dob_names:
+        clauses.append(Patient.match_dob_name.in_(dob_names))
+    stored = session.query(Patient).filter(or_(*clauses)).all()
+
+    by_key = {}
+    for patient in stored:
+        for value in (patient.match_phone, patient.match_dob_name):
+            if value:
+                by_key.setdefault(value, []).append(patient)
+
+    results = []
+    for keys in keyed:
+        matched = {}
+        for value in keys.values():
+            for patient in by_key.get(value, []) if value else []:
+                matched[patient.id] = patient
+        candidates = [_candidate(p, keys) for p in matched.values()]
+        candidates.sort(key=lambda c: (-len(c["reasons"]), c["id"]))   # same order as find_duplicates
+        results.append(candidates[:limit])
+    return results
+
+
+def existing_matches(conn, rows: list[dict]) -> dict:
+    """
+    For a batch of rows (with match keys), map each key value to the
+    file numbers already stored under it. One query per batch.
+    """
+    phones = {r["match_phone"] for r in rows if r.get("match_phone")}
+    dob_names = {r["match_dob_name"] for r in rows if r.get("match_dob_name")}
+    if not phones and not dob_names:
+        return {}
+
+    clauses = []
+    if phones:
+        clauses.append(Patient.match_phone.in_(phones))
+    if dob_names:
+        clauses.append(Patient.match_dob_name.in_(dob_names))
+
+    found = {}
+    stmt = select(Patient.file_no, Patient.match_phone, Patient.match_dob_name).where(or_(*clauses))
+    for file_no, phone_key, dob_key in conn.execute(stmt):
+        for value in (phone_key, dob_key):
+            if value in phones or value in dob_names:
+                found.setdefault(value, set()).add(file_no)
+    return found
@@ -0,0 +1,333 @@
+# ==========================================================
+# Patient Import — patient_import.py
+# Streaming xlsx → patients bulk upsert (replaces clean.ipynb)
+#
+#   flask --app app import-patients "data/Epiconsult Patient Hospital Records 2025.xlsx" \
+#       [--batch-size 1000] [--category Diagnostics] [--rejects rejects.csv]
+#       [--duplicates duplicates.csv] [--dry-run]
+#
+# Rows are streamed with openpyxl in read-only mode (never a full
+# DataFrame), normalized one batch-sized chunk at a time with the
+# vectorized helpers in services/normalization.py, and written with
+# INSERT ... ON CONFLICT (file_no) DO UPDATE, so re-running an import
+# refreshes existing patients instead of duplicating them.
+# ==========================================================
+
+import csv
+import logging
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+import click
+
+from db import engine
+from models import Patient
+from services.normalization import normalize_frame
+from services.patient_dedupe import existing_matches, match_keys
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("PATIENT_IMPORT_BATCH_SIZE", "1000"))
+
+# workbook header → patients column (same mapping clean.ipynb used)
+COLUMN_MAP = {
+    "Title": "title",
+    "Name": "raw_name",
+    "Sex": "sex",
+    "Folder No": "file_no",
+    "Account Status": "account_status",
+    "Date of Birth": "date_of_birth",
+    "Age": "age",
+    "MobileNo": "phone",
+    "Reg. Date": "registration_date",
+    "email": "email",
+    "Data Entry": "registered_by",
+    "Category": "category",
+}
+
+# columns refreshed when a file_no is imported again (id, patient_id and
+# created_at are kept as first imported)
+UPSERT_COLUMNS = (
+    "title", "first_name", "last_name", "date_of_birth", "age", "sex",
+    "phone", "email", "registered_by", "account_status",
+    "registration_date", "category", "updated_at",
+    "match_phone", "match_dob_name",
+)
+
+_SPACES = re.compile(r"\s+")
+
+
+# ----------------------------------------------------------
+# CHUNK NORMALIZATION (services/normalization, vectorized)
+# ----------------------------------------------------------
+def _text(value) -> str | None:
+    if value is None:
+        return None
+    value = _SPACES.sub(" ", str(value)).strip()
+    return value or None
+
+
+def _age(value) -> int | None:
+    try:
+        return int(float(value)) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_chunk(chunk: list, default_category: str | None, now: datetime):
+    """
+    Yield (row number, raw, patients row or None, reject reason or None)
+    for a list of (row number, raw dict), normalizing the whole chunk at once.
+    """
+    import pandas as pd
+
+    frame = normalize_frame(pd.DataFrame([raw for _, raw in chunk], columns=list(COLUMN_MAP.values())))
+    for (number, raw), rec in zip(chunk, frame.itertuples(index=False)):
+        file_no = _text(raw.get("file_no"))
+        if not file_no:
+            yield number, raw, None, "missing file_no"
+            continue
+        if not rec.first_name:
+            yield number, raw, None, "missing name"
+            continue
+        if rec.date_of_birth is None:
+            yield number, raw, None, "invalid date_of_birth"
+            continue
+
+        registration_date = rec.registration_date
+        phone = rec.phone if isinstance(rec.phone, str) else None
+        yield number, raw, {
+            "file_no": file_no,
+            "patient_id": f"PAT-{file_no}",
+            "title": _text(raw.get("title")),
+            "first_name": rec.first_name,
+            "last_name": rec.last_name,
+            "date_of_birth": rec.date_of_birth,
+            "age": _age(raw.get("age")),
+            "sex": rec.sex if isinstance(rec.sex, str) else "Unknown",
+            "phone": phone or "NA",   # column is NOT NULL
+            "email": rec.email if isinstance(rec.email, str) else None,
+            "registered_by": (_text(raw.get("registered_by")) or "import").title(),
+            "account_status": _text(raw.get("account_status")),
+            "registration_date": registration_date,
+            "category": _text(raw.get("category")) or default_category,
+            "is_test": False,
+            "created_at": datetime.combine(registration_date, datetime.min.time()) if registration_date else now,
+            "updated_at": now,
+            **match_keys(rec.last_name, rec.date_of_birth, phone),
+        }, None
+
+
+# ----------------------------------------------------------
+# STREAMING READER
+# ----------------------------------------------------------
+def iter_workbook_rows(path: str):
+    """Yield (sheet row number, {mapped column: value}) from every sheet."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            columns = [COLUMN_MAP.get(str(h).strip()) if h is not None else None for h in header]
+            for number, values in enumerate(rows, start=2):
+                if not any(v not in (None, "") for v in values):
+                    continue
+                yield number, {col: v for col, v in zip(columns, values) if col}
+    finally:
+        workbook.close()
+
+
+# ----------------------------------------------------------
+# BULK UPSERT
+# ----------------------------------------------------------
+def _upsert_statement(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Patient import needs ON CONFLICT support; {dialect_name} is not supported")
+
+    stmt = insert(Patient.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["file_no"],
+        set_={col: stmt.excluded[col] for col in UPSERT_COLUMNS},
+    )
+
+
+def _write_batch(stmt, batch: dict) -> int:
+    with engine.begin() as conn:
+        conn.execute(stmt, list(batch.values()))
+    return len(batch)
+
+
+def _possible_duplicates(batch: dict, seen: dict) -> list:
+    """
+    (row, other file numbers) for rows whose blocking keys already belong
+    to a different file number, in the table or earlier in this import.
+    `seen` (key -> file numbers) is updated with this batch.
+    """
+    rows = list(batch.values())
+    with engine.connect() as conn:
+        stored = existing_matches(conn, rows)
+
+    flagged = []
+    for row in rows:
+        others = set()
+        for key in ("match_phone", "match_dob_name"):
+            value = row[key]
+            if value:
+                others |= stored.get(value, set()) | seen.get(value, set())
+        others.discard(row["file_no"])
+        if others:
+            flagged.append((row, sorted(others)))
+    for row in rows:
+        for key in ("match_phone", "match_dob_name"):
+            if row[key]:
+                seen.setdefault(row[key], set()).add(row["file_no"])
+    return flagged
+
+
+def import_workbook(
+    path: str,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    default_category: str | None = None,
+    dry_run: bool = False,
+    on_reject=None,
+    on_duplicate=None,
+) -> dict:
+    """
+    Stream one workbook into patients. Returns counts and timing.
+    `on_reject(row_number, raw, reason)` is called for every skipped row;
+    `on_duplicate(row, other_file_nos)` for every row that shares a
+    blocking key with another file number (the row is still imported).
+    """
+    if default_category is None and "diagnostic" in os.path.basename(path).lower():
+        default_category = "Diagnostics"
+
+    stmt = None if dry_run else _upsert_statement(engine.dialect.name)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    read = written = duplicates = possible_duplicates = 0
+    rejects = Counter()
+    batch = {}   # file_no -> row; one statement may not touch a key twice
+    seen_keys = {}
+
+    def process(chunk):
+        nonlocal written, duplicates, possible_duplicates, batch
+        for number, raw, row, reason in normalize_chunk(chunk, default_category, now):
+            if row is None:
+                rejects[reason] += 1
+                if on_reject:
+                    on_reject(number, raw, reason)
+                continue
+            if row["file_no"] in batch:
+                duplicates += 1
+            batch[row["file_no"]] = row
+        if batch:
+            # checked before writing, so re-imports don't match themselves
+            for row, others in _possible_duplicates(batch, seen_keys):
+                possible_duplicates += 1
+                if on_duplicate:
+                    on_duplicate(row, others)
+            written += len(batch) if dry_run else _write_batch(stmt, batch)
+        batch = {}
+
+    chunk = []
+    for number, raw in iter_workbook_rows(path):
+        read += 1
+        chunk.append((number, raw))
+        if len(chunk) >= batch_size:
+            process(chunk)
+            chunk = []
+    if chunk:
+        process(chunk)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "file": path,
+        "read": read,
+        "upserted": written,
+        "duplicates_in_batch": duplicates,
+        "possible_duplicates": possible_duplicates,
+        "rejected": sum(rejects.values()),
+        "reject_reasons": dict(rejects),
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(read / elapsed, 1) if elapsed else None,
+        "dry_run": dry_run,
+    }
+
+
+# ----------------------------------------------------------
+# CLI
+# ----------------------------------------------------------
+def init_patient_import(app):
+    """Register the `import-patients` CLI command."""
+
+    @app.cli.command("import-patients")
+    @click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True, type=int)
+    @click.option("--category", default=None,
+                  help="Category for sheets without a Category column (default: Diagnostics for diagnostics workbooks).")
+    @click.option("--rejects", "rejects_path", default=None, type=click.Path(dir_okay=False),
+                  help="Write rejected rows (with reason) to this CSV.")
+    @click.option("--duplicates", "duplicates_path", default=None, type=click.Path(dir_okay=False),
+                  help="Write rows that look like an already-registered patient to this CSV.")
+    @click.option("--dry-run", is_flag=True, help="Parse and validate only; write nothing.")
+    def import_patients_command(paths, batch_size, category, rejects_path, duplicates_path, dry_run):
+        """Import patient workbooks (xlsx) into the patients table."""
+        reject_file = open(rejects_path, "w", newline="") if rejects_path else None
+        duplicate_file = open(duplicates_path, "w", newline="") if duplicates_path else None
+        writer = duplicate_writer = None
+        if reject_file:
+            writer = csv.writer(reject_file)
+            writer.writerow(["file", "row", "reason", *COLUMN_MAP.values()])
+        if duplicate_file:
+            duplicate_writer = csv.writer(duplicate_file)
+            duplicate_writer.writerow(["file", "file_no", "first_name", "last_name", "date_of_birth",
+                                       "phone", "possible_duplicate_of"])
+
+        try:
+            for path in paths:
+                on_reject = on_duplicate = None
+                if writer:
+                    def on_reject(number, raw, reason, path=path):
+                        writer.writerow([path, number, reason, *(raw.get(c) for c in COLUMN_MAP.values())])
+                if duplicate_writer:
+                    def on_duplicate(row, others, path=path):
+                        duplicate_writer.writerow([path, row["file_no"], row["first_name"], row["last_name"],
+                                                   row["date_of_birth"], row["phone"], " ".join(others)])
+
+                result = import_workbook(
+                    path,
+                    batch_size=batch_size,
+                    default_category=category,
+                    dry_run=dry_run,
+                    on_reject=on_reject,
+                    on_duplicate=on_duplicate,
+                )
+                click.echo(
+                    f"{os.path.basename(path)}: read {result['read']}, "
+                    f"{'validated' if dry_run else 'upserted'} {result['upserted']}, "
+                    f"rejected {result['rejected']}, "
+                    f"{result['rows_per_sec']} rows/s ({result['seconds']}s)"
+                )
+                for reason, count in sorted(result["reject_reasons"].items()):
+                    click.echo(f"  rejected ({reason}): {count}")
+                if result["duplicates_in_batch"]:
+                    click.echo(f"  repeated file numbers (last row kept): {result['duplicates_in_batch']}")
+                if result["possible_duplicates"]:
+                    click.echo(f"  possible duplicate patients (imported, please review): {result['possible_duplicates']}")
+                logger.info(f"Patient import: {result}")
+        finally:
+            for handle in (reject_file, duplicate_file):
+                if handle:
+                    handle.close()
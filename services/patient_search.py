@@ -0,0 +1,376 @@
+# ==========================================================
+# Patient Search — patient_search.py
+# Ranked partial-match search over patients
+#
+#   Postgres : pg_trgm + generated tsvector column, both GIN-indexed
+#              (migration d7a3c9e1f4b6); one query, ranked in SQL
+#   other    : in-process trigram index (SQLite dev/test runs), built
+#              lazily from the table and kept current on commit
+#
+# Entry point: services.patient_services.search_patients_ranked()
+# ==========================================================
+
+import logging
+import re
+import threading
+from collections import Counter
+
+from sqlalchemy import event, func, inspect, literal, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+
+from db import engine
+from models import Patient
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MIN_CHARS = 2
+SEARCH_MAX_LIMIT = 50
+SIMILARITY_THRESHOLD = 0.4     # word similarity; below pg_trgm's 0.6 default to tolerate typos
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_NON_DIGIT = re.compile(r"\D+")
+
+# what search results carry (enough for a pick list)
+RESULT_COLUMNS = (
+    Patient.id,
+    Patient.file_no,
+    Patient.patient_id,
+    Patient.first_name,
+    Patient.last_name,
+    Patient.sex,
+    Patient.date_of_birth,
+    Patient.phone,
+)
+
+
+def normalize_query(query: str) -> tuple[str, list[str], str]:
+    """
+    (lowercased query, word tokens, phone digits). Phones are stored as
+    +234XXXXXXXXXX, so a local "0803..." prefix is searched as "803...".
+    """
+    q = " ".join((query or "").lower().split())
+    digits = _NON_DIGIT.sub("", q)
+    if digits.startswith("0"):
+        digits = digits[1:]
+    return q, _TOKEN.findall(q), digits
+
+
+def _result(row, score: float) -> dict:
+    return {
+        "id": row["id"],
+        "file_no": row["file_no"],
+        "patient_id": row["patient_id"],
+        "first_name": row["first_name"],
+        "last_name": row["last_name"],
+        "full_name": f"{row['first_name']} {row['last_name']}",
+        "sex": row["sex"],
+        "date_of_birth": row["date_of_birth"].isoformat() if row["date_of_birth"] else None,
+        "phone": row["phone"],
+        "score": round(float(score), 4),
+    }
+
+
+# ----------------------------------------------------------
+# POSTGRES: pg_trgm + tsvector
+# ----------------------------------------------------------
+# Every branch of the WHERE clause is served by one of the GIN indexes,
+# so Postgres answers with a BitmapOr and only ranks the candidates.
+PG_SEARCH_SQL = text("""
+    SELECT id, file_no, patient_id, first_name, last_name, sex, date_of_birth, phone,
+           GREATEST(
+               word_similarity(:q, lower(first_name || ' ' || last_name)),
+               similarity(lower(file_no), :q)
+           )
+           + CASE WHEN :tsq <> '' THEN ts_rank(search_vector, to_tsquery('simple', :tsq)) ELSE 0 END
+           + CASE WHEN lower(file_no) = :q OR lower(patient_id) = :q THEN 1 ELSE 0 END
+           + CASE WHEN :digits <> '' AND phone LIKE :digits_like THEN 0.5 ELSE 0 END
+           AS score
+    FROM patients
+    WHERE (:tsq <> '' AND search_vector @@ to_tsquery('simple', :tsq))
+       OR lower(first_name || ' ' || last_name) LIKE :q_like
+       OR :q <% lower(first_name || ' ' || last_name)
+       OR lower(file_no) LIKE :q_prefix
+       OR (:digits <> '' AND phone LIKE :digits_like)
+    ORDER BY score DESC, id DESC
+    LIMIT :limit
+""")
+
+_pg_ready = None
+
+
+def pg_search_available() -> bool:
+    """True once the search migration has added patients.search_vector."""
+    global _pg_ready
+    if _pg_ready is None:
+        if engine.dialect.name != "postgresql":
+            _pg_ready = False
+        else:
+            columns = {c["name"] for c in inspect(engine).get_columns("patients")}
+            _pg_ready = "search_vector" in columns
+            if not _pg_ready:
+                logger.warning("patients.search_vector missing; using in-process patient search")
+    return _pg_ready
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def pg_search(session, query: str, limit: int) -> list[dict]:
+    q, tokens, digits = normalize_query(query)
+    escaped = _like_escape(q)
+    # transaction-scoped, so safe behind a transaction-mode pooler
+    session.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {"threshold": str(SIMILARITY_THRESHOLD)},
+    )
+    rows = session.execute(PG_SEARCH_SQL, {
+        "q": q,
+        "tsq": " & ".join(f"{t}:*" for t in tokens),
+        "q_like": f"%{escaped}%",
+        "q_prefix": f"{escaped}%",
+        "digits": digits if len(digits) >= 3 else "",
+        "digits_like": f"%{digits}%",
+        "limit": limit,
+    }).mappings().all()
+    return [_result(row, row["score"]) for row in rows]
+
+
+# indexed expressions, verbatim (a bound ' ' would not match the index)
+PG_NAME_EXPR = literal_column("lower(first_name || ' ' || last_name)")
+PG_FILE_NO_EXPR = literal_column("lower(file_no)")
+PG_SEARCH_VECTOR = literal_column("search_vector")
+
+
+def pg_token_clause(token: str):
+    """
+    Filter for one query word where every branch has a GIN index (so
+    Postgres can BitmapOr them): name substring and file_no prefix via
+    pg_trgm, word prefixes (names, file_no, patient_id, email) via
+    search_vector, and phone digits via pg_trgm. Used by the paged
+    records list (services/records.py).
+    """
+    q, words, digits = normalize_query(token)
+    escaped = _like_escape(q)
+    branches = [
+        PG_NAME_EXPR.like(literal(f"%{escaped}%"), escape="\\"),
+        PG_FILE_NO_EXPR.like(literal(f"{escaped}%"), escape="\\"),
+    ]
+    if words:
+        tsq = " & ".join(f"{w}:*" for w in words)
+        branches.append(PG_SEARCH_VECTOR.op("@@")(func.to_tsquery("simple", tsq)))
+    if len(digits) >= 3:
+        branches.append(Patient.phone.like(f"%{digits}%"))
+    return or_(*branches)
+
+
+# ----------------------------------------------------------
+# FALLBACK: in-process trigram index
+# ----------------------------------------------------------
+def trigrams(value: str) -> set[str]:
+    """pg_trgm-style trigrams: each word padded with two leading, one trailing space."""
+    grams = set()
+    for word in _TOKEN.findall(value.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class PatientSearchIndex:
+    """
+    Trigram postings over name words / file no / patient ID, plus a
+    substring index over phone digits.
+
+    Mirrors the Postgres matching and ranking closely enough for tests
+    and dev data; it keeps a small dict per patient in memory, so it is
+    not meant for production-sized tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}            # id -> row dict + precomputed search keys
+        self._postings = {}        # word trigram -> set(ids)
+        self._digit_postings = {}  # 3-digit substring of phone -> set(ids)
+        self.built = False
+
+    def build(self, bind=None):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._digit_postings.clear()
+            with (bind or engine).connect() as conn:
+                for row in conn.execute(select(*RESULT_COLUMNS, Patient.email)).mappings():
+                    self._add(dict(row))
+            self.built = True
+            logger.info(f"Patient search index built ({len(self._docs)} patients)")
+
+    def ensure_built(self):
+        if not self.built:
+            self.build()
+
+    def upsert(self, row: dict):
+        with self._lock:
+            if self.built:
+                self._remove(row["id"])
+                self._add(row)
+
+    def remove(self, patient_id: int):
+        with self._lock:
+            if self.built:
+                self._remove(patient_id)
+
+    @staticmethod
+    def _digit_grams(digits: str) -> set[str]:
+        return {digits[i:i + 3] for i in range(len(digits) - 2)}
+
+    def _add(self, row: dict):
+        name = f"{row['first_name'] or ''} {row['last_name'] or ''}".lower().strip()
+        file_no = (row["file_no"] or "").lower()
+        patient_id = (row["patient_id"] or "").lower()
+        words = set(_TOKEN.findall(f"{name} {file_no} {patient_id} {(row.get('email') or '').lower()}"))
+
+        doc = dict(row)
+        doc["_name"] = name
+        doc["_file_no"] = file_no
+        doc["_patient_id"] = patient_id
+        doc["_words"] = words
+        doc["_word_grams"] = [trigrams(w) for w in _TOKEN.findall(f"{name} {file_no}")]
+        doc["_digits"] = _NON_DIGIT.sub("", row["phone"] or "")
+        doc["_grams"] = trigrams(f"{name} {file_no} {patient_id}")
+        self._docs[row["id"]] = doc
+
+        for gram in doc["_grams"]:
+            self._postings.setdefault(gram, set()).add(row["id"])
+        for gram in self._digit_grams(doc["_digits"]):
+            self._digit_postings.setdefault(gram, set()).add(row["id"])
+
+    def _remove(self, patient_id: int):
+        doc = self._docs.pop(patient_id, None)
+        if not doc:
+            return
+        for postings, grams in (
+            (self._postings, doc["_grams"]),
+            (self._digit_postings, self._digit_grams(doc["_digits"])),
+        ):
+            for gram in grams:
+                ids = postings.get(gram)
+                if ids:
+                    ids.discard(patient_id)
+                    if not ids:
+                        del postings[gram]
+
+    @staticmethod
+    def _similarity(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        shared = len(a & b)
+        return shared / (len(a) + len(b) - shared)
+
+    def _word_similarity(self, token_grams: list[set], doc: dict) -> float:
+        """Mean over query words of the best-matching document word."""
+        if not token_grams or not doc["_word_grams"]:
+            return 0.0
+        return sum(
+            max(self._similarity(grams, word) for word in doc["_word_grams"])
+            for grams in token_grams
+        ) / len(token_grams)
+
+    def _candidates(self, q_grams: set, digits: str) -> set:
+        if digits:
+            # phone substring: every 3-digit window must be present
+            grams = sorted(self._digit_grams(digits), key=lambda g: len(self._digit_postings.get(g, ())))
+            ids = set(self._digit_postings.get(grams[0], ()))
+            for gram in grams[1:]:
+                ids &= self._digit_postings.get(gram, set())
+                if not ids:
+                    break
+        else:
+            ids = set()
+
+        # rarest trigrams first; a match must share a good part of them
+        grams = sorted(q_grams, key=lambda g: len(self._postings.get(g, ())))
+        needed = max(1, len(grams) // 2)
+        hits = Counter()
+        for gram in grams[:needed + 1]:
+            hits.update(self._postings.get(gram, ()))
+        ids.update(doc_id for doc_id, count in hits.items() if count >= min(2, needed))
+        return ids
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        q, tokens, digits = normalize_query(query)
+        if len(digits) < 3:
+            digits = ""
+        token_grams = [trigrams(t) for t in tokens]
+
+        with self._lock:
+            scored = []
+            for doc_id in self._candidates(trigrams(q), digits):
+                doc = self._docs[doc_id]
+                token_match = bool(tokens) and all(
+                    any(word.startswith(t) for word in doc["_words"]) for t in tokens
+                )
+                sim = self._word_similarity(token_grams, doc)
+                phone_match = bool(digits) and digits in doc["_digits"]
+                exact_id = q in (doc["_file_no"], doc["_patient_id"])
+                matched = (
+                    token_match
+                    or exact_id
+                    or q in doc["_name"]
+                    or sim >= SIMILARITY_THRESHOLD
+                    or doc["_file_no"].startswith(q)
+                    or phone_match
+                )
+                if not matched:
+                    continue
+                score = sim + (0.1 if token_match else 0) + (1 if exact_id else 0) + (0.5 if phone_match else 0)
+                scored.append((score, doc_id, doc))
+
+        scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+        return [_result(doc, score) for score, _, doc in scored[:limit]]
+
+
+fallback_index = PatientSearchIndex()
+
+
+# Keep the fallback index in step with committed writes. Rows are
+# snapshotted at flush (attributes expire on commit) and applied only
+# once the transaction commits.
+def _snapshot(patient: Patient) -> dict:
+    row = {col.key: getattr(patient, col.key) for col in RESULT_COLUMNS}
+    row["email"] = patient.email
+    return row
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_patient_changes(session, flush_context):
+    if not fallback_index.built:
+        return
+    changes = session.info.setdefault("patient_search_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Patient):
+            changes.append(("upsert", _snapshot(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            changes.append(("remove", obj.id))
+
+
+def note_bulk_inserted(session, patients):
+    """ORM bulk inserts skip flush events; queue their rows explicitly."""
+    if fallback_index.built:
+        changes = session.info.setdefault("patient_search_changes", [])
+        changes.extend(("upsert", _snapshot(p)) for p in patients)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_patient_changes(session):
+    for action, payload in session.info.pop("patient_search_changes", []):
+        if action == "upsert":
+            fallback_index.upsert(payload)
+        else:
+            fallback_index.remove(payload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_patient_changes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("patient_search_changes", None)
@@ -3,13 +3,89 @@
 # Supabase-backed patient registration
 # ==========================================================
 
-from db import db_session, log_activity
+from sqlalchemy import insert
+
+from db import db_session, log_activities, log_activity
 from models import Patient, Referral
+from services.identifiers import allocate_patient_identifiers, next_patient_identifiers
+from services.normalization import normalize_patient_fields
+from services.patient_dedupe import (
+    DUPLICATE_MESSAGE,
+    DuplicatePatientError,
+    find_duplicates,
+    find_duplicates_bulk,
+    match_keys,
+)
+from services.referrals import resolve_referral_id
+from services.patient_search import (
+    SEARCH_MAX_LIMIT,
+    SEARCH_MIN_CHARS,
+    fallback_index,
+    normalize_query,
+    note_bulk_inserted,
+    pg_search,
+    pg_search_available,
+)
 from datetime import datetime
-import uuid
 
 
 
+REQUIRED_FIELDS = ["first_name", "last_name", "date_of_birth", "sex", "phone"]
+TEXT_FIELDS = [
+    "title", "first_name", "last_name", "sex", "occupation",
+    "phone", "email", "address", "category", "referred_by",
+]
+AGE_MAX = 150
+BULK_REGISTER_MAX = 100
+
+
+def _label(field: str) -> str:
+    return field.replace('_', ' ').title()
+
+
+def _parse_age(value) -> int | None:
+    """Whole number of years, or None when blank. Raises ValueError."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError("Age must be a whole number.")
+    try:
+        age = int(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError("Age must be a whole number.")
+    if not 0 <= age <= AGE_MAX:
+        raise ValueError(f"Age must be between 0 and {AGE_MAX}.")
+    return age
+
+
+def _validated_registration(data: dict) -> dict:
+    """Required fields checked, then names, phone (+234...), email, sex
+    and DOB normalized the same way imports do, age coerced to int and
+    text lengths checked against the patients columns, so every value
+    is insertable as-is. Raises ValueError."""
+    for field in REQUIRED_FIELDS:
+        if not data.get(field):
+            raise ValueError(f"{_label(field)} is required.")
+    for field in TEXT_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"{_label(field)} must be text.")
+
+    raw_email = (data.get("email") or "").strip()
+    data = normalize_patient_fields(data)
+    if raw_email and not data.get("email"):
+        raise ValueError("Email is not a valid email address.")
+    if data["date_of_birth"] is None:
+        raise ValueError("Date Of Birth is not a valid date.")
+    data["age"] = _parse_age(data.get("age"))
+
+    for field in TEXT_FIELDS:
+        column = Referral.__table__.c.name if field == "referred_by" else Patient.__table__.c[field]
+        length = getattr(column.type, "length", None)
+        if length and data.get(field) and len(data[field]) > length:
+            raise ValueError(f"{_label(field)} must be at most {length} characters.")
+    return data
+
+
 # ==========================================================
 # REGISTER NEW PATIENT
 # ==========================================================
@@ -32,53 +108,43 @@ def register_new_patient(data: dict, current_user):
         occupation,
         category,
         referred_by,
-        services: []   # optional
+        services: [],          # optional
+        allow_duplicate: bool  # optional; register despite possible duplicates
     }
+
+    Raises DuplicatePatientError (a ValueError) when existing patients
+    share the phone number or date of birth + surname.
     """
 
     # ------------------------------------------------------
-    # 1. REQUIRED FIELD VALIDATION
+    # 1. REQUIRED FIELD VALIDATION + NORMALIZATION
     # ------------------------------------------------------
-    required = ["first_name", "last_name", "date_of_birth", "sex", "phone"]
-    for field in required:
-        if not data.get(field):
-            raise ValueError(f"{field.replace('_',' ').title()} is required.")
+    data = _validated_registration(data)
 
     # ------------------------------------------------------
-    # 2. GENERATE FILE NO & PATIENT ID
+    # 1b. DUPLICATE CHECK (blocking-key index lookups)
     # ------------------------------------------------------
-    file_no = f"F-{uuid.uuid4().hex[:8].upper()}"
-    patient_id = f"EPN-{datetime.now().year}-{uuid.uuid4().hex[:8].upper()}"
+    if not data.get("allow_duplicate"):
+        candidates = find_duplicates(
+            db_session, data["last_name"], data["date_of_birth"], data["phone"]
+        )
+        if candidates:
+            raise DuplicatePatientError(candidates)
 
     # ------------------------------------------------------
-    # 3. HANDLE REFERRAL (AUTO-CREATE IF NOT EXISTS)
+    # 2. ALLOCATE FILE NO & PATIENT ID (database sequences)
     # ------------------------------------------------------
-    referred_by_id = None
-    referral_name = data.get("referred_by")
-
-    if referral_name:
-        referral = (
-            db_session.query(Referral)
-            .filter(Referral.name == referral_name)
-            .first()
-        )
+    file_no, patient_id = next_patient_identifiers(db_session)
 
-        if not referral:
-            referral = Referral(
-                name=referral_name,
-                type="Other",
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
-            )
-            db_session.add(referral)
-            db_session.flush()
-
-        referred_by_id = referral.id
+    # ------------------------------------------------------
+    # 3. RESOLVE REFERRAL (cached; auto-created if new)
+    # ------------------------------------------------------
+    referred_by_id = resolve_referral_id(db_session, data.get("referred_by"))
 
     # ------------------------------------------------------
     # 4. PARSE DATE OF BIRTH
     # ------------------------------------------------------
-    dob = datetime.strptime(data["date_of_birth"], "%Y-%m-%d").date()
+    dob = data["date_of_birth"]
 
     # ------------------------------------------------------
     # 5. CREATE PATIENT RECORD
@@ -135,3 +201,165 @@ def register_new_patient(data: dict, current_user):
         "patient": patient.to_dict(),
         "message": "Patient registered successfully",
     }
+
+
+# ==========================================================
+# BULK REGISTRATION (family groups, HMO/corporate batches)
+# ==========================================================
+def register_patients_bulk(rows: list, current_user, allow_duplicates: bool = False):
+    """
+    Register up to BULK_REGISTER_MAX patients in one transaction.
+    Called by /api/patients/bulk (POST)
+
+    Each row takes the register_new_patient() fields. Rows that fail
+    validation, or match existing patients (unless `allow_duplicates` or
+    the row's own allow_duplicate is set), are reported and skipped; the
+    rest are inserted together. Rows in the same batch are not checked
+    against each other: families often share a phone number.
+
+    Round trips do not grow with the batch: one duplicate query, one
+    identifier allocation, one multi-row patients INSERT ... RETURNING,
+    one commit (plus one upsert per referrer this worker hasn't seen).
+    """
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Patients must be a non-empty list.")
+    if len(rows) > BULK_REGISTER_MAX:
+        raise ValueError(f"At most {BULK_REGISTER_MAX} patients can be registered at once.")
+
+    results = [None] * len(rows)
+
+    # ------------------------------------------------------
+    # 1. VALIDATE + NORMALIZE EVERY ROW
+    # ------------------------------------------------------
+    valid = []   # (index, normalized data)
+    for index, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Each patient must be an object.")
+            valid.append((index, _validated_registration(row)))
+        except ValueError as e:
+            results[index] = {"index": index, "success": False, "message": str(e)}
+
+    # ------------------------------------------------------
+    # 2. DUPLICATE CHECK (one blocking-key query for the batch)
+    # ------------------------------------------------------
+    to_check = [(i, d) for i, d in valid if not (allow_duplicates or d.get("allow_duplicate"))]
+    if to_check:
+        for (index, _), candidates in zip(to_check, find_duplicates_bulk(db_session, [d for _, d in to_check])):
+            if candidates:
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "message": DUPLICATE_MESSAGE,
+                    "duplicates": candidates,
+                }
+        valid = [(i, d) for i, d in valid if results[i] is None]
+
+    if not valid:
+        db_session.rollback()
+        return {"success": False, "created": 0, "failed": len(rows), "results": results}
+
+    # ------------------------------------------------------
+    # 3. REFERRALS (once per distinct referrer) + IDENTIFIERS
+    # ------------------------------------------------------
+    referral_ids = {}
+    for _, d in valid:
+        name = d.get("referred_by")
+        if name and name not in referral_ids:
+            referral_ids[name] = resolve_referral_id(db_session, name)
+
+    identifiers = allocate_patient_identifiers(db_session, len(valid))
+
+    # ------------------------------------------------------
+    # 4. MULTI-ROW INSERT (ORM bulk INSERT ... RETURNING)
+    # ------------------------------------------------------
+    now = datetime.now()
+    values = []
+    for (_, d), (file_no, patient_id) in zip(valid, identifiers):
+        values.append({
+            "file_no": file_no,
+            "patient_id": patient_id,
+            "title": d.get("title"),
+            "first_name": d["first_name"],
+            "last_name": d["last_name"],
+            "date_of_birth": d["date_of_birth"],
+            "age": d.get("age"),
+            "sex": d["sex"],
+            "occupation": d.get("occupation"),
+            "phone": d["phone"],
+            "email": d.get("email"),
+            "address": d.get("address"),
+            "category": d.get("category"),
+            "referred_by_id": referral_ids.get(d.get("referred_by")),
+            "registered_by": current_user.username,
+            "is_test": False,
+            "created_at": now,
+            "updated_at": now,
+            # bulk INSERT skips mapper events, so set the blocking keys here
+            **match_keys(d["last_name"], d["date_of_birth"], d["phone"]),
+        })
+
+    # RETURNING order isn't guaranteed without a sentinel; match on file_no
+    inserted = db_session.scalars(insert(Patient).returning(Patient), values).all()
+    by_file_no = {p.file_no: p for p in inserted}
+    patients = [by_file_no[v["file_no"]] for v in values]
+    note_bulk_inserted(db_session, patients)
+
+    # ------------------------------------------------------
+    # 5. ACTIVITY LOG (queued / one multi-row INSERT)
+    # ------------------------------------------------------
+    department = getattr(current_user, "department", None) or "unknown"
+    log_activities([
+        {
+            "department": department,
+            "activity_type": "patient_registration",
+            "description": f"New patient registered: {p.first_name} {p.last_name}",
+            "patient_name": f"{p.first_name} {p.last_name}",
+            "patient_id": p.patient_id,
+            "performed_by": current_user.username,
+            "metadata": {
+                "file_no": p.file_no,
+                "services_count": len(d.get("services", [])),
+                "bulk": True,
+            },
+        }
+        for p, (_, d) in zip(patients, valid)
+    ])
+
+    # ------------------------------------------------------
+    # 6. PER-ROW RESULTS (before commit expires the rows) + COMMIT
+    # ------------------------------------------------------
+    for p, (index, _) in zip(patients, valid):
+        results[index] = {"index": index, "success": True, "patient": p.to_dict()}
+
+    db_session.commit()
+
+    return {
+        "success": len(patients) == len(rows),
+        "created": len(patients),
+        "failed": len(rows) - len(patients),
+        "results": results,
+    }
+
+
+# ==========================================================
+# RANKED PATIENT SEARCH (reception lookup)
+# ==========================================================
+def search_patients_ranked(query: str, limit: int = 20):
+    """
+    Best matches for a partial name, phone number, file number or
+    patient ID, highest score first.
+
+    Postgres uses the pg_trgm / tsvector GIN indexes; anything else
+    (SQLite test runs) uses the in-process trigram index.
+    """
+    q, _, _ = normalize_query(query)
+    if len(q) < SEARCH_MIN_CHARS:
+        return []
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+
+    if pg_search_available():
+        return pg_search(db_session, q, limit)
+
+    fallback_index.ensure_built()
+    return fallback_index.search(q, limit)
@@ -0,0 +1,142 @@
+# ==========================================================
+# Pricing — pricing.py
+# Basket quotes over the service catalog, in integer kobo
+#
+#   POST /api/catalog/quote
+#   { "tier": "walkin", "items": [ {"key": ..., "quantity": 2, "tier": "hospital"}, ... ] }
+#
+# Tiers are the catalog's three price columns: outsourced, walkin and
+# hospital. Prices stay integer kobo end to end (no float rounding);
+# naira labels are only formatted for display.
+#
+# Lookups are vectorized: the catalog's prices are held in one int64
+# matrix (item × tier, NO_PRICE for "N/A"), rebuilt whenever the catalog
+# snapshot changes, so a quote is a single fancy-indexing gather plus a
+# multiply and a sum however large the basket is.
+# ==========================================================
+
+import threading
+
+import numpy as np
+
+from services.catalog import PRICE_TYPES, catalog, format_naira
+
+TIERS = PRICE_TYPES
+DEFAULT_TIER = "walkin"
+NO_PRICE = -1
+QUOTE_MAX_LINES = 500
+QUOTE_MAX_QUANTITY = 1000
+
+_TIER_INDEX = {tier: i for i, tier in enumerate(TIERS)}
+
+
+class PriceTable:
+    """key → row index + (items × tiers) int64 kobo matrix (catalog keys are unique)."""
+
+    def __init__(self, items: list, snapshot_hash: str | None):
+        self.snapshot_hash = snapshot_hash
+        self.items = items
+        self.index = {item.key: row for row, item in enumerate(items)}
+        self.matrix = np.array(
+            [[NO_PRICE if item.prices[t] is None else item.prices[t] for t in TIERS] for item in items],
+            dtype=np.int64,
+        ).reshape(len(items), len(TIERS))
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def price_table() -> PriceTable:
+    """The table for the catalog as currently loaded (rebuilt after a reload)."""
+    global _table
+    catalog.ensure_loaded()
+    table = _table
+    if table is None or table.snapshot_hash != catalog.snapshot_hash:
+        with _table_lock:
+            if _table is None or _table.snapshot_hash != catalog.snapshot_hash:
+                _table = PriceTable(catalog.items, catalog.snapshot_hash)
+            table = _table
+    return table
+
+
+def _tier(value, default: str) -> str:
+    tier = value or default
+    if not isinstance(tier, str) or tier.strip().lower() not in _TIER_INDEX:
+        raise ValueError(f"Unknown price tier: {value!r}. Use one of {', '.join(TIERS)}.")
+    return tier.strip().lower()
+
+
+def _quantity(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f"Quantity must be a whole number, got {value!r}.")
+    try:
+        quantity = int(value if value is not None else 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"Quantity must be a whole number, got {value!r}.")
+    if not 1 <= quantity <= QUOTE_MAX_QUANTITY:
+        raise ValueError(f"Quantity must be between 1 and {QUOTE_MAX_QUANTITY}.")
+    return quantity
+
+
+def quote(lines: list, tier: str = DEFAULT_TIER) -> dict:
+    """
+    Price a basket. Each line is {"key", "quantity"=1, "tier"=<basket tier>}.
+
+    Lines whose key is not in the catalog, or that have no price in their
+    tier ("N/A"), are returned with priced=False and left out of the total.
+    Raises ValueError for a malformed basket.
+    """
+    if not isinstance(lines, list):
+        raise ValueError("Items must be a list.")
+    if len(lines) > QUOTE_MAX_LINES:
+        raise ValueError(f"At most {QUOTE_MAX_LINES} items can be quoted at once.")
+    basket_tier = _tier(tier, DEFAULT_TIER)
+
+    keys, tiers, quantities = [], [], []
+    for line in lines:
+        if not isinstance(line, dict) or not line.get("key"):
+            raise ValueError("Each item needs a catalog key.")
+        keys.append(str(line["key"]))
+        tiers.append(_tier(line.get("tier"), basket_tier))
+        quantities.append(_quantity(line.get("quantity")))
+
+    table = price_table()
+    rows = np.fromiter((table.index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+    tier_cols = np.fromiter((_TIER_INDEX[t] for t in tiers), dtype=np.int64, count=len(tiers))
+    qty = np.asarray(quantities, dtype=np.int64)
+
+    known = rows >= 0
+    unit = np.full(len(keys), NO_PRICE, dtype=np.int64)
+    unit[known] = table.matrix[rows[known], tier_cols[known]]
+    priced = unit != NO_PRICE
+    line_totals = np.where(priced, unit * qty, 0)
+    total = int(line_totals.sum())
+
+    out_lines = []
+    for i, key in enumerate(keys):
+        item = table.items[rows[i]] if known[i] else None
+        unit_kobo = int(unit[i]) if priced[i] else None
+        out_lines.append({
+            "key": key,
+            "name": item.name if item else None,
+            "scope": item.scope if item else None,
+            "tier": tiers[i],
+            "quantity": quantities[i],
+            "found": bool(known[i]),
+            "priced": bool(priced[i]),
+            "unit_kobo": unit_kobo,
+            "total_kobo": int(line_totals[i]) if priced[i] else None,
+            "unit": format_naira(unit_kobo),
+            "total": format_naira(int(line_totals[i]) if priced[i] else None),
+        })
+
+    return {
+        "tier": basket_tier,
+        "lines": out_lines,
+        "total_kobo": total,
+        "total": format_naira(total),
+        "priced_count": int(priced.sum()),
+        "unpriced_count": int((~priced).sum()),
+        "catalog_hash": table.snapshot_hash,
+    }
@@ -1,15 +1,210 @@
 # ==========================================================
-# records.py — DEPRECATED (CSV-driven frontend now in use)
+# records.py — Patient Records queries (records workspace)
+# Server-side search, filtering, sorting and keyset pagination
+# over the `patients` table
 # ==========================================================
 
-def fetch_all_patients():
-    return []
+import base64
+import json
+from datetime import datetime
 
-def search_patients(query: str):
-    return []
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.orm import load_only
+
+from db import db_session
+from models import Patient
+from services.patient_search import pg_search_available, pg_token_clause
+
+PAGE_DEFAULT_LIMIT = 25
+PAGE_MAX_LIMIT = 100
+
+# sortable columns; each has a (column, id) index so pages are range scans
+SORT_COLUMNS = {
+    "created_at": Patient.created_at,
+    "last_name": Patient.last_name,
+    "first_name": Patient.first_name,
+    "file_no": Patient.file_no,
+    "patient_id": Patient.patient_id,
+}
+
+FILTER_COLUMNS = {
+    "sex": Patient.sex,
+    "category": Patient.category,
+    "account_status": Patient.account_status,
+}
+
+# what the table rows show; full records come from fetch_single_patient
+LIST_COLUMNS = (
+    Patient.id,
+    Patient.file_no,
+    Patient.patient_id,
+    Patient.first_name,
+    Patient.last_name,
+    Patient.sex,
+    Patient.age,
+    Patient.email,
+    Patient.phone,
+    Patient.account_status,
+    Patient.category,
+    Patient.created_at,
+)
+
+
+# ----------------------------------------------------------
+# CURSORS (opaque to the client)
+# ----------------------------------------------------------
+def encode_cursor(sort: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str):
+    """(value, id) from a cursor made for `sort`; ValueError if it isn't one."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if cursor_sort != sort or not isinstance(row_id, int):
+        raise ValueError("Cursor does not match the requested sort")
+    if sort == "created_at":
+        value = datetime.fromisoformat(value)
+    return value, row_id
+
+
+# ----------------------------------------------------------
+# SEARCH
+# ----------------------------------------------------------
+def _search_clause(query: str):
+    """
+    Every whitespace-separated token must match some identifying field.
+
+    On Postgres each token uses the pg_trgm / tsvector GIN indexes
+    (patient_search.pg_token_clause); the %token% ILIKE scan below is
+    only the fallback for databases without them (SQLite dev/test).
+    """
+    if pg_search_available():
+        return and_(*(pg_token_clause(token) for token in query.split()))
+
+    clauses = []
+    for token in query.split():
+        clauses.append(or_(
+            Patient.file_no.istartswith(token, autoescape=True),
+            Patient.patient_id.istartswith(token, autoescape=True),
+            Patient.first_name.icontains(token, autoescape=True),
+            Patient.last_name.icontains(token, autoescape=True),
+            Patient.email.istartswith(token, autoescape=True),
+            Patient.phone.contains(token, autoescape=True),
+        ))
+    return and_(*clauses)
+
+
+def _summary(patient: Patient) -> dict:
+    return {
+        "id": patient.id,
+        "file_no": patient.file_no,
+        "patient_id": patient.patient_id,
+        "first_name": patient.first_name,
+        "last_name": patient.last_name,
+        "full_name": f"{patient.first_name} {patient.last_name}",
+        "sex": patient.sex,
+        "age": patient.age,
+        "email": patient.email,
+        "phone": patient.phone,
+        "account_status": patient.account_status,
+        "category": patient.category,
+    }
+
+
+def search_patients(
+    query: str = "",
+    filters: dict | None = None,
+    sort: str = "created_at",
+    direction: str = "desc",
+    limit: int = PAGE_DEFAULT_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+) -> dict:
+    """
+    One page of patients ordered by (sort, id).
+
+    `cursor` is the `next_cursor` of the previous page. The total match
+    count is only computed when asked for (it is the one part that scans
+    every matching row).
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort: {sort}")
+    if direction not in ("asc", "desc"):
+        raise ValueError(f"Unsupported direction: {direction}")
+    limit = max(1, min(int(limit), PAGE_MAX_LIMIT))
+
+    conditions = []
+    query = (query or "").strip()
+    if query:
+        conditions.append(_search_clause(query))
+    for key, value in (filters or {}).items():
+        if key == "is_test":
+            conditions.append(Patient.is_test.is_(bool(value)))
+        elif key in FILTER_COLUMNS and value:
+            conditions.append(func.lower(FILTER_COLUMNS[key]) == str(value).lower())
+
+    sort_col = SORT_COLUMNS[sort]
+    page_conditions = list(conditions)
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort)
+        key = tuple_(sort_col, Patient.id)
+        page_conditions.append(key < (value, row_id) if direction == "desc" else key > (value, row_id))
+
+    order = (sort_col.desc(), Patient.id.desc()) if direction == "desc" else (sort_col.asc(), Patient.id.asc())
+    rows = (
+        db_session.query(Patient)
+        .options(load_only(*LIST_COLUMNS))
+        .filter(*page_conditions)
+        .order_by(*order)
+        .limit(limit + 1)
+        .all()
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1] if rows else None
+
+    result = {
+        "patients": [_summary(p) for p in rows],
+        "has_more": has_more,
+        "next_cursor": encode_cursor(sort, getattr(last, sort), last.id) if has_more else None,
+        "sort": sort,
+        "direction": direction,
+        "limit": limit,
+    }
+    if include_total:
+        result["total"] = (
+            db_session.query(func.count(Patient.id)).filter(*conditions).scalar() or 0
+        )
+    return result
+
+
+# ----------------------------------------------------------
+# SINGLE RECORD
+# ----------------------------------------------------------
+def fetch_single_patient(identifier: str) -> dict | None:
+    """Full record by numeric id, file number or patient ID."""
+    identifier = (identifier or "").strip()
+    if not identifier:
+        return None
+
+    # file numbers can be all digits too, so they win over the row id
+    patient = (
+        db_session.query(Patient)
+        .filter(or_(Patient.file_no == identifier, Patient.patient_id == identifier))
+        .first()
+    )
+    if patient is None and identifier.isdigit():
+        patient = db_session.get(Patient, int(identifier))
+    return patient.to_dict() if patient else None
 
-def fetch_single_patient(identifier: str):
-    return {}
 
 def fetch_services():
     return []
@@ -0,0 +1,127 @@
+# ==========================================================
+# Referrals — referrals.py
+# Referral name → id resolution for patient registration
+#
+# referrals.name_key (normalization.referral_key: trimmed, single-spaced,
+# casefolded) is unique, so "Dr  Ada Obi" and "dr ada obi" are the same
+# referrer. Lookups go through an in-process cache warmed at startup;
+# only a referrer this worker has never seen costs a round trip:
+#
+#   INSERT ... ON CONFLICT (name_key) DO NOTHING RETURNING id
+#   (+ one SELECT when another registration inserted it first)
+#
+# Ids inserted by a transaction are cached only once it commits.
+# ==========================================================
+
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from db import engine
+from models import Referral
+from services.normalization import referral_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFERRAL_TYPE = "Other"
+_PENDING = "pending_referrals"
+
+
+class ReferralCache:
+    """Thread-safe name_key → referral id map (per worker)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def warm(self) -> int:
+        """Load every referrer; returns how many were cached."""
+        with engine.connect() as conn:
+            rows = conn.execute(select(Referral.name_key, Referral.id)).all()
+        with self._lock:
+            self._ids.update(dict(rows))
+        logger.info(f"Referral cache warmed with {len(rows)} referrers")
+        return len(rows)
+
+    def get(self, key: str) -> int | None:
+        return self._ids.get(key)
+
+    def put(self, key: str, referral_id: int):
+        with self._lock:
+            self._ids[key] = referral_id
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+referral_cache = ReferralCache()
+
+
+def _insert_statement(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Referral upsert needs ON CONFLICT support; {dialect_name} is not supported")
+    return insert(Referral.__table__)
+
+
+def resolve_referral_id(session, name: str | None, referral_type: str = DEFAULT_REFERRAL_TYPE) -> int | None:
+    """
+    Id of the referrer called `name`, created if it does not exist yet.
+    None for a blank name. Runs inside the caller's transaction.
+    """
+    key = referral_key(name)
+    if not key:
+        return None
+
+    cached = referral_cache.get(key)
+    if cached is None:
+        cached = session.info.get(_PENDING, {}).get(key)
+    if cached is not None:
+        return cached
+
+    now = datetime.utcnow()
+    stmt = (
+        _insert_statement(session.get_bind().dialect.name)
+        .values(name=" ".join(name.split()), name_key=key, type=referral_type, created_at=now, updated_at=now)
+        .on_conflict_do_nothing(index_elements=["name_key"])
+        .returning(Referral.__table__.c.id)
+    )
+    referral_id = session.execute(stmt).scalar()
+    if referral_id is not None:
+        # ours, uncommitted: publish to the cache only after commit
+        session.info.setdefault(_PENDING, {})[key] = referral_id
+        return referral_id
+
+    # already there (ON CONFLICT waited for any concurrent insert to commit)
+    referral_id = session.execute(select(Referral.id).where(Referral.name_key == key)).scalar_one()
+    referral_cache.put(key, referral_id)
+    return referral_id
+
+
+# ORM writes (admin edits, scripts) keep name_key in step with name
+@event.listens_for(Referral, "before_insert")
+@event.listens_for(Referral, "before_update")
+def _set_name_key(mapper, connection, target):
+    target.name_key = referral_key(target.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_referrals(session):
+    for key, referral_id in session.info.pop(_PENDING, {}).items():
+        referral_cache.put(key, referral_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_referrals(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING, None)
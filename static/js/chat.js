@@ -24,6 +24,15 @@ document.addEventListener("DOMContentLoaded", () => {
   let lastTimestamp  = null;
   let pollTimer      = null;
   let seenMessageIds = new Set();
+  let myDept         = null;   // announced by the stream "ready" event
+  let stream         = null;   // EventSource (/api/chat/stream)
+  let streamOpen     = false;
+  let typingTimer    = null;
+  let lastTypingSent = 0;
+  let oldestId       = null;   // keyset cursor for loading older pages
+  let hasMore        = false;
+  let loadingOlder   = false;
+  const PAGE_SIZE    = 50;
 
   if (!deptSelect || !chatForm || !chatInput || !chatArea) {
     console.warn("💬 Chat UI elements missing — chat.js aborted");
@@ -86,7 +95,7 @@ document.addEventListener("DOMContentLoaded", () => {
   /* -------------------------------------------------------
      RENDER MESSAGE (DEDUP + TYPEWRITER + FAIL STATE)
   ------------------------------------------------------- */
-  function renderMessage({ id, mine, message, timestamp, label, status, clientId }) {
+  function renderMessage({ id, mine, message, timestamp, label, status, clientId, prepend }) {
 
     // 🚫 Dedup server messages (never duplicate)
     if (id) {
@@ -142,6 +151,14 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     bubble.appendChild(time);
+
+    // older history goes on top, rendered instantly
+    if (prepend) {
+      chatArea.insertBefore(bubble, chatArea.firstChild);
+      textSpan.textContent = message;
+      return;
+    }
+
     chatArea.appendChild(bubble);
     scrollBottom();
 
@@ -226,6 +243,8 @@ document.addEventListener("DOMContentLoaded", () => {
   async function loadInbox() {
     activeDept = null;
     lastTimestamp = null;
+    oldestId = null;
+    hasMore = false;
 
     if (pollTimer) {
       clearInterval(pollTimer);
@@ -236,8 +255,9 @@ document.addEventListener("DOMContentLoaded", () => {
     updateSendState();
 
     try {
-      const res = await fetch("/api/chat/inbox");
-      const messages = await res.json();
+      const res = await fetch(`/api/chat/inbox?limit=${PAGE_SIZE}`);
+      const page = await res.json();
+      const messages = page.messages || [];
 
       if (!messages.length) {
         renderSystem("No new messages.");
@@ -269,11 +289,16 @@ document.addEventListener("DOMContentLoaded", () => {
 
     clearChat();
     lastTimestamp = null;
+    oldestId = null;
+    hasMore = false;
     updateSendState();
 
     try {
-      const res = await fetch(`/api/chat/conversation?department=${dept}`);
-      const messages = await res.json();
+      const res = await fetch(`/api/chat/conversation?department=${dept}&limit=${PAGE_SIZE}`);
+      const page = await res.json();
+      const messages = page.messages || [];
+      oldestId = page.oldest_id;
+      hasMore = !!page.has_more;
 
       if (!messages.length) {
         renderSystem("No messages yet.");
@@ -292,12 +317,77 @@ document.addEventListener("DOMContentLoaded", () => {
       });
 
       scrollBottom(true);
+      markRead(dept, page.newest_id);
 
     } catch (e) {
       console.error("❌ Conversation load failed", e);
     }
   }
 
+  /* -------------------------------------------------------
+     MARK READ (server-side unread counters)
+  ------------------------------------------------------- */
+  async function markRead(dept, messageId) {
+    if (!dept) return;
+
+    try {
+      await fetch("/api/chat/read", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ department: dept, message_id: messageId || null })
+      });
+      document.dispatchEvent(new CustomEvent("chat:read", { detail: { department: dept } }));
+    } catch (e) {
+      console.error("❌ Mark read failed", e);
+    }
+  }
+
+  /* -------------------------------------------------------
+     3️⃣a LOAD OLDER PAGE (scroll to top)
+  ------------------------------------------------------- */
+  async function loadOlder() {
+    if (!activeDept || !hasMore || !oldestId || loadingOlder) return;
+
+    loadingOlder = true;
+    const dept = activeDept;
+
+    try {
+      const res = await fetch(
+        `/api/chat/conversation?department=${dept}&limit=${PAGE_SIZE}&before_id=${oldestId}`
+      );
+      const page = await res.json();
+      if (dept !== activeDept) return;   // switched conversation meanwhile
+
+      const prevHeight = chatArea.scrollHeight;
+
+      // page is oldest-first; prepend newest-first to keep order
+      (page.messages || []).slice().reverse().forEach(m => {
+        renderMessage({
+          id: m.id,
+          mine: m.sender !== dept,
+          message: m.message,
+          timestamp: m.timestamp,
+          prepend: true
+        });
+      });
+
+      oldestId = page.oldest_id || oldestId;
+      hasMore = !!page.has_more;
+
+      // keep the user's viewport anchored on the message they were reading
+      chatArea.scrollTop += chatArea.scrollHeight - prevHeight;
+
+    } catch (e) {
+      console.error("❌ Older messages load failed", e);
+    } finally {
+      loadingOlder = false;
+    }
+  }
+
+  chatArea.addEventListener("scroll", () => {
+    if (chatArea.scrollTop < 40) loadOlder();
+  });
+
   /* -------------------------------------------------------
      SEND MESSAGE (Optimistic + Retry)
   ------------------------------------------------------- */
@@ -385,12 +475,114 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
-  chatInput.addEventListener("input", updateSendState);
+  chatInput.addEventListener("input", () => {
+    updateSendState();
+    sendTypingSignal();
+  });
+
+  function sendTypingSignal() {
+    if (!activeDept || !chatInput.value.trim()) return;
+
+    const now = Date.now();
+    if (now - lastTypingSent < 2000) return;
+    lastTypingSent = now;
+
+    fetch("/api/chat/typing", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ to: activeDept })
+    }).catch(() => {});
+  }
+
+  /* -------------------------------------------------------
+     5️⃣a SERVER PUSH (SSE) — messages + typing
+  ------------------------------------------------------- */
+  function handleStreamMessage(m) {
+    const inbound = myDept ? m.receiver === myDept : m.sender === activeDept;
+
+    if (inbound) {
+      document.dispatchEvent(new CustomEvent("chat:incoming", { detail: m }));
+    }
+
+    // my own sends are already on screen (optimistic bubble)
+    if (!inbound) {
+      seenMessageIds.add(m.id);
+      return;
+    }
+
+    if (activeDept && m.sender === activeDept) {
+      const shouldStickToBottom = isNearBottom(120);
+      setTyping(false);
+      renderMessage({
+        id: m.id,
+        mine: false,
+        message: m.message,
+        timestamp: m.timestamp
+      });
+      lastTimestamp = m.timestamp;
+      if (shouldStickToBottom) scrollBottom(true);
+      markRead(activeDept, m.id);
+      return;
+    }
+
+    if (!activeDept) {
+      renderMessage({
+        id: m.id,
+        mine: false,
+        message: m.message,
+        timestamp: m.timestamp,
+        label: m.sender.replace("_", " ").toUpperCase()
+      });
+    }
+  }
+
+  function openStream() {
+    if (!window.EventSource || stream) return;
+
+    stream = new EventSource("/api/chat/stream");
+
+    stream.addEventListener("ready", (e) => {
+      try {
+        myDept = JSON.parse(e.data).department || null;
+      } catch (_) {}
+    });
+
+    stream.addEventListener("message", (e) => {
+      try {
+        handleStreamMessage(JSON.parse(e.data));
+      } catch (err) {
+        console.error("❌ Stream message error", err);
+      }
+    });
+
+    stream.addEventListener("typing", (e) => {
+      let data = {};
+      try { data = JSON.parse(e.data); } catch (_) {}
+      if (!activeDept || data.from !== activeDept) return;
+
+      setTyping(true);
+      if (typingTimer) clearTimeout(typingTimer);
+      typingTimer = setTimeout(() => setTyping(false), 2500);
+    });
+
+    stream.onopen = () => {
+      streamOpen = true;
+      window.__chatStreamOpen = true;
+    };
+
+    // EventSource reconnects by itself (Last-Event-ID); poll meanwhile
+    stream.onerror = () => {
+      streamOpen = false;
+      window.__chatStreamOpen = false;
+    };
+  }
 
   /* -------------------------------------------------------
      5️⃣ POLLING (INBOUND ONLY)
   ------------------------------------------------------- */
   async function pollMessages() {
+    // stream delivers pushes; polling is only the fallback
+    if (streamOpen) return;
     if (!activeDept || !lastTimestamp) return;
 
     try {
@@ -464,6 +656,8 @@ document.addEventListener("DOMContentLoaded", () => {
         if (!res.ok) throw new Error(data.error || "Clear failed");
 
         lastTimestamp = null;
+        oldestId = null;
+        hasMore = false;
         renderSystem("Conversation cleared.");
 
       } catch (err) {
@@ -479,5 +673,6 @@ document.addEventListener("DOMContentLoaded", () => {
   loadDepartments();
   loadInbox();
   updateSendState();
+  openStream();
 
 });
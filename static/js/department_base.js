@@ -147,37 +147,50 @@ function updateChatBadge() {
 }
 
 /* -------------------------------------------------------
-   POLL INBOX FOR NEW INCOMING MESSAGES (SAFE)
+   REFRESH UNREAD BADGE (server-side counters, SAFE)
 ------------------------------------------------------- */
-async function pollChatInbox() {
+async function refreshUnreadCount() {
 
   // 🛑 Safety guards (prevents TDZ & null errors)
   if (!chatBadge) return;
 
   try {
-    const res = await fetch("/api/chat/inbox");
+    const res = await fetch("/api/chat/unread");
     if (!res.ok) return;
 
-    const messages = await res.json();
+    const data = await res.json();
+    unreadCount = data.total || 0;
+    updateChatBadge();
 
-    messages.forEach(msg => {
+  } catch (err) {
+    console.error("🔴 Chat unread refresh failed", err);
+  }
+}
 
-      // 🚫 already counted
-      if (seenInboxIds.has(msg.id)) return;
+async function pollChatInbox() {
+  // chat.js stream is live — badge is fed by "chat:incoming" events
+  if (window.__chatStreamOpen) return;
+  refreshUnreadCount();
+}
 
-      seenInboxIds.add(msg.id);
-      unreadCount++;
-    });
+// conversation marked read in chat.js → resync with server counters
+document.addEventListener("chat:read", refreshUnreadCount);
 
-    updateChatBadge();
+/* Pushed messages from chat.js (SSE) */
+document.addEventListener("chat:incoming", (e) => {
+  const msg = e.detail || {};
+  if (!msg.id || seenInboxIds.has(msg.id)) return;
 
-  } catch (err) {
-    console.error("🔴 Chat inbox poll failed", err);
+  seenInboxIds.add(msg.id);
+  if (!chatModal || !chatModal.classList.contains("active")) {
+    unreadCount++;
   }
-}
+  updateChatBadge();
+});
 
+// 🔁 Start inbox polling ONLY after everything is defined (fallback when stream is down)
+refreshUnreadCount();
 
-// 🔁 Start inbox polling ONLY after everything is defined
 if (!inboxPoller) {
   inboxPoller = setInterval(pollChatInbox, 4000);
 }
@@ -74,18 +74,55 @@ function initSupabase() {
   }
 }
 
-// Load initial notifications from API (all for today)
+// Today's feed cached per tab; reloads only fetch what's new (delta + ETag)
+const FEED_CACHE_KEY = 'eclinic.activities';
+const MAX_CACHED_ACTIVITIES = 500;
+
+function readFeedCache() {
+  try {
+    const cached = JSON.parse(sessionStorage.getItem(FEED_CACHE_KEY) || 'null');
+    if (!cached || !Array.isArray(cached.activities)) return null;
+    return cached;
+  } catch (e) {
+    return null;
+  }
+}
+
+function writeFeedCache(feed) {
+  try {
+    sessionStorage.setItem(FEED_CACHE_KEY, JSON.stringify(feed));
+  } catch (e) {
+    // storage full / disabled — just refetch next time
+  }
+}
+
+// Load initial notifications from API (today's feed, incremental)
 async function loadInitialNotifications() {
   try {
-    console.log('[Notifications] Fetching activities from API...');
-    const response = await fetch('/api/activities', {
+    const cached = readFeedCache();
+    const headers = { 'Content-Type': 'application/json' };
+    let url = '/api/activities';
+
+    if (cached && cached.latest_id) {
+      url += `?since_id=${encodeURIComponent(cached.latest_id)}`;
+      if (cached.etag) headers['If-None-Match'] = cached.etag;
+    }
+
+    console.log('[Notifications] Fetching activities from API...', url);
+    const response = await fetch(url, {
       method: 'GET',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers,
       credentials: 'include' // Include cookies for authentication
     });
-    
+
+    // Nothing new since our cached copy
+    if (response.status === 304 && cached) {
+      console.log(`[Notifications] Feed unchanged (${cached.activities.length} cached)`);
+      updateNotificationsList(cached.activities);
+      updateNotificationCount(cached.activities.length);
+      return;
+    }
+
     // Check if response is actually JSON
     const contentType = response.headers.get('content-type');
     if (!contentType || !contentType.includes('application/json')) {
@@ -112,9 +149,23 @@ async function loadInitialNotifications() {
     console.log('[Notifications] API response:', result);
     
     if (result.success && result.activities) {
-      console.log(`[Notifications] Loaded ${result.activities.length} activities`);
-      updateNotificationsList(result.activities);
-      updateNotificationCount(result.activities.length);
+      // Delta on top of a cache from the same day; otherwise a full feed
+      let activities = result.activities;
+      if (result.delta && cached && cached.date === result.date) {
+        activities = result.activities.concat(cached.activities);
+      }
+      activities = activities.slice(0, MAX_CACHED_ACTIVITIES);
+
+      writeFeedCache({
+        date: result.date,
+        latest_id: result.latest_id,
+        etag: response.headers.get('ETag'),
+        activities
+      });
+
+      console.log(`[Notifications] Loaded ${activities.length} activities (${result.activities.length} new)`);
+      updateNotificationsList(activities);
+      updateNotificationCount(activities.length);
     } else {
       console.warn('[Notifications] No activities in response or success=false:', result);
       showEmptyState();
@@ -262,7 +262,7 @@
   /* ======================================================================
      SUBMIT PATIENT TO BACKEND (SUPABASE)
   ====================================================================== */
-  async function submitPatient() {
+  async function submitPatient(allowDuplicate = false) {
     if (!hasPreview) {
       alert("Please generate preview before saving.");
       return;
@@ -277,6 +277,7 @@
     const payload = {
       ...collectFormData(),
       services: getSelectedServices(),
+      allow_duplicate: allowDuplicate === true,
     };
 
     // Button loading state
@@ -293,6 +294,20 @@
 
       const result = await res.json().catch(() => ({}));
 
+      // possible duplicates: let the user confirm before registering anyway
+      if (res.status === 409 && Array.isArray(result.duplicates)) {
+        const list = result.duplicates
+          .map(d => `• ${d.full_name} — ${d.file_no} (DOB ${d.date_of_birth || "—"}, ${d.phone || "—"}) [${(d.reasons || []).join(", ")}]`)
+          .join("\n");
+        const proceed = confirm(
+          `${result.message}\n\nPossible matches:\n${list}\n\nRegister as a new patient anyway?`
+        );
+        btnConfirmSave.disabled = false;
+        btnConfirmSave.innerHTML = originalBtnHtml;
+        if (proceed) submitPatient(true);
+        return;
+      }
+
       if (!res.ok || !result.success) {
         const msg = result.message || "Failed to save patient.";
         throw new Error(msg);
@@ -1,6 +1,6 @@
 /* ==========================================================================
    EPICONSULT e-CLINIC — PATIENT RECORDS ENGINE (2025)
-   Clean Client-Side Table + Live Search + Preview Sync
+   Server-Paged Table + Live Search + Preview Sync
    Scope: records.html ONLY
 ========================================================================== */
 
@@ -45,82 +45,99 @@
 
   /* ======================================================================
      2. STATE
+     Only the current page lives in the browser; the server filters,
+     sorts and pages via keyset cursors.
   =======================================================================*/
-  let ALL_RECORDS = [];
-  let FILTERED_RECORDS = [];
+  const API_URL = "/records/api/search";
+  const SEARCH_DEBOUNCE_MS = 250;
+
+  let PAGE_RECORDS = [];
+  let totalMatches = 0;
+  let hasMore = false;
+  let nextCursor = null;
+  let cursorStack = [null]; // cursor used for each visited page
 
   let currentPage = 1;
   let pageSize = parseInt(pageSizeSelect.value, 10) || 25;
+  let currentQuery = "";
+  let requestSeq = 0;
+  let searchTimer = null;
 
   let selectedRowId = null;
 
-  /* ======================================================================
-     3. DATA SOURCE (CSV → JSON)
-     Adjust path if needed later
-  ====================================================================== */
-  const DATA_URL = "/static/data/patients.csv";
-
-  /* ======================================================================
-     4. CSV PARSER (FAST & SAFE)
-  ====================================================================== */
-  function parseCSV(text) {
-    const lines = text.trim().split("\n");
-    const headers = lines.shift().split(",").map(h => h.trim());
-
-    return lines.map(line => {
-      const values = line.split(",").map(v => v.trim());
-      const obj = {};
-      headers.forEach((h, i) => (obj[h] = values[i] || ""));
-      return obj;
-    });
+  function escapeHtml(value) {
+    return String(value ?? "").replace(/[&<>"']/g, ch => ({
+      "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"
+    }[ch]));
   }
 
   /* ======================================================================
-     5. LOAD DATA
+     3. LOAD A PAGE
   ====================================================================== */
-  async function loadRecords() {
+  async function loadPage(page) {
+    const cursor = cursorStack[page - 1] ?? null;
+    const params = new URLSearchParams({ limit: pageSize });
+    if (currentQuery) params.set("q", currentQuery);
+    if (cursor) params.set("cursor", cursor);
+    // the count scans every match, so only ask for it on the first page
+    if (page === 1) params.set("include_total", "1");
+
+    const seq = ++requestSeq;
     try {
-      const res = await fetch(DATA_URL, { cache: "no-store" });
-      const text = await res.text();
-      ALL_RECORDS = parseCSV(text);
-
-      FILTERED_RECORDS = [...ALL_RECORDS];
+      const res = await fetch(`${API_URL}?${params}`, { credentials: "same-origin" });
+      const data = await res.json();
+      if (seq !== requestSeq) return; // a newer request superseded this one
+      if (!res.ok || !data.success) throw new Error(data.error || res.statusText);
+
+      PAGE_RECORDS = data.patients || [];
+      hasMore = Boolean(data.has_more);
+      nextCursor = data.next_cursor || null;
+      if (typeof data.total === "number") {
+        totalMatches = data.total;
+        totalRecordsCount.textContent = totalMatches;
+      }
+
+      currentPage = page;
+      cursorStack = cursorStack.slice(0, page);
+      if (nextCursor) cursorStack.push(nextCursor);
+
+      const loadedEl = document.getElementById("lastLoadedTime");
+      if (loadedEl) loadedEl.textContent = new Date().toLocaleTimeString();
 
-      totalRecordsCount.textContent = ALL_RECORDS.length;
       renderTable();
-      updateFooter();
     } catch (err) {
       console.error("Failed to load records:", err);
     }
   }
 
+  function reload() {
+    cursorStack = [null];
+    loadPage(1);
+  }
+
   /* ======================================================================
-     6. RENDER TABLE
+     4. RENDER TABLE
   ====================================================================== */
   function renderTable() {
     tableBody.innerHTML = "";
 
-    const start = (currentPage - 1) * pageSize;
-    const end = start + pageSize;
-    const pageRecords = FILTERED_RECORDS.slice(start, end);
-
-    pageRecords.forEach(rec => {
+    PAGE_RECORDS.forEach(rec => {
       const tr = document.createElement("tr");
       tr.className = "records-row";
       tr.dataset.id = rec.file_no || rec.patient_id;
 
       tr.innerHTML = `
         <td><input type="checkbox"></td>
-        <td>${rec.file_no || "-"}</td>
-        <td>${rec.patient_id || "-"}</td>
-        <td>${rec.first_name || "-"}</td>
-        <td>${rec.last_name || "-"}</td>
-        <td>${rec.sex || "-"}</td>
-        <td>${rec.age || "-"}</td>
-        <td>${rec.email || "-"}</td>
-        <td>${rec.phone || "-"}</td>
-        <td>${rec.account_status || "-"}</td>
-        <td>${rec.category || "-"}</td>
+        <td>${escapeHtml(rec.file_no || "-")}</td>
+        <td>${escapeHtml(rec.patient_id || "-")}</td>
+        <td>${escapeHtml(rec.first_name || "-")}</td>
+        <td>${escapeHtml(rec.last_name || "-")}</td>
+        <td>${escapeHtml(rec.sex || "-")}</td>
+        <td>${escapeHtml(rec.age ?? "-")}</td>
+        <td>${escapeHtml(rec.email || "-")}</td>
+        <td>${escapeHtml(rec.phone || "-")}</td>
+        <td>${escapeHtml(rec.account_status || "-")}</td>
+        <td>${escapeHtml(rec.category || "-")}</td>
         <td>
           <button class="btn-row-open">
             <i class="fa-solid fa-arrow-right"></i>
@@ -128,17 +145,18 @@
         </td>
       `;
 
+      if (tr.dataset.id === selectedRowId) tr.classList.add("row-selected");
       tr.addEventListener("click", () => selectRecord(rec, tr));
       tableBody.appendChild(tr);
     });
 
-    renderedRecordsCount.textContent = pageRecords.length;
+    renderedRecordsCount.textContent = PAGE_RECORDS.length;
     updatePagination();
     updateFooter();
   }
 
   /* ======================================================================
-     7. PREVIEW PANEL SYNC
+     5. PREVIEW PANEL SYNC
   ====================================================================== */
   function selectRecord(rec, rowEl) {
     document
@@ -156,96 +174,77 @@
     pv.patientId.textContent = rec.patient_id || "—";
     pv.fileNo.textContent = rec.file_no || "—";
     pv.sex.textContent = rec.sex || "—";
-    pv.age.textContent = rec.age || "—";
+    pv.age.textContent = rec.age ?? "—";
     pv.email.textContent = rec.email || "—";
     pv.phone.textContent = rec.phone || "—";
   }
 
   /* ======================================================================
-     8. LIVE SEARCH (INSTANT)
+     6. LIVE SEARCH (SERVER-SIDE, DEBOUNCED)
   ====================================================================== */
-  function applySearch(query) {
-    const q = query.toLowerCase();
-
-    FILTERED_RECORDS = ALL_RECORDS.filter(r => {
-      return (
-        (r.first_name || "").toLowerCase().includes(q) ||
-        (r.last_name || "").toLowerCase().includes(q) ||
-        (r.patient_id || "").toLowerCase().includes(q) ||
-        (r.file_no || "").toLowerCase().includes(q)
-      );
-    });
-
-    currentPage = 1;
-    renderTable();
-  }
-
   searchInput.addEventListener("input", e => {
-    const value = e.target.value.trim();
-    if (value.length < 1) {
-      FILTERED_RECORDS = [...ALL_RECORDS];
-      renderTable();
-      return;
-    }
-    applySearch(value);
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+      const value = e.target.value.trim();
+      if (value === currentQuery) return;
+      currentQuery = value;
+      reload();
+    }, SEARCH_DEBOUNCE_MS);
   });
 
   clearSearchBtn.addEventListener("click", () => {
+    clearTimeout(searchTimer);
     searchInput.value = "";
-    FILTERED_RECORDS = [...ALL_RECORDS];
-    renderTable();
+    if (!currentQuery) return;
+    currentQuery = "";
+    reload();
   });
 
   /* ======================================================================
-     9. PAGINATION
+     7. PAGINATION (KEYSET CURSORS)
   ====================================================================== */
+  function totalPages() {
+    return Math.max(1, Math.ceil(totalMatches / pageSize), currentPage + (hasMore ? 1 : 0));
+  }
+
   function updatePagination() {
-    const totalPages = Math.max(1, Math.ceil(FILTERED_RECORDS.length / pageSize));
     currentPageEl.textContent = currentPage;
-    totalPagesEl.textContent = totalPages;
+    totalPagesEl.textContent = totalPages();
 
     prevPageBtn.disabled = currentPage === 1;
-    nextPageBtn.disabled = currentPage >= totalPages;
+    nextPageBtn.disabled = !hasMore;
   }
 
   prevPageBtn.addEventListener("click", () => {
-    if (currentPage > 1) {
-      currentPage--;
-      renderTable();
-    }
+    if (currentPage > 1) loadPage(currentPage - 1);
   });
 
   nextPageBtn.addEventListener("click", () => {
-    const totalPages = Math.ceil(FILTERED_RECORDS.length / pageSize);
-    if (currentPage < totalPages) {
-      currentPage++;
-      renderTable();
-    }
+    if (hasMore) loadPage(currentPage + 1);
   });
 
   pageSizeSelect.addEventListener("change", () => {
     pageSize = parseInt(pageSizeSelect.value, 10) || 25;
-    currentPage = 1;
-    renderTable();
+    reload();
   });
 
   /* ======================================================================
-     10. FOOTER COUNTS
+     8. FOOTER COUNTS
   ====================================================================== */
   function updateFooter() {
-    const total = FILTERED_RECORDS.length;
-    const start = total === 0 ? 0 : (currentPage - 1) * pageSize + 1;
-    const end = Math.min(currentPage * pageSize, total);
+    const shown = PAGE_RECORDS.length;
+    const start = shown === 0 ? 0 : (currentPage - 1) * pageSize + 1;
+    const end = shown === 0 ? 0 : start + shown - 1;
 
     startRecordEl.textContent = start;
     endRecordEl.textContent = end;
-    totalRecordsEl.textContent = total;
+    totalRecordsEl.textContent = totalMatches;
   }
 
   /* ======================================================================
-     11. INIT
+     9. INIT
   ====================================================================== */
-  loadRecords();
+  loadPage(1);
 
 })();
 
@@ -1,6 +1,6 @@
 /* ==========================================================================
    EPICONSULT e-CLINIC — SERVICES REGISTER ENGINE
-   Loads services CSVs (drugs/general/lab) + Live Search + Cart
+   Live Search (server-side catalog: /api/catalog/search) + Cart
    Scope: records.html ONLY
 ========================================================================== */
 
@@ -8,13 +8,12 @@
   "use strict";
 
   /* ==========================
-     1) CONFIG (CSV PATHS)
+     1) CONFIG
+     The catalog (lab/drugs/general CSVs) is parsed and indexed on the
+     server (services/catalog.py); the browser only fetches top results.
   ========================== */
-  const CSV_URLS = {
-    drugs: "/static/services/drugs.csv",
-    general: "/static/services/general.csv",
-    lab: "/static/services/lab.csv",
-  };
+  const SEARCH_URL = "/api/catalog/search";
+  const QUOTE_URL = "/api/catalog/quote";
 
   /* ==========================
      2) SELECTORS
@@ -41,16 +40,13 @@
   /* ==========================
      3) STATE
   ========================== */
-  let DB = {
-    drugs: [],
-    general: [],
-    lab: [],
-  };
-
   let isLoaded = false;
   let activeScope = "all"; // all | drugs | general | lab
   let activeQuery = "";
   let lastResults = [];
+  let COUNTS = null;
+  let inflight = null;     // AbortController of the pending search
+  let quoteSeq = 0;        // latest cart quote request
 
   // cart items: { id, scope, name, category, type, amountNumber, amountLabel, key }
   let CART = [];
@@ -60,93 +56,9 @@
   const MIN_CHARS = 2;
 
   /* ==========================
-     4) UTIL — CSV PARSER
-     Supports quoted fields and commas inside quotes
-  ========================== */
-  function parseCSV(text) {
-    const rows = [];
-    let row = [];
-    let cur = "";
-    let inQuotes = false;
-
-    for (let i = 0; i < text.length; i++) {
-      const ch = text[i];
-      const next = text[i + 1];
-
-      if (ch === '"' && inQuotes && next === '"') {
-        cur += '"';
-        i++;
-        continue;
-      }
-
-      if (ch === '"') {
-        inQuotes = !inQuotes;
-        continue;
-      }
-
-      if (ch === "," && !inQuotes) {
-        row.push(cur);
-        cur = "";
-        continue;
-      }
-
-      if ((ch === "\n" || ch === "\r") && !inQuotes) {
-        // handle CRLF
-        if (ch === "\r" && next === "\n") i++;
-
-        row.push(cur);
-        cur = "";
-
-        // skip empty line
-        if (row.some(v => (v || "").trim().length > 0)) rows.push(row);
-        row = [];
-        continue;
-      }
-
-      cur += ch;
-    }
-
-    // last field
-    if (cur.length || row.length) {
-      row.push(cur);
-      if (row.some(v => (v || "").trim().length > 0)) rows.push(row);
-    }
-
-    if (!rows.length) return [];
-
-    const headers = rows.shift().map(h => (h || "").trim());
-
-    return rows.map(cols => {
-      const obj = {};
-      headers.forEach((h, idx) => (obj[h] = (cols[idx] ?? "").trim()));
-      return obj;
-    });
-  }
-
-  /* ==========================
-     5) UTIL — PRICE PARSER
-     Converts "₦5,000.00", "₦ 4,000", "N/A" -> number or null
+     4) UTIL — PRICES
+     Prices arrive parsed: { kobo, n (naira), label }
   ========================== */
-  function normalizePrice(raw) {
-    if (!raw) return { n: null, label: "N/A" };
-
-    const v = String(raw).trim();
-    if (!v || v.toLowerCase() === "n/a" || v === "-" ) return { n: null, label: "N/A" };
-
-    // remove currency, spaces, commas
-    const cleaned = v
-      .replaceAll("₦", "")
-      .replaceAll(",", "")
-      .replace(/\s+/g, "")
-      .trim();
-
-    const num = Number(cleaned);
-    if (Number.isFinite(num)) {
-      return { n: num, label: formatNaira(num) };
-    }
-    return { n: null, label: v }; // fallback show raw
-  }
-
   function formatNaira(num) {
     try {
       // Use Intl formatting
@@ -166,162 +78,41 @@
     if (r) r.checked = true;
   }
 
-  function safeLower(s) {
-    return (s || "").toString().toLowerCase();
-  }
-
   /* ==========================
-     6) NORMALIZE DATASETS
-     Convert each CSV row into a unified shape
+     5) SEARCH (server)
+     Stale responses are aborted, so results always match the input.
   ========================== */
-  function normalizeRow(scope, row) {
-    if (scope === "drugs" || scope === "general") {
-      const name = row["Name"] || row["name"] || "";
-      const category = row["Category"] || row["category"] || "";
-
-      const out = normalizePrice(row["Outsourced (B)"] || row["Outsourced"] || row["outsourced"]);
-      const walk = normalizePrice(row["Walk in Patient (C)"] || row["Walk in"] || row["walkin"]);
-      const hosp = normalizePrice(row["Hospital Patient (D)"] || row["Hospital"] || row["hospital"]);
-
-      const key = `${scope}__${safeLower(name)}__${safeLower(category)}`;
-
-      return {
-        scope,
-        key,
-        name,
-        category,
-        prices: {
-          outsourced: out,
-          walkin: walk,
-          hospital: hosp,
-        },
-        searchText: `${safeLower(name)} ${safeLower(category)}`,
-      };
-    }
+  async function fetchServices(query, scope) {
+    if (inflight) inflight.abort();
+    inflight = new AbortController();
 
-    // lab
-    const name = row["test_name"] || row["Test"] || row["test"] || "";
-    const category = row["test_category"] || row["Category"] || "";
-    const testKey = row["test_key"] || "";
-
-    const out = normalizePrice(row["price_outsourced"] || row["Outsourced"] || "");
-    const walk = normalizePrice(row["price_walkin"] || row["Walk in"] || "");
-    const hosp = normalizePrice(row["price_hospital"] || row["Hospital"] || "");
-
-    const key = testKey || `lab__${safeLower(name)}__${safeLower(category)}`;
-
-    // Optional: shorter category display (lab categories can be long)
-    const categoryShort = String(category || "").trim();
-
-    return {
-      scope: "lab",
-      key,
-      name,
-      category: categoryShort,
-      prices: {
-        outsourced: out,
-        walkin: walk,
-        hospital: hosp,
-      },
-      searchText: `${safeLower(name)} ${safeLower(category)} ${safeLower(testKey)}`,
-    };
-  }
+    const limit = scope === "all" ? LIMIT_PER_SCOPE : LIMIT_SINGLE_SCOPE;
+    const params = new URLSearchParams({ q: query || "", scope, limit: String(limit) });
 
-  /* ==========================
-     7) LOAD CSVs
-  ========================== */
-  async function loadAllCSVs() {
-    metaLeft.textContent = "Loading services…";
-    metaRight.textContent = "";
+    const res = await fetch(`${SEARCH_URL}?${params}`, {
+      credentials: "same-origin",
+      signal: inflight.signal,
+    });
+    const data = await res.json();
+    if (!res.ok || !data.success) throw new Error(data.error || `HTTP ${res.status}`);
 
-    const entries = Object.entries(CSV_URLS);
+    COUNTS = data.counts || COUNTS;
+    isLoaded = true;
+    return data.items || [];
+  }
 
+  async function runSearch(query, scope) {
     try {
-      const responses = await Promise.all(entries.map(([_, url]) => fetch(url, { cache: "no-store" })));
-      const texts = await Promise.all(responses.map(r => r.text()));
-
-      entries.forEach(([scope], idx) => {
-        const rawRows = parseCSV(texts[idx]);
-        DB[scope] = rawRows.map(r => normalizeRow(scope, r)).filter(x => x.name);
-      });
-
-      isLoaded = true;
-      metaLeft.textContent = "List of service";
-      metaRight.textContent = `Loaded: Lab ${DB.lab.length} · Drugs ${DB.drugs.length} · General ${DB.general.length}`;
+      const items = await fetchServices(query, scope);
+      renderResults(items, query, scope);
     } catch (err) {
-      console.error("Failed to load services CSVs:", err);
+      if (err.name === "AbortError") return;
+      console.error("Service search failed:", err);
       metaLeft.textContent = "Failed to load services";
-      metaRight.textContent = "Check /static/services/*.csv paths";
-      isLoaded = false;
+      metaRight.textContent = "Service search is unavailable";
     }
   }
 
-/* ===========================================================================
-   SEARCH + RENDER — SMART MATCH (ALIASES + SYNONYMS)
-   - Expands query terms (malaria -> mp, thick film, thin film, etc.)
-   - Matches against searchText + aliasText (if present)
-   - Works across ALL datasets (lab/drugs/general)
-=============================================================================*/
-function searchServices(query, scope) {
-  if (!isLoaded) return [];
-
-  const raw = (query || "").toString();
-  const q = safeLower(raw).trim();
-
-  if (q.length < MIN_CHARS && scope === "all") return [];
-
-  const scopes = (scope === "all") ? ["lab", "drugs", "general"] : [scope];
-  const limit = (scope === "all") ? LIMIT_PER_SCOPE : LIMIT_SINGLE_SCOPE;
-
-  const results = [];
-
-  // Expand query (synonyms)
-  const expandedTerms = (typeof expandQuery === "function")
-    ? expandQuery(raw)
-    : [q];
-
-  // ✅ smarter matcher
-  const matchesTerm = (item, termRaw) => {
-    const term = safeLower(termRaw).trim();
-    if (!term) return false;
-
-    const hay1 = item.searchText || "";
-    const hay2 = item.aliasText || "";
-    const aliases = Array.isArray(item.aliases) ? item.aliases : [];
-
-    // ⭐ IMPORTANT: for very short terms like "mp", avoid substring matching
-    if (term.length <= 2) {
-      // exact alias match OR exact word match
-      if (aliases.includes(term)) return true;
-
-      const wordRe = new RegExp(`(^|\\s)${term}(\\s|$)`);
-      return wordRe.test(hay1) || wordRe.test(hay2);
-    }
-
-    // normal contains for longer terms
-    return hay1.includes(term) || hay2.includes(term);
-  };
-
-  for (const sc of scopes) {
-    const data = DB[sc] || [];
-
-    if (!q) {
-      results.push(...data.slice(0, limit));
-      continue;
-    }
-
-    const filtered = data.filter(item => {
-      return expandedTerms.some(t => matchesTerm(item, t));
-    });
-
-    results.push(...filtered.slice(0, limit));
-  }
-
-  return results;
-}
-
-
-
   /* ===========================================================================
         RENDERING LOGIC
   ==============================================================================*/
@@ -351,13 +142,21 @@ function searchServices(query, scope) {
     }
 
     if (!query || query.trim().length < MIN_CHARS) {
+      if (scope !== "all" && items.length) {
+        renderRows(items);
+        metaLeft.textContent = "List of service";
+        metaRight.textContent = `Scope: ${scope.toUpperCase()}`;
+        return;
+      }
       if (scope === "all") {
         renderPlaceholder("Start typing to search", "Results will appear here automatically (no search button).");
       } else {
         renderPlaceholder("Showing sample list", "Type to filter by name or category.");
       }
       metaLeft.textContent = "List of service";
-      metaRight.textContent = scope === "all" ? "—" : `Scope: ${scope.toUpperCase()}`;
+      metaRight.textContent = COUNTS
+        ? `Lab ${COUNTS.lab} · Drugs ${COUNTS.drugs} · General ${COUNTS.general}`
+        : "—";
       return;
     }
 
@@ -370,7 +169,10 @@ function searchServices(query, scope) {
 
     metaLeft.textContent = "List of service";
     metaRight.textContent = `${items.length} result(s)`;
+    renderRows(items);
+  }
 
+  function renderRows(items) {
     resultsBody.innerHTML = items.map(item => {
       const w = item.prices.walkin.label;
       const h = item.prices.hospital.label;
@@ -487,9 +289,28 @@ function searchServices(query, scope) {
       `;
     }).join("");
 
-    // total
+    // total: local estimate now, then the server quote (integer kobo)
     const total = CART.reduce((sum, x) => sum + (x.amountNumber || 0), 0);
     cartTotal.textContent = formatNaira(total);
+    refreshCartQuote();
+  }
+
+  async function refreshCartQuote() {
+    const seq = ++quoteSeq;
+    try {
+      const res = await fetch(QUOTE_URL, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        credentials: "same-origin",
+        body: JSON.stringify({ items: CART.map(x => ({ key: x.key, tier: x.type })) }),
+      });
+      const data = await res.json().catch(() => ({}));
+      // a newer cart change may have been sent meanwhile
+      if (seq !== quoteSeq || !res.ok || !data.success) return;
+      cartTotal.textContent = data.total;
+    } catch (err) {
+      console.warn("Cart quote failed; showing local total:", err);
+    }
   }
 
   /* ==========================
@@ -500,13 +321,17 @@ const debouncedSearch = debounce(() => {
   const q = activeQuery.trim();
 
   // ✅ AUTO CONCURRENT ALWAYS:
-  // - If user is typing (>= MIN_CHARS): ALWAYS search across ALL 3 CSVs
+  // - If user is typing (>= MIN_CHARS): ALWAYS search across all 3 catalogs
   // - If query is empty / too short: dropdown controls the sample list (fail-safe)
   activeScope = (q.length >= MIN_CHARS) ? "all" : (scopeSelect.value || "all");
 
-  const items = searchServices(activeQuery, activeScope);
-  renderResults(items, activeQuery, activeScope);
-}, 120);
+  if (q.length < MIN_CHARS && activeScope === "all") {
+    if (inflight) inflight.abort();
+    renderResults([], activeQuery, activeScope);
+    return;
+  }
+  runSearch(activeQuery, activeScope);
+}, 150);
 
 scopeSelect.addEventListener("change", () => {
   // ✅ Dropdown should NOT restrict active typing search
@@ -534,7 +359,7 @@ clearBtn.addEventListener("click", () => {
     const key = row.dataset.svcKey;
     const scope = row.dataset.svcScope;
 
-    const item = (DB[scope] || []).find(x => x.key === key);
+    const item = lastResults.find(x => x.key === key && x.scope === scope);
     if (!item) return;
 
     // if clicking price cell, use that type
@@ -585,26 +410,11 @@ clearBtn.addEventListener("click", () => {
    11) INIT
 ========================== */
 renderPlaceholder("Loading services…", "Please wait.");
-loadAllCSVs().then(() => {
-  /* ======================================================================
-     SEARCH INDEX BUILD — SMART ALIASES (SAFE)
-     - If buildSearchIndex() exists (from alias engine), build it
-     - Otherwise continue normally (no crash)
-  ====================================================================== */
-  try {
-    if (typeof buildSearchIndex === "function") buildSearchIndex(DB);
-  } catch (e) {
-    console.warn("Search index build skipped:", e);
-  }
-
-  // initial view: if scope != all show sample list
-  activeScope = scopeSelect.value || "all";
-  activeQuery = searchInput.value || "";
-
-  const items = searchServices(activeQuery, activeScope);
-  renderResults(items, activeQuery, activeScope);
-  syncCartUI();
-});
+activeScope = scopeSelect.value || "all";
+activeQuery = searchInput.value || "";
+// first call also returns catalog counts for the meta line
+runSearch(activeQuery, activeScope);
+syncCartUI();
 
   /* ==========================
      12) HELPERS
@@ -647,199 +457,3 @@ loadAllCSVs().then(() => {
   }
 
 })();
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-/* ==========================================================================
-   SEARCH ALIASES ENGINE — SMART MATCH (LAB/DRUGS/GENERAL)
-   - Auto builds aliases for every item (acronyms, bracket names, joined words)
-   - Expands user query with synonyms (e.g. malaria -> mp, thick film, thin film)
-   - Works across all datasets without needing exact wording
-========================================================================== */
-
-/* ==========================
-   A) GLOBAL SYNONYM MAP
-   Add more as you like (safe + optional)
-========================== */
-const GLOBAL_SYNONYMS = {
-  malaria: ["mp", "malaria parasite", "malarial parasite", "parasite", "thick film", "thin film"],
-  typhoid: ["widals", "widal", "widal test"],
-  pregnancy: ["hcg", "beta hcg", "pt", "preg test"],
-  diabetes: ["fbs", "rbs", "hb a1c", "hba1c", "blood sugar"],
-  hiv: ["retroviral", "screening", "elisa"],
-  hepatitis: ["hbsag", "hbv", "hcv"],
-  urine: ["urinalysis", "mcu", "mcs", "m/c/s"],
-};
-
-/* ==========================
-   B) STRING NORMALIZER
-========================== */
-function normText(s) {
-  return (s || "")
-    .toString()
-    .toLowerCase()
-    .normalize("NFKD")                 // safer for odd chars
-    .replace(/[\u0300-\u036f]/g, "")   // remove diacritics
-    .replace(/[_]/g, " ")
-    .replace(/[(){}\[\]]/g, " ")
-    .replace(/[\/\\\-]+/g, " ")
-    .replace(/[^\w\s]/g, " ")         // drop punctuation
-    .replace(/\s+/g, " ")
-    .trim();
-}
-
-/* ==========================
-   C) ACRONYM BUILDER
-   "Full Blood Count" -> "fbc"
-========================== */
-function buildAcronym(text) {
-  const t = normText(text);
-  const words = t.split(" ").filter(Boolean);
-  if (words.length < 2) return "";
-  const ac = words.map(w => w[0]).join("");
-  return ac.length >= 2 ? ac : "";
-}
-
-/* ==========================
-   D) SPLIT BRACKET NAMES
-   "Widal (Typhoid)" -> ["widal typhoid", "widal", "typhoid"]
-========================== */
-function extractBracketParts(original) {
-  const out = [];
-  const s = (original || "").toString();
-
-  // capture (...) content
-  const matches = s.match(/\(([^)]+)\)/g);
-  if (matches) {
-    matches.forEach(m => {
-      const inside = m.replace(/[()]/g, "").trim();
-      if (inside) out.push(inside);
-    });
-  }
-
-  // also version without brackets
-  const noBrackets = s.replace(/\(([^)]+)\)/g, " ").trim();
-  if (noBrackets) out.push(noBrackets);
-
-  return out;
-}
-
-/* ==========================
-   E) BUILD ITEM ALIASES
-   Generates multiple searchable forms for each item
-========================== */
-function buildItemAliases(item) {
-  const aliases = new Set();
-
-  const name = item?.name || "";
-  const cat = item?.category || "";
-  const key = item?.key || "";
-
-  // base texts
-  const baseTexts = [
-    name,
-    cat,
-    key,
-    ...extractBracketParts(name),
-  ].filter(Boolean);
-
-  baseTexts.forEach(t => {
-    const n = normText(t);
-    if (!n) return;
-
-    aliases.add(n);                    // normal
-    aliases.add(n.replace(/\s+/g, "")); // joined: "fullbloodcount"
-    const ac = buildAcronym(n);        // acronym: "fbc"
-    if (ac) aliases.add(ac);
-  });
-
-  // lab keys often contain short forms -> keep raw pieces too
-  const keyNorm = normText(key);
-  if (keyNorm) {
-    aliases.add(keyNorm);
-    aliases.add(keyNorm.replace(/\s+/g, ""));
-  }
-
-  return Array.from(aliases);
-}
-
-/* ==========================
-   F) EXPAND USER QUERY
-   Adds synonyms + smart variants
-========================== */
-function expandQuery(rawQuery) {
-  const q0 = normText(rawQuery);
-  if (!q0) return [];
-
-  const terms = new Set();
-  terms.add(q0);
-  terms.add(q0.replace(/\s+/g, "")); // joined version
-
-  // add acronym of user query too (if they typed full name)
-  const ac = buildAcronym(q0);
-  if (ac) terms.add(ac);
-
-  // expand by words (so "malaria test" triggers malaria synonyms too)
-  const words = q0.split(" ").filter(Boolean);
-
-  words.forEach(w => {
-    terms.add(w);
-    const syns = GLOBAL_SYNONYMS[w];
-    if (syns && syns.length) {
-      syns.forEach(s => {
-        const ns = normText(s);
-        if (ns) {
-          terms.add(ns);
-          terms.add(ns.replace(/\s+/g, ""));
-          const asc = buildAcronym(ns);
-          if (asc) terms.add(asc);
-        }
-      });
-    }
-  });
-
-  // if entire query matches a synonym key
-  if (GLOBAL_SYNONYMS[q0]) {
-    GLOBAL_SYNONYMS[q0].forEach(s => {
-      const ns = normText(s);
-      if (ns) {
-        terms.add(ns);
-        terms.add(ns.replace(/\s+/g, ""));
-        const asc = buildAcronym(ns);
-        if (asc) terms.add(asc);
-      }
-    });
-  }
-
-  return Array.from(terms).filter(Boolean);
-}
-
-/* ==========================
-   G) BUILD SEARCH INDEX (RUN AFTER LOAD)
-========================== */
-function buildSearchIndex() {
-  ["lab", "drugs", "general"].forEach(scope => {
-    (DB[scope] || []).forEach(item => {
-      const aliases = buildItemAliases(item);
-
-      // store alias text once (fast search)
-      item.aliases = aliases;
-      item.aliasText = aliases.join(" ");
-
-      // keep original searchText too (already built in normalizeRow)
-      item.searchText = normText(item.searchText || "");
-    });
-  });
-}
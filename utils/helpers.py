@@ -35,10 +35,17 @@ def inject_user_context():
         return {"user_context": None}
 
 
+# for content-addressed responses (the URL changes whenever the bytes do)
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+
+
 def add_no_cache(response):
     """
     Disable caching for dynamic pages.
+    Responses that opted into IMMUTABLE_CACHE keep it.
     """
+    if "immutable" in (response.headers.get("Cache-Control") or ""):
+        return response
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"